@@ -0,0 +1,42 @@
+"""Wall time of a scenario sweep as worker processes are added.
+
+Run from the repository root::
+
+    python -m benchmarks.batch --scenarios 64 --ticks 6000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+from core.batch import BatchRunner, summarize, sweep
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", type=int, default=64)
+    parser.add_argument("--ticks", type=int, default=6000, help="ticks per scenario")
+    parser.add_argument("--stations", type=int, default=30)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    scenarios = sweep(args.scenarios, args.ticks, stations=args.stations)
+    counts = sorted({1, args.max_workers} | {2 ** k for k in range(1, 8) if 2 ** k < args.max_workers})
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        results = BatchRunner(workers).run(scenarios)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{workers:>3} workers: {elapsed:7.2f}s  speedup {speedup:5.2f}x  efficiency {speedup / workers:5.0%}")
+    summary = summarize(results)
+    print(
+        f"{summary['finished']} scenarios, {summary['ticks']:,} ticks, delivery rate "
+        f"{summary['delivery_rate_min']:.0%}..{summary['delivery_rate_max']:.0%} (mean {summary['delivery_rate_mean']:.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
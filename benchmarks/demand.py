@@ -0,0 +1,58 @@
+"""Cost of gravity-model demand sampling on a large map.
+
+Run from the repository root::
+
+    python -m benchmarks.demand --stations 5000 --per-tick 1000 5000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from core import runner, simulation
+from core.demand import PERIODS, DemandEngine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--per-tick", type=int, nargs="+", default=[100, 1000, 5000], help="passengers spawned per tick")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    world = runner.create_world(args.stations, args.seed)
+    start = time.perf_counter()
+    world.demand.sync(world)
+    print(f"initial weights for {args.stations:,} stations: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    start = time.perf_counter()
+    added = 20
+    for index in range(added):
+        simulation.spawn_station(world, f"S{args.stations + index + 1}")
+        world.demand.sync(world)
+    incremental = (time.perf_counter() - start) * 1e3 / added
+    start = time.perf_counter()
+    DemandEngine().sync(world)
+    print(f"station added: {incremental:.2f} ms incremental vs {(time.perf_counter() - start) * 1e3:.1f} ms rebuild")
+
+    for per_tick in args.per_tick:
+        world = runner.create_world(args.stations, args.seed)
+        world.demand.sync(world)
+        sampled = 0
+        start = time.perf_counter()
+        for tick in range(args.ticks):
+            origins, dests = world.demand.sample(world, per_tick, tick % len(PERIODS))
+            sampled += len(origins)
+        sample_ms = (time.perf_counter() - start) * 1e3 / args.ticks
+
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            origins, dests = world.demand.sample(world, per_tick)
+            simulation.spawn_passengers(world, origins, dests)
+        spawn_ms = (time.perf_counter() - start) * 1e3 / args.ticks
+        print(f"{per_tick:>6,} per tick: sample {sample_ms:6.2f} ms, sample + spawn {spawn_ms:6.2f} ms ({sampled / args.ticks:,.0f} drawn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Station and handle hit-testing: spatial grid against the old linear scan.
+
+Run from the repository root::
+
+    python -m benchmarks.hit_testing
+
+A second table times a fast drag stroke: a point hit per motion event
+against one swept query per frame, and counts the stations each picks up.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+
+from core import simulation
+from core.models import Station, World
+from ui.geometry import STATION_SELECT_RADIUS, GeometryCache, handle_at_position, station_at_position
+
+SIZES = (100, 10_000, 100_000)
+STATIONS_PER_LINE = 8
+QUERIES = 2000
+STROKE_EVENT_SPACING = 45.0  # world units between motion events of a fast drag
+EVENTS_PER_FRAME = 8
+STROKE_REPEATS = 20  # strokes timed, keeping the fastest
+
+
+def linear_station_at_position(world: World, pos, radius: int = STATION_SELECT_RADIUS):
+    px, py = pos
+    radius_sq = radius * radius
+    for station in world.stations.values():
+        dx = station.x - px
+        dy = station.y - py
+        if dx * dx + dy * dy <= radius_sq:
+            return station
+    return None
+
+
+def build_world(count: int, rng: random.Random) -> World:
+    # keep station density roughly that of the default 800x600 window
+    side = max(600.0, math.sqrt(count) * 60.0)
+    world = World()
+    for index in range(count):
+        station = Station(id=f"S{index + 1}", x=rng.uniform(0, side), y=rng.uniform(0, side))
+        world.stations[station.id] = station
+        world.station_index[station.id] = index
+        world.station_ids.append(station.id)
+        world.station_grid.insert(station.id, station.x, station.y)
+    ids = world.station_ids
+    for start in range(0, min(count, 2000) - STATIONS_PER_LINE, STATIONS_PER_LINE):
+        simulation.create_line(world, ids[start:start + STATIONS_PER_LINE], (255, 255, 255))
+    return world
+
+
+def per_query_us(fn, points) -> float:
+    start = time.perf_counter()
+    for point in points:
+        fn(point)
+    return (time.perf_counter() - start) / len(points) * 1e6
+
+
+def stroke_per_frame_us(world: World, rng: random.Random, side: float):
+    """Drag diagonally across the map; time per frame and stations picked up, per event vs swept."""
+    x0, y0 = rng.uniform(0, side * 0.1), rng.uniform(0, side * 0.1)
+    x1, y1 = side - x0, side - y0
+    events = max(2, int(math.hypot(x1 - x0, y1 - y0) / STROKE_EVENT_SPACING))
+    points = [(x0 + (x1 - x0) * i / events, y0 + (y1 - y0) * i / events) for i in range(events + 1)]
+    frames = [points[start : start + EVENTS_PER_FRAME + 1] for start in range(0, events, EVENTS_PER_FRAME)]
+
+    def per_event():
+        hits = set()
+        for point in points:
+            station = station_at_position(world, point)
+            if station is not None:
+                hits.add(station.id)
+        return hits
+
+    def swept():
+        hits = set()
+        for frame in frames:
+            hits.update(world.station_grid.along(*frame[0], *frame[-1], STATION_SELECT_RADIUS))
+        return hits
+
+    timings = {}
+    for fn in (per_event, swept):
+        best = math.inf
+        for _ in range(STROKE_REPEATS):
+            start = time.perf_counter()
+            hits = fn()
+            best = min(best, time.perf_counter() - start)
+        timings[fn] = best / len(frames) * 1e6, len(hits)
+    return (*timings[per_event], *timings[swept])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    strokes = []
+    print(f"{'stations':>9} {'handles':>8} {'station scan us':>16} {'station grid us':>16} {'handle scan us':>15} {'handle grid us':>15}")
+    for count in args.sizes:
+        world = build_world(count, rng)
+        geometry = GeometryCache()
+        geometry.refresh(world)
+        handles = geometry.handles
+        side = max(s.x for s in world.stations.values())
+        points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(QUERIES)]
+        for point in points[:200]:
+            assert (linear_station_at_position(world, point) is None) == (station_at_position(world, point) is None)
+        print(
+            f"{count:>9,} {len(handles):>8,} "
+            f"{per_query_us(lambda p: linear_station_at_position(world, p), points):>16.2f} "
+            f"{per_query_us(lambda p: station_at_position(world, p), points):>16.2f} "
+            f"{per_query_us(lambda p: handle_at_position(handles, p), points):>15.2f} "
+            f"{per_query_us(geometry.handle_at, points):>15.2f}"
+        )
+        strokes.append((count, *stroke_per_frame_us(world, rng, side)))
+
+    print()
+    print(f"{'stations':>9} {'per-event us/frame':>19} {'picked':>7} {'swept us/frame':>15} {'picked':>7}")
+    for count, per_event, hits, per_frame, swept in strokes:
+        print(f"{count:>9,} {per_event:>19.2f} {hits:>7,} {per_frame:>15.2f} {swept:>7,}")
+
+
+if __name__ == "__main__":
+    main()
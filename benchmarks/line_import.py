@@ -0,0 +1,95 @@
+"""Importing a network: one line edit at a time against one ``apply_edits`` batch.
+
+Run from the repository root::
+
+    python -m benchmarks.line_import --lines 500
+
+Each line walks between nearby stations, then is extended at both ends.
+"Edits" is the time to apply them; "consumers" is the geometry refresh and
+movement sync that follow. One at a time, the consumers run after every
+edit, as when edits arrive between frames; batched, they run once.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from core import runner, simulation
+from core.models import World
+from ui.geometry import GeometryCache
+
+MAP_SIZE = (20_000, 15_000)
+HOP = 600.0  # world units searched for a line's next stop
+
+
+def plan_network(world: World, lines: int, stops: int, rng: random.Random):
+    """``(operation, arguments)`` edits for ``lines`` lines of ``stops`` stops, plus two extensions each."""
+    edits = []
+    for number in range(lines):
+        station_id = rng.choice(world.station_ids)
+        route = [station_id]
+        while len(route) < stops + 2:
+            station = world.stations[route[-1]]
+            nearby = [candidate for candidate in world.station_grid.within(station.x, station.y, HOP) if candidate not in route]
+            if not nearby:
+                break
+            route.append(rng.choice(nearby))
+        if len(route) < 4:
+            continue
+        line_id = f"L{len(world.lines) + number + 1}"
+        edits.append(("create_line", {"station_ids": route[1:-1], "color": [200, 80, 80], "mode": "bus"}))
+        edits.append(("extend_line", {"line_id": line_id, "station_ids": [route[0]], "at_start": True}))
+        edits.append(("extend_line", {"line_id": line_id, "station_ids": [route[-1]], "at_start": False}))
+    return edits
+
+
+def consumers(world: World, geometry: GeometryCache):
+    geometry.refresh(world)
+    world.movement.sync(world)
+
+
+def one_at_a_time(world: World, edits, geometry: GeometryCache):
+    functions = {"create_line": simulation.create_line, "extend_line": simulation.extend_line}
+    edit_time = consumer_time = 0.0
+    for op, args in edits:
+        start = time.perf_counter()
+        functions[op](world, **args)
+        middle = time.perf_counter()
+        consumers(world, geometry)
+        edit_time += middle - start
+        consumer_time += time.perf_counter() - middle
+    return edit_time, consumer_time
+
+
+def batched(world: World, edits, geometry: GeometryCache):
+    start = time.perf_counter()
+    simulation.apply_edits(world, edits)
+    middle = time.perf_counter()
+    consumers(world, geometry)
+    return middle - start, time.perf_counter() - middle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--stops", type=int, default=12)
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    for label, apply in (("one at a time", one_at_a_time), ("batched", batched)):
+        world = runner.create_world(args.stations, args.seed, MAP_SIZE)
+        edits = plan_network(world, args.lines, args.stops, random.Random(args.seed))
+        geometry = GeometryCache()
+        consumers(world, geometry)
+        revision = world.topology_revision
+        edit_time, consumer_time = apply(world, edits, geometry)
+        print(
+            f"{label:>14}: {len(edits):,} edits in {edit_time * 1e3:8.1f} ms, consumers {consumer_time * 1e3:8.1f} ms"
+            f"  ({world.topology_revision - revision:,} topology revisions, {len(world.lines)} lines)"
+        )
+
+
+if __name__ == "__main__":
+    main()
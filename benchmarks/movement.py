@@ -0,0 +1,61 @@
+"""Tick throughput of the movement engine on a large network.
+
+Run from the repository root::
+
+    python -m benchmarks.movement --lines 300 --passengers 100000
+    python -m benchmarks.movement --lines 1250 --modes bus,tram,metro,rail   # 5k vehicles, mixed modes
+"""
+from __future__ import annotations
+
+import argparse
+import random
+
+import numpy as np
+
+from core import runner, simulation
+from core.modes import MODES
+from core.models import World
+from core.passengers import PassengerState
+
+
+def build_world(stations: int, lines: int, stops: int, vehicles: int, passengers: int, seed: int = 1, modes=("bus",)) -> World:
+    random.seed(seed)
+    world = runner.create_world(stations, seed)
+    station_ids = list(world.stations)
+    for index in range(lines):
+        line = simulation.create_line(world, random.sample(station_ids, stops), (255, 255, 255), modes[index % len(modes)])
+        line.vehicles = vehicles
+    served = np.flatnonzero(np.bincount(
+        [world.station_index[sid] for line in world.lines.values() for sid in line.stations],
+        minlength=stations,
+    ))
+    rng = np.random.default_rng(seed)
+    origins = rng.choice(served, passengers)
+    dests = rng.choice(served, passengers)
+    dests[dests == origins] = served[0] if served[0] != origins[0] else served[1]
+    simulation.spawn_passengers(world, origins, dests)
+    return world
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--stops", type=int, default=12)
+    parser.add_argument("--vehicles", type=int, default=4, help="vehicles per line")
+    parser.add_argument("--passengers", type=int, default=100_000)
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--modes", default="bus", help=f"comma-separated modes assigned to lines in turn ({', '.join(MODES)})")
+    args = parser.parse_args(argv)
+
+    modes = args.modes.split(",")
+    world = build_world(args.stations, args.lines, args.stops, args.vehicles, args.passengers, modes=modes)
+    stats = runner.run_ticks(world, args.ticks)
+    states = np.bincount(world.passengers.live("state"), minlength=len(PassengerState))
+    print(f"{world.movement.vehicle_count} vehicles ({'/'.join(modes)}) on {len(world.lines)} lines, {world.passengers.spawned_total:,} passengers")
+    print(stats.summary())
+    print(", ".join(f"{state.name.lower()}={states[state]:,}" for state in PassengerState))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Memory and per-tick cost of the passenger store.
+
+Run from the repository root::
+
+    python -m benchmarks.passenger_store
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from core import simulation
+from core.models import World
+from core.passengers import PassengerStore
+
+SIZES = (10_000, 100_000, 1_000_000)
+STATION_COUNT = 200
+
+
+@dataclass
+class LegacyPassenger:
+    id: str
+    origin: str
+    dest: str
+    progress: float = 0.0
+    onboard: Optional[str] = None
+
+
+def legacy_bytes_per_passenger(count: int) -> float:
+    station_ids = [f"S{i + 1}" for i in range(STATION_COUNT)]
+    gc.collect()
+    tracemalloc.start()
+    passengers = {}
+    for index in range(count):
+        origin, dest = random.sample(station_ids, 2)
+        passenger = LegacyPassenger(id=f"P{index + 1}", origin=origin, dest=dest)
+        passengers[passenger.id] = passenger
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / count
+
+
+def store_bytes_per_passenger(count: int) -> float:
+    origins = np.random.randint(0, STATION_COUNT, count).astype(np.int32)
+    dests = (origins + 1) % STATION_COUNT
+    gc.collect()
+    tracemalloc.start()
+    store = PassengerStore(capacity=count)
+    store.spawn(origins, dests)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / count
+
+
+def build_world(count: int) -> World:
+    world = World()
+    for index in range(STATION_COUNT):
+        simulation.spawn_station(world, f"S{index + 1}")
+    origins = np.random.randint(0, STATION_COUNT, count)
+    world.passengers.spawn(origins, (origins + 1) % STATION_COUNT)
+    return world
+
+
+def time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--legacy-limit", type=int, default=100_000, help="largest size to build the old dict-of-dataclasses for")
+    args = parser.parse_args(argv)
+
+    print(f"{'passengers':>10} {'legacy B/p':>11} {'store B/p':>10} {'tick us':>9} {'waiting_counts ms':>18} {'waiting_at ms':>14}")
+    for count in args.sizes:
+        legacy = f"{legacy_bytes_per_passenger(count):.0f}" if count <= args.legacy_limit else "-"
+        store = store_bytes_per_passenger(count)
+        world = build_world(count)
+        tick_cost = time_per_call(lambda: simulation.tick(world), 2000)
+        counts_cost = time_per_call(world.passengers.waiting_counts, 20)
+        waiting_cost = time_per_call(lambda: world.passengers.waiting_at(0), 20)
+        print(
+            f"{count:>10,} {legacy:>11} {store:>10.1f} {tick_cost * 1e6:>9.2f} "
+            f"{counts_cost * 1e3:>18.3f} {waiting_cost * 1e3:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
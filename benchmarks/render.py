@@ -0,0 +1,137 @@
+"""Frame time of the layered renderer under SDL's dummy video driver.
+
+Run from the repository root (no display needed)::
+
+    python -m benchmarks.render --stations 200 --lines 20 --passengers 500
+    python -m benchmarks.render --passenger-sweep   # 100 .. 100k waiting passengers
+    python -m benchmarks.render --large-map --stations 20000 --lines 400   # camera culling and overview
+    python -m benchmarks.render --labels --stations 5000   # station name labels while panning
+    python -m benchmarks.render --labels --stations 5000 --no-scroll   # the same, redrawing the whole layer
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from core import simulation  # noqa: E402
+from core.models import Station, World  # noqa: E402
+from core.profiler import PROFILER  # noqa: E402
+from core.rng import RandomStreams  # noqa: E402
+from ui.camera import Camera  # noqa: E402
+from ui.geometry import GeometryCache  # noqa: E402
+from ui.render import LayeredRenderer  # noqa: E402
+
+WIDTH, HEIGHT = 800, 600
+LARGE_MAP_SIZE = (20_000, 15_000)
+PAN_PER_FRAME = 4  # screen pixels, so every frame scrolls the static layer
+PAN_SWING = 50  # frames before a pan turns back, keeping the view over the network
+
+
+def build_world(stations: int, lines: int, stops: int, passengers: int, seed: int, map_size=(WIDTH, HEIGHT)) -> World:
+    rng = random.Random(seed)
+    world = World(rng=RandomStreams(seed))
+    world.map_size = map_size
+    for index in range(stations):
+        station = Station(id=f"S{index + 1}", x=rng.uniform(20, map_size[0] - 20), y=rng.uniform(20, map_size[1] - 20))
+        world.stations[station.id] = station
+        world.station_index[station.id] = index
+        world.station_ids.append(station.id)
+        world.station_grid.insert(station.id, station.x, station.y)
+    for _ in range(lines):
+        line = simulation.create_line(world, rng.sample(world.station_ids, stops), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        line.vehicles = 1
+    origins = [rng.randrange(stations) for _ in range(passengers)]
+    simulation.spawn_passengers(world, origins, [(origin + 1) % stations for origin in origins])
+    return world
+
+
+def frame_times(world: World, frames: int, *, full_redraw: bool, camera: Camera | None = None, pan: int = 0, labels: bool = True, scroll: bool = True):
+    import pygame
+
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    renderer = LayeredRenderer((WIDTH, HEIGHT), camera)
+    renderer.full_redraw = full_redraw
+    renderer.labels = labels
+    renderer.scroll = scroll
+    geometry = GeometryCache()
+    samples = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        if pan:
+            renderer.camera.pan(pan if frame // PAN_SWING % 2 == 0 else -pan, 0)
+        simulation.tick(world)
+        renderer.begin(screen, world, geometry)
+        renderer.draw_dynamic(screen, world)
+        renderer.present()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return samples
+
+
+def describe(label: str, samples) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"{label:>16}: mean {statistics.fmean(samples):6.2f} ms  p95 {p95:6.2f} ms  ({1000 / statistics.fmean(samples):,.0f} fps)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--stops", type=int, default=8)
+    parser.add_argument("--passengers", type=int, default=500)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--passenger-sweep", action="store_true", help="time layered frames at 100, 1k, 10k and 100k waiting passengers")
+    parser.add_argument("--large-map", action="store_true", help="spread the network over a 20000x15000 map and time the camera views")
+    parser.add_argument("--no-scroll", action="store_true", help="redraw the whole static layer on every pan instead of scrolling it")
+    parser.add_argument("--labels", action="store_true", help="time panning frames with and without labels")
+    args = parser.parse_args(argv)
+
+    import pygame
+
+    pygame.init()
+    try:
+        if args.passenger_sweep:
+            # frames include the simulation tick, whose boarding grows with the queues;
+            # the draw.passengers lap is the passenger drawing alone
+            PROFILER.enabled, PROFILER.track_allocations = True, False
+            for passengers in (100, 1_000, 10_000, 100_000):
+                world = build_world(args.stations, args.lines, args.stops, passengers, args.seed)
+                PROFILER.reset()
+                frames = describe(f"{passengers:,} waiting", frame_times(world, args.frames, full_redraw=False))
+                print(f"{frames}  passengers {PROFILER.sections['draw.passengers'].summary()['mean_ms']:.2f} ms")
+            PROFILER.enabled = False
+            return
+        if args.large_map:
+            world = build_world(args.stations, args.lines, args.stops, args.passengers, args.seed, LARGE_MAP_SIZE)
+            simulation.tick(world)  # demand and routing tables are built on the first tick, not per frame
+            overview = Camera((WIDTH, HEIGHT))
+            overview.fit(*LARGE_MAP_SIZE)
+            print(describe("overview", frame_times(world, args.frames, full_redraw=False, camera=overview)))
+            overview = Camera((WIDTH, HEIGHT))
+            overview.fit(*LARGE_MAP_SIZE)
+            print(describe("overview pan", frame_times(world, args.frames, full_redraw=False, camera=overview, pan=PAN_PER_FRAME, scroll=not args.no_scroll)))
+            street = Camera((WIDTH, HEIGHT), LARGE_MAP_SIZE[0] / 2, LARGE_MAP_SIZE[1] / 2)
+            print(describe("street pan", frame_times(world, args.frames, full_redraw=False, camera=street, pan=PAN_PER_FRAME, scroll=not args.no_scroll)))
+            return
+        if args.labels:
+            world = build_world(args.stations, args.lines, args.stops, args.passengers, args.seed)
+            simulation.tick(world)
+            for label, labels in (("no labels", False), ("labels", True)):
+                print(describe(label, frame_times(world, args.frames, full_redraw=False, pan=PAN_PER_FRAME, labels=labels, scroll=not args.no_scroll)))
+            return
+        for label, full_redraw in (("full redraw", True), ("layered", False)):
+            world = build_world(args.stations, args.lines, args.stops, args.passengers, args.seed)
+            print(describe(label, frame_times(world, args.frames, full_redraw=full_redraw)))
+    finally:
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Journey planner cost after line edits, per search, and cache hit rate in the tick loop.
+
+Run from the repository root::
+
+    python -m benchmarks.routing --stations 2000 --lines 200
+    python -m benchmarks.routing --passengers 100000 --ticks 3000  # planner in steady state
+
+The edits leave the planner's cache cold, so the tick-loop run reports its
+first ``--warmup`` ticks separately from the steady state that follows.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from core import runner, simulation
+from core.planner import PLAN_BUCKET_TICKS, SEARCH_BATCH, JourneyPlanner
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1e3
+
+
+def replan(world, station_id: str):
+    """What the tick loop pays after an edit: the planner's update, then the plan from the edited station (ms each)."""
+    planner = world.planner
+    update = timed(lambda: planner.sync(world))
+    plan = timed(lambda: planner.lookup(world, station_id, world.station_ids[0]))
+    return update, plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--stops", type=int, default=12)
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--passengers", type=int, default=50_000, help="riders waiting when the planner run starts")
+    parser.add_argument("--warmup", type=int, default=PLAN_BUCKET_TICKS, help="ticks before the planner run is measured")
+    parser.add_argument("--ticks", type=int, default=3000, help="ticks of the planner run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    world = runner.create_world(args.stations, args.seed)
+    station_ids = list(world.stations)
+    for _ in range(args.lines):
+        simulation.create_line(world, rng.sample(station_ids, args.stops), (255, 255, 255))
+
+    print(f"first sync, {args.stations} stations / {args.lines} lines: {timed(lambda: JourneyPlanner().sync(world)):.1f} ms")
+    world.planner.sync(world)
+
+    served = {sid for line in world.lines.values() for sid in line.stations}
+    unserved = [sid for sid in station_ids if sid not in served]
+    local, linking = [], []
+    for _ in range(args.edits):
+        line = rng.choice(list(world.lines.values()))
+        station_id = unserved.pop()
+        simulation.extend_line(world, line.id, [station_id])
+        local.append(replan(world, station_id))
+
+        line = rng.choice(list(world.lines.values()))
+        station_id = rng.choice([sid for sid in served if sid not in line.stations])
+        simulation.extend_line(world, line.id, [station_id])
+        linking.append(replan(world, station_id))
+
+    for label, samples in (("extend_line to a new station", local), ("extend_line joining another line", linking)):
+        print(f"{label:>34}:")
+        for part, times in (("planner update", [update for update, _ in samples]), ("first plan from it", [plan for _, plan in samples])):
+            times.sort()
+            print(f"{part:>34}: median {times[len(times) // 2]:.2f} ms, max {times[-1]:.2f} ms")
+
+    planner = world.planner
+    origins = np.array([world.station_index[sid] for sid in sorted(served)], dtype=np.int64)
+    for batch in (1, 16, SEARCH_BATCH):
+        elapsed = timed(lambda: planner._search(origins[:batch], len(world.station_ids)))
+        print(f"{f'plan from {batch} origin(s)':>34}: {elapsed / batch:.2f} ms per origin")
+
+    generator = np.random.default_rng(args.seed)
+    simulation.spawn_passengers(world, generator.choice(origins, args.passengers), generator.choice(origins, args.passengers))
+    for label, ticks in (("planner warming up", args.warmup), ("planner in steady state", args.ticks)):
+        planner.queries = planner.hits = 0
+        stats = runner.run_ticks(world, ticks)
+        print(f"{label:>34}: {stats.summary()}; {planner.queries:,} queries, {planner.hit_rate:.1%} cache hits")
+
+
+if __name__ == "__main__":
+    main()
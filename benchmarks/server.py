@@ -0,0 +1,72 @@
+"""Tick rate of the simulation server while telemetry fans out to many subscribers.
+
+Run from the repository root::
+
+    python -m benchmarks.server --subscribers 50 --slow 5 --seconds 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+
+from core import runner
+from core.server import SimulationServer
+
+
+async def _subscriber(host: str, port: int, received: list, index: int, stall: float):
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+    writer.write(b'{"id":1,"cmd":"subscribe"}\n')
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        received[index] += 1
+        if stall:
+            await asyncio.sleep(stall)  # a client that reads far slower than telemetry arrives
+
+
+async def _run(args):
+    world = runner.create_world(args.stations, args.seed)
+    world.demand.rate = args.rate
+    server = SimulationServer(world)
+    host, port = await server.start()
+    received = [0] * args.subscribers
+    readers = [
+        asyncio.create_task(_subscriber(host, port, received, index, args.stall if index < args.slow else 0.0))
+        for index in range(args.subscribers)
+    ]
+    await asyncio.sleep(args.seconds)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"id":1,"cmd":"status"}\n')
+    await writer.drain()
+    status = json.loads(await reader.readline())["result"]
+    writer.close()
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    dropped = sum(client.dropped for client in server.clients)
+    await server.close()
+
+    fast = received[args.slow:] or [0]
+    print(f"{args.subscribers} subscribers ({args.slow} slow), {status['stations']} stations, {status['passengers']:,} passengers")
+    print(f"{server.ticks} ticks in {args.seconds:.1f}s: {server.ticks_per_second:.1f} ticks/s, {server.tick_seconds / max(server.ticks, 1) * 1e3:.3f} ms per tick")
+    print(f"{server.published} telemetry messages published, fast clients received {min(fast)}..{max(fast)}, {dropped} dropped for slow clients")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=50)
+    parser.add_argument("--slow", type=int, default=5, help="subscribers that stall between reads")
+    parser.add_argument("--stall", type=float, default=1.0, help="seconds a slow subscriber waits per message")
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=2.0, help="demand rate while the server runs")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
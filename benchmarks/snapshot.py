@@ -0,0 +1,115 @@
+"""Save/load cost of binary snapshots against pickle and JSON.
+
+Run from the repository root::
+
+    python -m benchmarks.snapshot --passengers 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+
+from benchmarks.movement import build_world
+from core import replay, runner, snapshot
+from core.passengers import PassengerStore
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1e3
+
+
+def save_pickle(world, path):
+    with open(path, "wb") as handle:
+        pickle.dump(world, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_pickle(path):
+    with open(path, "rb") as handle:
+        return pickle.load(handle)
+
+
+def save_json(world, path):
+    store = world.passengers
+    document = {
+        "tick": world.tick,
+        "stations": [vars(station) for station in world.stations.values()],
+        "lines": [vars(line) for line in world.lines.values()],
+        "passengers": {name: store.live(name).tolist() for name in PassengerStore.COLUMNS},
+        "waiting": [queue.tolist() for queue in world.movement.waiting],
+    }
+    with open(path, "w") as handle:
+        json.dump(document, handle)
+
+
+def load_json(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def report(label: str, path: str, save_ms: float, load_ms: float):
+    print(f"{label:>18}: save {save_ms:8.1f} ms  load {load_ms:8.1f} ms  {os.path.getsize(path) / 2**20:8.1f} MiB")
+
+
+def check_lineless(directory: str):
+    """A fresh world has no lines, so its timetable arrays are empty; it must still round-trip."""
+    world = runner.create_world(20, 1)
+    runner.run_ticks(world, 200)
+    path = os.path.join(directory, "lineless.snap")
+    snapshot.save(world, path)
+    if replay.checksum(snapshot.load(path)) != replay.checksum(world):
+        raise SystemExit("lineless snapshot did not round-trip")
+    print(f"{'lineless world':>18}: round-trip ok")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--passengers", type=int, default=1_000_000)
+    parser.add_argument("--ticks", type=int, default=60, help="ticks between the base and the delta snapshot")
+    parser.add_argument("--skip-json", action="store_true", help="skip the (slow) JSON comparison")
+    args = parser.parse_args(argv)
+
+    world = build_world(args.stations, args.lines, 12, 4, args.passengers)
+    runner.run_ticks(world, 1)
+    print(f"{len(world.passengers):,} passengers, {world.passengers.nbytes / 2**20:.1f} MiB of passenger columns")
+
+    with tempfile.TemporaryDirectory() as directory:
+        check_lineless(directory)
+        base = os.path.join(directory, "world.snap")
+        _, save_ms = timed(snapshot.save, world, base)
+        _, load_ms = timed(snapshot.load, base)
+        report("snapshot", base, save_ms, load_ms)
+
+        runner.run_ticks(world, args.ticks)
+        changes = os.path.join(directory, "world.delta")
+        _, save_ms = timed(snapshot.save_delta, world, changes, base)
+        _, load_ms = timed(snapshot.load, changes, base_path=base)
+        report(f"delta (+{args.ticks} ticks)", changes, save_ms, load_ms)
+
+        with snapshot.SnapshotWriter() as writer:
+            background = os.path.join(directory, "background.snap")
+            _, blocked_ms = timed(writer.submit, world, background)
+            _, remaining_ms = timed(writer.wait)
+        print(f"{'background save':>18}: tick loop blocked {blocked_ms:6.1f} ms, writer finished {remaining_ms:6.1f} ms later")
+
+        pickled = os.path.join(directory, "world.pickle")
+        _, save_ms = timed(save_pickle, world, pickled)
+        _, load_ms = timed(load_pickle, pickled)
+        report("pickle", pickled, save_ms, load_ms)
+
+        if not args.skip_json:
+            document = os.path.join(directory, "world.json")
+            _, save_ms = timed(save_json, world, document)
+            _, load_ms = timed(load_json, document)
+            report("json", document, save_ms, load_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Headless soak run checking that memory plateaus over a long session.
+
+Runs ``--hours`` simulated hours (default 24, one demand day) on a
+capped-size network with steady passenger demand. Hours are on the demand
+clock, ``DAY_TICKS / 24`` ticks each, so the run lines up with the periods
+of the day. Active passengers, passenger store capacity and resident memory
+are sampled ``--samples`` times; the run exits non-zero if any of them is
+still growing in the second half, its mean over the last quarter more than
+``ALLOWED_GROWTH`` above its mean over the third.
+
+``--quick`` is the bounded check: six hours, all within the night period so
+demand is constant, done in well under a minute. Riders give up after
+two simulated minutes, so the first half covers the warm-up.
+
+Run from the repository root::
+
+    python -m benchmarks.soak --quick
+    python -m benchmarks.soak --hours 24
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+from core import runner, simulation
+from core.demand import DAY_TICKS
+
+TICKS_PER_HOUR = DAY_TICKS // 24
+QUICK_HOURS = 6
+ALLOWED_GROWTH = 1.05
+
+
+def rss_bytes() -> int:
+    """Resident memory of this process now, or its peak where ``/proc`` is missing."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def build_world(stations: int, seed: int):
+    world = runner.create_world(stations, seed)
+    world.max_stations = stations
+    station_ids = list(world.stations)
+    for start in range(0, stations - 4, 4):
+        simulation.create_line(world, station_ids[start:start + 6], (255, 255, 255))
+    return world
+
+
+def quarters(samples):
+    """Mean of the third and of the last quarter of the samples: the two halves of the second half."""
+    half = len(samples) // 2
+    middle = half + (len(samples) - half) // 2
+    third, last = samples[half:middle], samples[middle:]
+    return sum(third) / len(third), sum(last) / len(last)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=24.0, help="simulated hours to run")
+    parser.add_argument("--quick", action="store_true", help=f"bounded check: {QUICK_HOURS} hours at constant demand")
+    parser.add_argument("--samples", type=int, default=24, help="measurements over the run")
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--spawn-every", type=int, default=4, help="extra passenger every N ticks on top of the default demand")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    hours = QUICK_HOURS if args.quick else args.hours
+    samples = max(4, args.samples)
+    chunk = max(1, int(TICKS_PER_HOUR * hours / samples))
+
+    world = build_world(args.stations, args.seed)
+    store = world.passengers
+    measured = {"passengers": [], "store capacity": [], "RSS": []}
+    started = time.perf_counter()
+    for _ in range(samples):
+        for step in range(chunk):
+            if step % args.spawn_every == 0:
+                simulation.spawn_passenger(world)
+            simulation.tick(world)
+        rss = rss_bytes()
+        measured["passengers"].append(len(store))
+        measured["store capacity"].append(store.capacity)
+        measured["RSS"].append(rss)
+        print(
+            f"hour {world.tick / TICKS_PER_HOUR:6.2f}: RSS {rss / 2**20:8.1f} MiB, slots {store.capacity:,}, "
+            f"active {len(store):,}, spawned {store.spawned_total:,}"
+        )
+
+    print(f"{world.tick:,} ticks in {time.perf_counter() - started:.1f}s")
+    growing = []
+    for name, values in measured.items():
+        before, after = quarters(values)
+        print(f"{name:>15}: mean {before:,.0f} in the third quarter, {after:,.0f} in the last")
+        if after > before * ALLOWED_GROWTH:
+            growing.append(name)
+    if growing:
+        print(f"FAIL: kept growing: {', '.join(growing)}")
+        return 1
+    print("OK: memory plateaued")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
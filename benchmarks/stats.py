@@ -0,0 +1,52 @@
+"""Per-tick cost of the rolling-window stats engine, and of reading its aggregates.
+
+Run from the repository root::
+
+    python -m benchmarks.stats --passengers 200000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from benchmarks.movement import build_world
+from core import runner
+from core.profiler import PROFILER
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--stops", type=int, default=12)
+    parser.add_argument("--passengers", type=int, default=100_000)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    world = build_world(args.stations, args.lines, args.stops, 4, args.passengers)
+    PROFILER.enabled = True
+    PROFILER.track_allocations = False
+    stats = runner.run_ticks(world, args.ticks)
+    PROFILER.enabled = False
+    report = PROFILER.report()
+    print(f"{len(world.passengers):,} active passengers, {stats.summary()}")
+    for name in ("tick.movement", "tick.stats"):
+        print(f"{name:>14}: mean {report[name]['mean_ms']:.3f} ms  p99 {report[name]['p99_ms']:.3f} ms")
+
+    station_ids, line_ids = world.station_ids, world.line_ids
+    engine = world.stats
+    start = time.perf_counter()
+    for index in range(args.queries):
+        engine.station_summary(world, station_ids[index % len(station_ids)])
+    station_us = (time.perf_counter() - start) * 1e6 / args.queries
+    start = time.perf_counter()
+    for index in range(args.queries):
+        engine.line_summary(world, line_ids[index % len(line_ids)])
+    line_us = (time.perf_counter() - start) * 1e6 / args.queries
+    print(f"station summary {station_us:.2f} us, line summary {line_us:.2f} us")
+    print(engine.world_summary(world))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Seeded benchmark suite with JSON baselines and a regression gate.
+
+Builds a synthetic world of the chosen size from a seed, times the hot
+paths (ticks, line edits, geometry, hit-testing, rendering) and prints
+the median cost of each. ``--save`` writes the results as a baseline;
+``--compare`` checks them against one and exits non-zero when any case is
+slower than the baseline by more than ``--threshold``.
+
+Run from the repository root (rendering uses SDL's dummy driver)::
+
+    python -m benchmarks.suite --size medium --save baseline.json
+    python -m benchmarks.suite --size medium --compare baseline.json --threshold 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np  # noqa: E402
+
+from core import runner, simulation, snapshot  # noqa: E402
+from core.models import Station, World  # noqa: E402
+from core.rng import RandomStreams  # noqa: E402
+from ui.geometry import (  # noqa: E402
+    GeometryCache,
+    build_line_handles,
+    compute_edge_usage,
+    handle_at_position,
+    station_at_position,
+)
+
+WIDTH, HEIGHT = 800, 600
+SIZES = {
+    "small": {"stations": 200, "lines": 20, "stops": 8, "passengers": 2_000},
+    "medium": {"stations": 2_000, "lines": 200, "stops": 10, "passengers": 50_000},
+    "large": {"stations": 5_000, "lines": 500, "stops": 12, "passengers": 200_000},
+}
+QUERIES = 1000
+EDITS = 20
+DEFAULT_THRESHOLD = 0.15
+BASELINE_VERSION = 1
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[], object]  # untimed, once per repeat
+    op: Callable[[object], None]  # timed, ``number`` times per repeat
+    number: int
+    unit: str = "call"
+
+
+def synthetic_world(stations: int, lines: int, stops: int, passengers: int, seed: int) -> World:
+    """A seeded world with stations spread over the window, random lines and waiting passengers."""
+    rng = random.Random(seed)
+    world = World(rng=RandomStreams(seed))
+    for index in range(stations):
+        station = Station(id=f"S{index + 1}", x=rng.uniform(20, WIDTH - 20), y=rng.uniform(20, HEIGHT - 20))
+        world.stations[station.id] = station
+        world.station_index[station.id] = index
+        world.station_ids.append(station.id)
+        world.station_grid.insert(station.id, station.x, station.y)
+    world.station_name_counter = stations
+    world.max_stations = stations  # keep the size fixed while ticking
+    for _ in range(lines):
+        line = simulation.create_line(world, rng.sample(world.station_ids, stops), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        line.vehicles = 2
+    origins, dests = world.demand.sample(world, passengers)
+    simulation.spawn_passengers(world, origins, dests)
+    runner.run_ticks(world, 1)
+    return world
+
+
+def clone(world: World) -> World:
+    return snapshot.restore(snapshot.capture(world, copy=True))
+
+
+def measure(case: Case, repeat: int) -> List[float]:
+    """Seconds per op for each repeat."""
+    samples = []
+    for _ in range(repeat):
+        state = case.setup()
+        start = time.perf_counter()
+        for _ in range(case.number):
+            case.op(state)
+        samples.append((time.perf_counter() - start) / case.number)
+    return samples
+
+
+# -- cases -------------------------------------------------------------------
+
+
+def simulation_cases(template: World, seed: int) -> List[Case]:
+    def warm_clone():
+        world = clone(template)
+        runner.run_ticks(world, 1)  # plan the first journeys outside the timing
+        return world
+
+    def edit_plan():
+        def setup():
+            world = warm_clone()
+            rng = random.Random(seed)
+            plan = []
+            for _ in range(EDITS):
+                line = world.lines[rng.choice(world.line_ids)]
+                station_id = rng.choice(world.station_ids)
+                plan.append((line.id, station_id, rng.random()))
+            return world, iter(plan)
+        return setup
+
+    def create(state):
+        world, plan = state
+        line_id, station_id, _ = next(plan)
+        others = [sid for sid in world.lines[line_id].stations[:3] if sid != station_id]
+        simulation.create_line(world, [station_id, *others], (255, 255, 255))
+
+    def extend(state):
+        world, plan = state
+        line_id, station_id, side = next(plan)
+        if station_id not in world.lines[line_id].stations:
+            simulation.extend_line(world, line_id, [station_id], at_start=side < 0.5)
+            return line_id
+        return None
+
+    def insert(state):
+        world, plan = state
+        line_id, station_id, where = next(plan)
+        line = world.lines[line_id]
+        if station_id not in line.stations:
+            simulation.insert_stations(world, line_id, [station_id], after_index=int(where * (len(line.stations) - 1)))
+
+    def extend_then_sync(state):
+        world, _ = state
+        if extend(state) is not None:
+            world.planner.sync(world)
+
+    return [
+        Case("simulation.tick", warm_clone, simulation.tick, 200, "tick"),
+        Case("simulation.create_line", edit_plan(), create, EDITS),
+        Case("simulation.extend_line", edit_plan(), extend, EDITS),
+        Case("simulation.insert_stations", edit_plan(), insert, EDITS),
+        Case("planner.sync_after_extend", edit_plan(), extend_then_sync, EDITS),
+    ]
+
+
+def geometry_cases(template: World, seed: int) -> List[Case]:
+    def refreshed():
+        world = clone(template)
+        geometry = GeometryCache()
+        geometry.refresh(world)
+        rng = random.Random(seed)
+        return world, geometry, rng
+
+    def extend_and_refresh(state):
+        world, geometry, rng = state
+        line = world.lines[rng.choice(world.line_ids)]
+        station_id = rng.choice(world.station_ids)
+        if station_id not in line.stations:
+            simulation.extend_line(world, line.id, [station_id])
+        geometry.refresh(world)
+
+    return [
+        Case("geometry.compute_edge_usage", lambda: template, compute_edge_usage, 5),
+        Case("geometry.build_line_handles", lambda: template, build_line_handles, 5),
+        Case("geometry.refresh_after_extend", refreshed, extend_and_refresh, EDITS),
+    ]
+
+
+def hit_testing_cases(template: World, seed: int) -> List[Case]:
+    rng = random.Random(seed)
+    points = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(QUERIES)]
+    geometry = GeometryCache()
+    geometry.refresh(template)
+    handles = build_line_handles(template)
+
+    def queries():
+        return iter(points)
+
+    return [
+        Case("hit.station_at_position", queries, lambda it: station_at_position(template, next(it)), QUERIES, "query"),
+        Case("hit.handle_at_position_linear", queries, lambda it: handle_at_position(handles, next(it)), QUERIES, "query"),
+        Case("hit.geometry_handle_at", queries, lambda it: geometry.handle_at(next(it)), QUERIES, "query"),
+    ]
+
+
+def render_cases(template: World, seed: int) -> List[Case]:
+    try:
+        import pygame
+    except ImportError:
+        print("pygame not installed; skipping render cases")
+        return []
+    from ui.render import LayeredRenderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+
+    def frame_setup(full_redraw: bool):
+        def setup():
+            renderer = LayeredRenderer((WIDTH, HEIGHT))
+            renderer.full_redraw = full_redraw
+            return template, GeometryCache(), renderer
+        return setup
+
+    def frame(state):
+        world, geometry, renderer = state
+        renderer.begin(screen, world, geometry)
+        renderer.draw_dynamic(screen, world)
+        renderer.present()
+
+    return [
+        Case("render.frame_layered", frame_setup(False), frame, 50, "frame"),
+        Case("render.frame_full_redraw", frame_setup(True), frame, 20, "frame"),
+    ]
+
+
+GROUPS = (simulation_cases, geometry_cases, hit_testing_cases, render_cases)
+
+
+# -- baselines ---------------------------------------------------------------
+
+
+def run_suite(config: Dict, seed: int, repeat: int, only: str = "") -> Dict[str, Dict]:
+    template = synthetic_world(seed=seed, **config)
+    results = {}
+    for group in GROUPS:
+        for case in group(template, seed):
+            if only and only not in case.name:
+                continue
+            samples = measure(case, repeat)
+            results[case.name] = {
+                "unit": case.unit,
+                "median_us": statistics.median(samples) * 1e6,
+                "min_us": min(samples) * 1e6,
+            }
+            print(f"{case.name:<34} {results[case.name]['median_us']:12.2f} us/{case.unit}  (min {results[case.name]['min_us']:.2f})")
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, threshold: float) -> List[str]:
+    """Names of cases whose median is more than ``threshold`` slower than the baseline."""
+    regressions = []
+    print(f"\n{'case':<34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<34} {'-':>12} {current['median_us']:12.2f}      new")
+            continue
+        change = current["median_us"] / reference["median_us"] - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<34} {reference['median_us']:12.2f} {current['median_us']:12.2f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium")
+    parser.add_argument("--stations", type=int)
+    parser.add_argument("--lines", type=int)
+    parser.add_argument("--passengers", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default="", help="run only cases whose name contains this text")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown before failing, as a fraction")
+    args = parser.parse_args(argv)
+
+    config = dict(SIZES[args.size])
+    for key in ("stations", "lines", "passengers"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        if baseline.get("version") != BASELINE_VERSION:
+            raise SystemExit(f"Unsupported baseline version {baseline.get('version')}")
+        if baseline["config"] != config or baseline["seed"] != args.seed:
+            print("warning: baseline was recorded with a different world size or seed")
+
+    print(f"{args.size} world: {config}, seed {args.seed}")
+    results = run_suite(config, args.seed, args.repeat, args.only)
+
+    if args.save:
+        document = {
+            "version": BASELINE_VERSION,
+            "config": config,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "results": results,
+        }
+        with open(args.save, "w") as handle:
+            json.dump(document, handle, indent=2)
+        print(f"saved baseline to {args.save}")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            return 1
+        print(f"no regressions above {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Run many independent worlds in parallel, one scenario per worker process.
+
+Each :class:`Scenario` describes a seed, a starting network and a tick
+budget. :class:`BatchRunner` shards scenarios across a
+``ProcessPoolExecutor``; workers run plain headless tick loops and send a
+compact :class:`IntervalMetrics` record back every ``interval`` ticks.
+A run can be cancelled, and with a checkpoint directory every worker
+saves a snapshot when it stops early, so running the same scenarios again
+resumes where they left off instead of starting over.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import runner, simulation, snapshot
+from .demand import DEFAULT_SPAWN_RATE
+from .passengers import PassengerState
+
+
+METRICS_INTERVAL = 600  # ticks between metrics records, ten simulated seconds
+LINE_COLOR = (255, 255, 255)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    seed: int
+    ticks: int
+    stations: int = 20
+    # line plans as sequences of station indices, built before the first tick
+    lines: Tuple[Tuple[int, ...], ...] = ()
+    vehicles: int = 1
+    max_stations: Optional[int] = None
+    spawn_rate: float = DEFAULT_SPAWN_RATE  # passengers per tick, see core.demand
+    interval: int = METRICS_INTERVAL
+
+
+class IntervalMetrics(NamedTuple):
+    tick: int
+    waiting: int
+    onboard: int
+    arrived: int  # delivered during this interval
+    abandoned: int  # gave up during this interval
+    tick_ms: float  # mean wall time per tick over the interval
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    metrics: List[IntervalMetrics] = field(default_factory=list)
+    ticks: int = 0
+    elapsed: float = 0.0
+    spawned: int = 0
+    arrived: int = 0
+    abandoned: int = 0
+    cancelled: bool = False
+    checkpoint: Optional[str] = None
+
+    @property
+    def delivery_rate(self) -> float:
+        finished = self.arrived + self.abandoned
+        return self.arrived / finished if finished else 0.0
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def sweep(count: int, ticks: int, *, stations: int = 30, lines: int = 4, stops: int = 6, base_seed: int = 1) -> List[Scenario]:
+    """``count`` scenarios with consecutive seeds and random line plans."""
+    scenarios = []
+    for index in range(count):
+        rng = random.Random(base_seed + index)
+        plans = tuple(tuple(rng.sample(range(stations), stops)) for _ in range(lines))
+        scenarios.append(Scenario(f"s{index:03d}", base_seed + index, ticks, stations, plans, max_stations=stations * 2))
+    return scenarios
+
+
+def _checkpoint_path(directory: Optional[str], scenario: Scenario) -> Optional[str]:
+    return None if directory is None else os.path.join(directory, f"{scenario.name}.snap")
+
+
+def build(scenario: Scenario):
+    world = runner.create_world(scenario.stations, scenario.seed)
+    world.max_stations = scenario.max_stations
+    world.demand.rate = scenario.spawn_rate
+    for plan in scenario.lines:
+        line = simulation.create_line(world, [world.station_ids[index] for index in plan], LINE_COLOR)
+        line.vehicles = scenario.vehicles
+    return world
+
+
+def run_scenario(scenario: Scenario, metrics=None, cancel=None, checkpoint_dir: Optional[str] = None) -> ScenarioResult:
+    """Worker entry point: run one scenario, reporting to the ``metrics`` queue."""
+    path = _checkpoint_path(checkpoint_dir, scenario)
+    if path is not None and os.path.exists(path):
+        world = snapshot.load(path)
+    else:
+        world = build(scenario)
+    store = world.passengers
+    result = ScenarioResult(scenario)
+    tick = simulation.tick
+    arrived, abandoned = store.retired[PassengerState.ARRIVED], store.retired[PassengerState.ABANDONED]
+    start = time.perf_counter()
+
+    while world.tick < scenario.ticks:
+        if cancel is not None and cancel.is_set():
+            result.cancelled = True
+            break
+        count = min(scenario.interval - world.tick % scenario.interval, scenario.ticks - world.tick)
+        interval_start = time.perf_counter()
+        for _ in range(count):
+            tick(world)
+        tick_ms = (time.perf_counter() - interval_start) * 1e3 / count
+        waiting = int(store.waiting_counts().sum())
+        record = IntervalMetrics(
+            world.tick,
+            waiting,
+            store.active - waiting,
+            store.retired[PassengerState.ARRIVED] - arrived,
+            store.retired[PassengerState.ABANDONED] - abandoned,
+            tick_ms,
+        )
+        arrived, abandoned = store.retired[PassengerState.ARRIVED], store.retired[PassengerState.ABANDONED]
+        result.metrics.append(record)
+        result.ticks += count
+        if metrics is not None:
+            metrics.put((scenario.name, record))
+
+    result.elapsed = time.perf_counter() - start
+    result.spawned = store.spawned_total
+    result.arrived = arrived
+    result.abandoned = abandoned
+    if path is not None:
+        if result.cancelled:
+            snapshot.save(world, path)
+            result.checkpoint = path
+        elif os.path.exists(path):
+            os.remove(path)
+    return result
+
+
+class BatchRunner:
+    """Shards scenarios over worker processes and gathers their results."""
+
+    def __init__(self, workers: Optional[int] = None, checkpoint_dir: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint_dir = checkpoint_dir
+        self.cancel_event = None
+
+    def cancel(self):
+        """Ask every running scenario to stop at its next interval boundary."""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+    def run(
+        self,
+        scenarios: Sequence[Scenario],
+        on_metrics: Optional[Callable[[str, IntervalMetrics], None]] = None,
+    ) -> Dict[str, ScenarioResult]:
+        """Run ``scenarios`` to completion (or cancellation) and return results by name.
+
+        ``on_metrics`` is called in this process for every interval record
+        as workers report them.
+        """
+        if self.checkpoint_dir is not None:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+        results: Dict[str, ScenarioResult] = {}
+        with multiprocessing.Manager() as manager:
+            metrics = manager.Queue() if on_metrics is not None else None
+            self.cancel_event = manager.Event()
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    futures = [
+                        pool.submit(run_scenario, scenario, metrics, self.cancel_event, self.checkpoint_dir)
+                        for scenario in scenarios
+                    ]
+                    pending = set(futures)
+                    while pending:
+                        _, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                        if metrics is not None:
+                            self._drain(metrics, on_metrics)
+                    for future in futures:
+                        result = future.result()
+                        results[result.scenario.name] = result
+                if metrics is not None:
+                    self._drain(metrics, on_metrics)
+            finally:
+                self.cancel_event = None
+        return results
+
+    @staticmethod
+    def _drain(metrics, on_metrics):
+        while True:
+            try:
+                name, record = metrics.get_nowait()
+            except queue.Empty:
+                return
+            on_metrics(name, record)
+
+
+def summarize(results: Dict[str, ScenarioResult]) -> Dict[str, float]:
+    """Aggregate figures across a batch, for ranking or quick comparison."""
+    finished = [result for result in results.values() if not result.cancelled]
+    rates = [result.delivery_rate for result in finished]
+    tick_ms = [record.tick_ms for result in finished for record in result.metrics]
+    return {
+        "scenarios": len(results),
+        "finished": len(finished),
+        "ticks": sum(result.ticks for result in results.values()),
+        "delivery_rate_mean": statistics.fmean(rates) if rates else 0.0,
+        "delivery_rate_min": min(rates, default=0.0),
+        "delivery_rate_max": max(rates, default=0.0),
+        "tick_ms_mean": statistics.fmean(tick_ms) if tick_ms else 0.0,
+        "tick_ms_max": max(tick_ms, default=0.0),
+    }
@@ -0,0 +1,183 @@
+"""Typed change records emitted by :mod:`core.simulation`, and the feed that holds them.
+
+Every mutation of a world goes through ``simulation``, which appends a
+record to ``World.changes`` describing it. Consumers keep a
+:class:`FeedCursor` and apply only the records since their last read,
+instead of rescanning the world::
+
+    cursor = world.changes.cursor()
+    ...
+    changes = cursor.poll()
+    if changes is None:
+        rebuild_everything(world)  # fell behind the ring buffer
+    else:
+        for change in changes:
+            ...
+
+Records are grouped by the tick they happened on, and the feed keeps the
+last ``history`` ticks that changed anything. Line edits made between
+ticks belong to the tick they followed. Network records name stations and
+lines by id. Passenger records are batched, and use the integer station
+and line indices of the array-backed subsystems. Their ``slots`` arrays
+are only meaningful while those passengers are active, since retired slots
+are reused.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+FEED_HISTORY = 600  # ticks with changes kept for lagging readers, ten simulated seconds
+
+
+@dataclass(frozen=True)
+class Change:
+    tick: int
+
+
+@dataclass(frozen=True)
+class StationSpawned(Change):
+    station_id: str
+
+
+@dataclass(frozen=True)
+class LineCreated(Change):
+    line_id: str
+    station_ids: List[str]
+    color: Tuple[int, int, int]
+    mode: str
+
+
+@dataclass(frozen=True)
+class LineExtended(Change):
+    line_id: str
+    station_ids: List[str]
+    at_start: bool
+
+
+@dataclass(frozen=True)
+class StationsInserted(Change):
+    line_id: str
+    station_ids: List[str]
+    after_index: int
+
+
+@dataclass(frozen=True)
+class LinesEdited(Change):
+    """Many line edits applied as one by ``simulation.apply_edits``.
+
+    ``edits`` holds ``(operation, arguments)`` pairs in the form
+    ``apply_edits`` takes, and ``line_ids`` every line they created or changed.
+    """
+
+    edits: List[Tuple[str, Dict]]
+    line_ids: List[str]
+
+
+@dataclass(frozen=True)
+class PassengerSpawned(Change):
+    slots: np.ndarray
+    origins: np.ndarray
+
+
+@dataclass(frozen=True)
+class PassengerBoarded(Change):
+    station: int
+    line: int
+    slots: np.ndarray
+
+
+@dataclass(frozen=True)
+class PassengerAlighted(Change):
+    """Riders who left a vehicle to transfer; they are waiting at ``station`` again."""
+
+    station: int
+    line: int
+    slots: np.ndarray
+
+
+@dataclass(frozen=True)
+class PassengerArrived(Change):
+    station: int
+    line: int
+    slots: np.ndarray
+
+
+@dataclass(frozen=True)
+class PassengerAbandoned(Change):
+    slots: np.ndarray
+    stations: np.ndarray
+
+
+LINE_CHANGES = (LineCreated, LineExtended, StationsInserted, LinesEdited)
+
+
+def edited_lines(changes: Iterable[Change]) -> Set[str]:
+    """Ids of the lines that the line records among ``changes`` touched."""
+    edited: Set[str] = set()
+    for change in changes:
+        if isinstance(change, LinesEdited):
+            edited.update(change.line_ids)
+        elif isinstance(change, LINE_CHANGES):
+            edited.add(change.line_id)
+    return edited
+
+
+class ChangeFeed:
+    """Ring buffer of per-tick change lists, addressed by a running sequence number."""
+
+    def __init__(self, history: int = FEED_HISTORY):
+        # (tick, sequence number of the first record, records)
+        self.ticks: Deque[Tuple[int, int, List[Change]]] = deque(maxlen=history)
+        self.end = 0  # sequence number the next record gets
+
+    @property
+    def start(self) -> int:
+        """Sequence number of the oldest record still held."""
+        return self.ticks[0][1] if self.ticks else self.end
+
+    def emit(self, change: Change):
+        ticks = self.ticks
+        if not ticks or ticks[-1][0] != change.tick:
+            ticks.append((change.tick, self.end, []))
+        ticks[-1][2].append(change)
+        self.end += 1
+
+    def since(self, position: int) -> Optional[List[Change]]:
+        """Records from sequence number ``position`` on, or ``None`` once they were dropped."""
+        if position >= self.end:
+            return []
+        if position < self.start:
+            return None
+        chunks = []
+        for _, first, records in reversed(self.ticks):
+            chunks.append(records[position - first:] if first < position else records)
+            if first <= position:
+                break
+        return [change for chunk in reversed(chunks) for change in chunk]
+
+    def cursor(self) -> FeedCursor:
+        """A reader that starts at the current end of the feed."""
+        return FeedCursor(self, self.end)
+
+
+class FeedCursor:
+    __slots__ = ("feed", "position")
+
+    def __init__(self, feed: ChangeFeed, position: int):
+        self.feed = feed
+        self.position = position
+
+    def poll(self) -> Optional[List[Change]]:
+        """Records since the last poll; ``None`` when the reader fell behind and must resync."""
+        changes = self.feed.since(self.position)
+        self.position = self.feed.end
+        return changes
+
+    def skip(self):
+        """Move to the end of the feed without reading."""
+        self.position = self.feed.end
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .models import World
+
+
+DAY_TICKS = 60 * 60 * 24  # one simulated day: a simulated minute per hour at 60 ticks/s
+PERIODS = ("night", "morning", "midday", "evening")
+DEFAULT_SPAWN_RATE = 1 / 60  # passengers per tick, averaged over a day
+DISTANCE_SCALE = 200.0  # distance at which the gravity kernel halves
+DEFAULT_CAPACITY = 6
+MAX_REJECTION_ROUNDS = 32
+CHUNK_ROWS = 512
+
+# Trips generated at (production) and drawn to (attraction) each station
+# type, per period of the day.
+PRODUCTION = {
+    "Suburbs": (0.3, 2.0, 0.6, 0.8),
+    "City Centre": (0.4, 0.5, 1.2, 1.8),
+    "Rural": (0.2, 1.0, 0.4, 0.4),
+    "Industrial": (0.2, 0.4, 0.6, 1.5),
+    "Commercial": (0.4, 0.4, 1.2, 1.4),
+}
+ATTRACTION = {
+    "Suburbs": (0.6, 0.3, 0.6, 2.0),
+    "City Centre": (0.6, 2.0, 1.2, 0.6),
+    "Rural": (0.3, 0.2, 0.4, 0.8),
+    "Industrial": (0.2, 1.8, 0.6, 0.3),
+    "Commercial": (0.5, 1.2, 1.5, 0.8),
+}
+NEUTRAL = (1.0, 1.0, 1.0, 1.0)  # types without a profile
+INTENSITY = np.array((0.3, 1.6, 1.0, 1.1))  # overall trip rate per period
+INTENSITY = INTENSITY / INTENSITY.mean()
+
+
+def gravity(dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    """Distance decay in (0, 1]: 1 for neighbours, 1/2 at ``DISTANCE_SCALE``."""
+    return 1.0 / (1.0 + (dx * dx + dy * dy) / (DISTANCE_SCALE * DISTANCE_SCALE))
+
+
+def period_of(tick: int) -> int:
+    return (tick % DAY_TICKS) * len(PERIODS) // DAY_TICKS
+
+
+class DemandEngine:
+    """Gravity-model passenger demand between stations.
+
+    The trip weight from ``i`` to ``j`` in period ``p`` is
+    ``production[p, i] * attraction[p, j] * gravity(d_ij)``, with both
+    factors scaled by the station's capacity. The matrix is kept in that
+    factored form plus its row sums (``reach[p, i]``), which is O(stations)
+    memory and updates in O(stations) when a station is added, instead of a
+    dense O(stations^2) table.
+
+    Sampling is vectorized: origins are drawn from ``production * reach``
+    by inverse CDF, destinations are proposed from ``attraction`` and
+    accepted with probability ``gravity(d_ij)``, repeating only for the
+    rejected draws.
+    """
+
+    def __init__(self, rate: float = DEFAULT_SPAWN_RATE):
+        self.rate = rate
+        self.count = 0
+        self.xs = np.zeros(0)
+        self.ys = np.zeros(0)
+        self.production = np.zeros((len(PERIODS), 0))
+        self.attraction = np.zeros((len(PERIODS), 0))
+        self.reach = np.zeros((len(PERIODS), 0))
+        self.cdfs = {}
+
+    # -- maintenance -------------------------------------------------------
+
+    def sync(self, world: World):
+        """Fold stations added since the last call into the weights."""
+        total = len(world.station_ids)
+        if total == self.count:
+            return
+        stations = [world.stations[station_id] for station_id in world.station_ids[self.count:]]
+        xs = np.array([station.x for station in stations], dtype=np.float64)
+        ys = np.array([station.y for station in stations], dtype=np.float64)
+        scale = np.array([station.capacity / DEFAULT_CAPACITY for station in stations])
+        production = np.array([PRODUCTION.get(station.type, NEUTRAL) for station in stations]).T * scale
+        attraction = np.array([ATTRACTION.get(station.type, NEUTRAL) for station in stations]).T * scale
+
+        old = self.count
+        self.xs = np.concatenate((self.xs, xs))
+        self.ys = np.concatenate((self.ys, ys))
+        self.production = np.concatenate((self.production, production), axis=1)
+        self.attraction = np.concatenate((self.attraction, attraction), axis=1)
+        self.reach = np.concatenate((self.reach, np.zeros((len(PERIODS), total - old))), axis=1)
+        if old and total - old < CHUNK_ROWS:
+            for index in range(old, total):
+                self._add_station(index)
+        else:
+            self._rebuild_reach(total)
+        self.count = total
+        self.cdfs.clear()
+
+    def _kernel_rows(self, rows: slice, columns: int) -> np.ndarray:
+        kernel = gravity(self.xs[rows, None] - self.xs[None, :columns], self.ys[rows, None] - self.ys[None, :columns])
+        ids = np.arange(rows.start, rows.stop)
+        kernel[ids - rows.start, ids] = 0.0
+        return kernel
+
+    def _rebuild_reach(self, total: int):
+        for start in range(0, total, CHUNK_ROWS):
+            rows = slice(start, min(start + CHUNK_ROWS, total))
+            self.reach[:, rows] = (self._kernel_rows(rows, total) @ self.attraction[:, :total].T).T
+
+    def _add_station(self, index: int):
+        kernel = self._kernel_rows(slice(index, index + 1), index + 1)[0]
+        self.reach[:, :index] += self.attraction[:, index, None] * kernel[None, :index]
+        self.reach[:, index] = self.attraction[:, : index + 1] @ kernel
+
+    def _cdfs(self, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        cdfs = self.cdfs.get(period)
+        if cdfs is None:
+            cdfs = self.cdfs[period] = (
+                np.cumsum(self.production[period] * self.reach[period]),
+                np.cumsum(self.attraction[period]),
+            )
+        return cdfs
+
+    # -- sampling ----------------------------------------------------------
+
+    def sample(self, world: World, count: int, period: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Draw ``count`` origin/destination station index pairs."""
+        self.sync(world)
+        if self.count < 2 or count <= 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        rng = world.rng.passengers
+        period = period_of(world.tick) if period is None else period
+        origin_cdf, dest_cdf = self._cdfs(period)
+        if origin_cdf[-1] <= 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        origins = np.minimum(np.searchsorted(origin_cdf, rng.random(count) * origin_cdf[-1], side="right"), self.count - 1)
+        dests = np.full(count, -1, dtype=np.int64)
+
+        pending = np.arange(count)
+        for _ in range(MAX_REJECTION_ROUNDS):
+            if not len(pending):
+                break
+            proposals = np.minimum(np.searchsorted(dest_cdf, rng.random(len(pending)) * dest_cdf[-1], side="right"), self.count - 1)
+            source = origins[pending]
+            accept = gravity(self.xs[proposals] - self.xs[source], self.ys[proposals] - self.ys[source])
+            accepted = (rng.random(len(pending)) < accept) & (proposals != source)
+            dests[pending[accepted]] = proposals[accepted]
+            pending = pending[~accepted]
+        count = self.count
+        for index in pending.tolist():
+            origin = origins[index]
+            kernel = gravity(self.xs[:count] - self.xs[origin], self.ys[:count] - self.ys[origin])
+            weights = self.attraction[period, :count] * kernel
+            weights[origin] = 0.0
+            cdf = np.cumsum(weights)
+            if cdf[-1] > 0:
+                # the top of the CDF can round onto the zero-weight stations past the last reachable one
+                last = int(np.flatnonzero(weights)[-1])
+                dests[index] = min(int(np.searchsorted(cdf, rng.random() * cdf[-1], side="right")), last)
+            else:
+                # gravity underflowed everywhere: any other station
+                dest = int(rng.integers(count - 1))
+                dests[index] = dest + (dest >= origin)
+        return origins, dests
+
+    def draw(self, world: World) -> Tuple[np.ndarray, np.ndarray]:
+        """This tick's new trips: a Poisson count around the current rate, then :meth:`sample`."""
+        period = period_of(world.tick)
+        count = int(world.rng.passengers.poisson(self.rate * INTENSITY[period]))
+        return self.sample(world, count, period)
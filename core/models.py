@@ -1,8 +1,25 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Iterable, List, Dict, FrozenSet, Optional, Set, Tuple
 import math
 
+from .changes import ChangeFeed
+from .demand import DemandEngine
+from .modes import DEFAULT_MODE
+from .movement import MovementEngine
+from .passengers import PassengerStore
+from .planner import JourneyPlanner
+from .rng import RandomStreams
+from .spatial import SpatialGrid
+from .stats import StatsEngine
+
+if TYPE_CHECKING:
+    from .replay import EventLog
+
+
+NO_LINES: FrozenSet[int] = frozenset()
+DEFAULT_MAP_SIZE = (650, 450)  # stations spawn at least STATION_MARGIN inside this area
+
 
 @dataclass
 class Station:
@@ -13,7 +30,7 @@ class Station:
     capacity: int = 6
     waiting: int = 0
     name: str = ""
-    connected: bool = False
+    connected: bool = False  # derived from World.station_lines
 
 
 @dataclass
@@ -21,23 +38,81 @@ class Line:
     id: str
     color: Tuple[int, int, int]
     stations: List[str] = field(default_factory=list)
-    capacity: int = 20
-    speed: float = 1.0
+    mode: str = DEFAULT_MODE  # key of ``modes.MODES``: speed, capacity and headway
+    vehicles: Optional[int] = None  # fleet size; None keeps the mode's headway
+    revision: int = 0
+    # station id -> index in ``stations``, kept in step by the line mutators
+    positions: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
 
+    def __post_init__(self):
+        self.reindex()
 
-@dataclass
-class Passenger:
-    id: str
-    origin: str
-    dest: str
-    progress: float = 0.0
-    onboard: Optional[str] = None
+    def reindex(self, start: int = 0):
+        """Refresh ``positions`` for ``stations[start:]`` after they moved."""
+        positions = self.positions
+        for index in range(start, len(self.stations)):
+            positions[self.stations[index]] = index
+
+    def serves(self, station_id: str) -> bool:
+        return station_id in self.positions
+
+    def position(self, station_id: str) -> int:
+        """Index of the station along the line, -1 when the line doesn't stop there."""
+        return self.positions.get(station_id, -1)
 
 
 @dataclass
 class World:
     stations: Dict[str, Station] = field(default_factory=dict)
     lines: Dict[str, Line] = field(default_factory=dict)
-    passengers: Dict[str, Passenger] = field(default_factory=dict)
+    passengers: PassengerStore = field(default_factory=PassengerStore)
     tick: int = 0
     station_name_counter: int = 0
+    topology_revision: int = 0
+    max_stations: Optional[int] = None
+    map_size: Tuple[int, int] = DEFAULT_MAP_SIZE
+    rng: RandomStreams = field(default_factory=RandomStreams)
+    event_log: Optional[EventLog] = None
+    changes: ChangeFeed = field(default_factory=ChangeFeed)
+    # dense integer indices used by the array-backed subsystems
+    station_ids: List[str] = field(default_factory=list)
+    station_index: Dict[str, int] = field(default_factory=dict)
+    line_ids: List[str] = field(default_factory=list)
+    line_index: Dict[str, int] = field(default_factory=dict)
+    # station id -> indices of the lines stopping there
+    station_lines: Dict[str, Set[int]] = field(default_factory=dict)
+    movement: MovementEngine = field(default_factory=MovementEngine)
+    planner: JourneyPlanner = field(default_factory=JourneyPlanner)
+    station_grid: SpatialGrid = field(default_factory=SpatialGrid)
+    demand: DemandEngine = field(default_factory=DemandEngine)
+    stats: StatsEngine = field(default_factory=StatsEngine)
+
+    def __post_init__(self):
+        for station_id, station in self.stations.items():
+            if station_id not in self.station_index:
+                self.station_index[station_id] = len(self.station_ids)
+                self.station_ids.append(station_id)
+            if station_id not in self.station_grid:
+                self.station_grid.insert(station_id, station.x, station.y)
+        for line_id in self.lines:
+            if line_id not in self.line_index:
+                self.line_index[line_id] = len(self.line_ids)
+                self.line_ids.append(line_id)
+        if not self.station_lines:
+            for station in self.stations.values():
+                station.connected = False
+            for line in self.lines.values():
+                self.serve(line, line.stations)
+        self.passengers.station_ids = self.station_ids
+        self.passengers.line_ids = self.line_ids
+
+    def lines_at(self, station_id: str) -> FrozenSet[int] | Set[int]:
+        """Indices of the lines stopping at a station; treat as read-only."""
+        return self.station_lines.get(station_id, NO_LINES)
+
+    def serve(self, line: Line, station_ids: Iterable[str]):
+        """Record that ``line`` now stops at ``station_ids``."""
+        line_index = self.line_index[line.id]
+        for station_id in station_ids:
+            self.station_lines.setdefault(station_id, set()).add(line_index)
+            self.stations[station_id].connected = True
@@ -0,0 +1,72 @@
+"""Transit modes: kinematics, dwell, capacity and headway per kind of vehicle.
+
+Speeds are in map pixels per tick and accelerations in pixels per tick
+squared, at the simulation's fixed 60 ticks per second. Every line runs
+one mode (``Line.mode``). The movement engine keeps a mode index per
+vehicle and reads the parameters from the per-mode arrays below, so all
+vehicles of all modes advance in one batched update.
+
+Travel times are precomputed from these profiles: :func:`travel_ticks`
+turns segment lengths into the ticks a vehicle needs to cover them from
+standstill to standstill, and each line's route keeps the result per
+segment.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class TransitMode:
+    name: str
+    max_speed: float  # pixels per tick
+    acceleration: float  # pixels per tick per tick
+    braking: float
+    dwell_ticks: int  # time spent at each stop
+    capacity: int  # riders per vehicle
+    headway_ticks: int  # target time between vehicles; sets the fleet when Line.vehicles is None
+
+
+MODES: Dict[str, TransitMode] = {
+    mode.name: mode
+    for mode in (
+        TransitMode("bus", max_speed=1.0, acceleration=0.02, braking=0.03, dwell_ticks=30, capacity=20, headway_ticks=600),
+        TransitMode("tram", max_speed=1.5, acceleration=0.015, braking=0.025, dwell_ticks=24, capacity=60, headway_ticks=480),
+        TransitMode("metro", max_speed=2.5, acceleration=0.02, braking=0.02, dwell_ticks=18, capacity=150, headway_ticks=300),
+        TransitMode("rail", max_speed=4.0, acceleration=0.008, braking=0.01, dwell_ticks=60, capacity=400, headway_ticks=1200),
+    )
+}
+DEFAULT_MODE = "bus"
+MAX_FLEET = 32  # vehicles a line runs to keep its headway, however long it is
+MODE_NAMES = list(MODES)
+MODE_INDEX = {name: index for index, name in enumerate(MODE_NAMES)}
+
+# per-mode parameter arrays, indexed by MODE_INDEX
+MAX_SPEED = np.array([MODES[name].max_speed for name in MODE_NAMES])
+ACCELERATION = np.array([MODES[name].acceleration for name in MODE_NAMES])
+BRAKING = np.array([MODES[name].braking for name in MODE_NAMES])
+DWELL_TICKS = np.array([MODES[name].dwell_ticks for name in MODE_NAMES], dtype=np.int32)
+
+
+def get_mode(name: str) -> TransitMode:
+    try:
+        return MODES[name]
+    except KeyError:
+        raise ValueError(f"Unknown transit mode: {name}") from None
+
+
+def travel_ticks(mode: TransitMode, lengths: np.ndarray) -> np.ndarray:
+    """Ticks to cover each of ``lengths`` from a stop to a stop, dwell excluded.
+
+    A vehicle accelerates to ``max_speed``, cruises, and brakes to a halt;
+    on segments too short to reach top speed it brakes as soon as it peaks.
+    """
+    a, b, top = mode.acceleration, mode.braking, mode.max_speed
+    lengths = np.asarray(lengths, dtype=np.float64)
+    ramps = top * top / (2 * a) + top * top / (2 * b)
+    peak = np.minimum(top, np.sqrt(2 * lengths * a * b / (a + b)))
+    cruise = np.maximum(lengths - ramps, 0.0) / top
+    return peak / a + peak / b + cruise
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+from .changes import PassengerAlighted, PassengerArrived, PassengerBoarded
+from .modes import ACCELERATION, BRAKING, DWELL_TICKS, MAX_FLEET, MAX_SPEED, MODE_INDEX, get_mode, travel_ticks
+from .passengers import NO_LINE, PassengerState
+
+if TYPE_CHECKING:
+    from .models import Line, World
+
+
+class LineRoute:
+    """Array form of one line's stop sequence, rebuilt when the line changes.
+
+    Segment lengths and travel times are computed here, once per edit, so
+    neither movement nor routing measures distances per tick.
+    """
+
+    __slots__ = ("line_index", "revision", "mode", "stops", "position", "segment_lengths", "segment_ticks")
+
+    def __init__(self, world: World, line: Line):
+        self.line_index = world.line_index[line.id]
+        self.revision = line.revision
+        self.mode = MODE_INDEX[line.mode]
+        self.stops = np.array([world.station_index[sid] for sid in line.stations], dtype=np.int32)
+        # position[station] is the stop's index along the line, -1 when not served
+        self.position = np.full(len(world.station_ids), -1, dtype=np.int32)
+        self.position[self.stops] = np.arange(len(self.stops), dtype=np.int32)
+        points = np.array([(world.stations[sid].x, world.stations[sid].y) for sid in line.stations], dtype=np.float64)
+        steps = np.diff(points.reshape(-1, 2), axis=0)
+        self.segment_lengths = np.maximum(np.hypot(steps[:, 0], steps[:, 1]), 1.0)
+        # ticks from departing one stop to departing the next: running time plus dwell
+        mode = get_mode(line.mode)
+        self.segment_ticks = travel_ticks(mode, self.segment_lengths) + mode.dwell_ticks
+
+    def resize(self, station_count: int):
+        grown = np.full(station_count, -1, dtype=np.int32)
+        grown[: len(self.position)] = self.position
+        self.position = grown
+
+    def segment_length(self, position: int, direction: int) -> float:
+        return float(self.segment_lengths[position if direction > 0 else position - 1])
+
+    def fleet_size(self, line: Line) -> int:
+        """Vehicles the line runs: ``Line.vehicles``, or enough to keep its mode's headway (up to ``MAX_FLEET``)."""
+        if line.vehicles is not None:
+            return max(1, line.vehicles)
+        cycle = 2 * float(self.segment_ticks.sum())
+        return max(1, min(MAX_FLEET, math.ceil(cycle / get_mode(line.mode).headway_ticks)))
+
+
+# per-vehicle arrays of MovementEngine, in snapshot order
+VEHICLE_COLUMNS = (
+    "line", "mode", "position", "direction", "offset", "length", "velocity", "dwell", "capacity", "origin", "target",
+)
+
+
+class MovementEngine:
+    """Runs vehicles along every line and moves passengers on and off them.
+
+    Vehicles live in flat arrays indexed by vehicle number, whatever their
+    mode. Each tick all vehicles advance in one array operation: they
+    accelerate towards their mode's top speed, brake so as to halt at the
+    next stop, and wait out the mode's dwell time there. Only the handful
+    that reach a stop are handled individually, and boarding/alighting at
+    that stop is done with array operations over the passengers involved.
+    """
+
+    def __init__(self):
+        self.revision = -1
+        self.station_count = 0
+        self.routes: Dict[int, LineRoute] = {}
+        self.waiting: List[np.ndarray] = []  # slots queued at each station, in arrival order
+        self.onboard: List[np.ndarray] = []
+        self.onboard_all = np.zeros(0, dtype=np.int64)
+        self.onboard_dirty = False
+        self.station_x = np.zeros(0)
+        self.station_y = np.zeros(0)
+        self.seats = None  # per-line seat totals, recounted when the fleet changes
+
+        self.line = np.zeros(0, dtype=np.int32)
+        self.mode = np.zeros(0, dtype=np.int8)  # index into the per-mode arrays of ``modes``
+        self.position = np.zeros(0, dtype=np.int32)  # index of the stop last departed
+        self.direction = np.zeros(0, dtype=np.int8)
+        self.offset = np.zeros(0, dtype=np.float64)  # distance travelled since that stop
+        self.length = np.zeros(0, dtype=np.float64)  # length of the current segment
+        self.velocity = np.zeros(0, dtype=np.float64)
+        self.dwell = np.zeros(0, dtype=np.int32)  # ticks left standing at the stop
+        self.capacity = np.zeros(0, dtype=np.int32)
+        self.origin = np.zeros(0, dtype=np.int32)  # station index of the stop last departed
+        self.target = np.zeros(0, dtype=np.int32)  # station index of the next stop
+
+    @property
+    def vehicle_count(self) -> int:
+        return len(self.line)
+
+    def line_seats(self, line_index: int) -> int:
+        """Seats across every vehicle running on a line."""
+        if self.seats is None:
+            self.seats = np.bincount(self.line, weights=self.capacity, minlength=len(self.routes)).astype(np.int64)
+        return int(self.seats[line_index]) if line_index < len(self.seats) else 0
+
+    # -- passengers --------------------------------------------------------
+
+    def enqueue(self, world: World, slots):
+        """Register newly waiting passengers with their station queues."""
+        self._grow_stations(world)
+        slots = np.asarray(slots, dtype=np.int64)
+        stations = world.passengers.station[slots]
+        order = np.argsort(stations, kind="stable")
+        arrivals, starts = np.unique(stations[order], return_index=True)
+        for station, group in zip(arrivals.tolist(), np.split(slots[order], starts[1:])):
+            self.waiting[station] = np.concatenate((self.waiting[station], group))
+
+    def dequeue(self, world: World, slots):
+        """Remove waiting passengers from their station queues."""
+        slots = np.asarray(slots, dtype=np.int64)
+        stations = world.passengers.station[slots]
+        for station in np.unique(stations).tolist():
+            queue = self.waiting[station]
+            self.waiting[station] = queue[~np.isin(queue, slots[stations == station])]
+            world.stations[world.station_ids[station]].waiting -= len(queue) - len(self.waiting[station])
+
+    def _grow_stations(self, world: World):
+        missing = len(world.station_ids) - len(self.waiting)
+        if missing > 0:
+            self.waiting.extend(np.zeros(0, dtype=np.int64) for _ in range(missing))
+        known = len(self.station_x)
+        if len(world.station_ids) > known:
+            added = [world.stations[station_id] for station_id in world.station_ids[known:]]
+            self.station_x = np.concatenate((self.station_x, [station.x for station in added]))
+            self.station_y = np.concatenate((self.station_y, [station.y for station in added]))
+
+    # -- topology ----------------------------------------------------------
+
+    def sync(self, world: World):
+        """Bring routes and vehicles in line with ``world.lines``."""
+        if self.station_count != len(world.station_ids):
+            self.station_count = len(world.station_ids)
+            self._grow_stations(world)
+            for route in self.routes.values():
+                route.resize(self.station_count)
+        if self.revision == world.topology_revision:
+            return
+        fleets = []  # (line, route, vehicles to add), added in one go
+        for line in world.lines.values():
+            if len(line.stations) < 2:
+                continue
+            line_index = world.line_index[line.id]
+            route = self.routes.get(line_index)
+            if route is not None and route.revision == line.revision:
+                continue
+            previous = route
+            route = LineRoute(world, line)
+            self.routes[line_index] = route
+            running = 0
+            if previous is not None:
+                running = self._reposition_vehicles(line, previous, route)
+            missing = route.fleet_size(line) - running
+            if missing > 0:
+                fleets.append((line, route, missing))
+        if fleets:
+            self._add_vehicles(fleets)
+        self.revision = world.topology_revision
+
+    def _add_vehicles(self, fleets):
+        """Append vehicles for ``(line, route, count)`` fleets, spread along each route."""
+        columns = {name: [getattr(self, name)] for name in VEHICLE_COLUMNS}
+        for line, route, count in fleets:
+            stops = len(route.stops)
+            starts = np.array([(k * (stops - 1)) // count for k in range(count)], dtype=np.int32)
+            columns["line"].append(np.full(count, route.line_index, dtype=np.int32))
+            columns["mode"].append(np.full(count, route.mode, dtype=np.int8))
+            columns["position"].append(starts)
+            columns["direction"].append(np.ones(count, dtype=np.int8))
+            columns["offset"].append(np.zeros(count))
+            columns["length"].append(route.segment_lengths[starts])
+            columns["velocity"].append(np.zeros(count))
+            columns["dwell"].append(np.zeros(count, dtype=np.int32))
+            columns["capacity"].append(np.full(count, get_mode(line.mode).capacity, dtype=np.int32))
+            columns["origin"].append(route.stops[starts])
+            columns["target"].append(route.stops[starts + 1])
+            self.onboard.extend(np.zeros(0, dtype=np.int64) for _ in range(count))
+        for name, parts in columns.items():
+            setattr(self, name, np.concatenate(parts))
+        self.seats = None
+
+    def _reposition_vehicles(self, line: Line, previous: LineRoute, route: LineRoute) -> int:
+        """Move a line's vehicles onto its new stop sequence; return how many it runs."""
+        vehicles = np.flatnonzero(self.line == route.line_index).tolist()
+        for vehicle in vehicles:
+            station = previous.stops[self.position[vehicle]]
+            position = int(route.position[station])
+            direction = int(self.direction[vehicle])
+            if not 0 <= position + direction < len(route.stops):
+                direction = -direction
+            self.position[vehicle] = position
+            self.direction[vehicle] = direction
+            self.length[vehicle] = route.segment_length(position, direction)
+            self.origin[vehicle] = station
+            self.target[vehicle] = route.stops[position + direction]
+        return len(vehicles)
+
+    # -- stepping ----------------------------------------------------------
+
+    def step(self, world: World):
+        """Advance one tick; ``simulation.tick`` has synced the planner, and with it the routes."""
+        if not len(self.line):
+            return
+        self._advance()
+        if self.onboard_dirty:
+            self.onboard_all = np.concatenate(self.onboard) if self.onboard else self.onboard_all[:0]
+            self.onboard_dirty = False
+        if len(self.onboard_all):
+            progress = world.passengers.progress
+            progress[self.onboard_all] += self.velocity[world.passengers.vehicle[self.onboard_all]]
+        arriving = np.flatnonzero(self.offset >= self.length)
+        if len(arriving):
+            stations = self.target[arriving]
+            world.planner.prefetch(world, stations[[len(self.waiting[station]) > 0 for station in stations.tolist()]])
+        for vehicle in arriving.tolist():
+            self._arrive(world, vehicle)
+
+    def _advance(self):
+        """One kinematics step for every vehicle of every mode."""
+        mode = self.mode
+        braking = BRAKING[mode]
+        # fastest speed from which the vehicle can still halt at the stop; never
+        # below one tick's braking, so a vehicle always covers the last pixel
+        limit = np.sqrt(2.0 * braking * np.maximum(self.length - self.offset, 0.0))
+        np.maximum(limit, braking, out=limit)
+        velocity = self.velocity + ACCELERATION[mode]
+        np.minimum(velocity, MAX_SPEED[mode], out=velocity)
+        np.minimum(velocity, limit, out=velocity)
+        standing = self.dwell > 0
+        velocity[standing] = 0.0
+        self.dwell[standing] -= 1
+        self.velocity = velocity
+        self.offset += velocity
+
+    def _arrive(self, world: World, vehicle: int):
+        route = self.routes[int(self.line[vehicle])]
+        direction = int(self.direction[vehicle])
+        position = int(self.position[vehicle]) + direction
+        station = int(route.stops[position])
+
+        self._unload(world, vehicle, station)
+        if not 0 <= position + direction < len(route.stops):
+            direction = -direction
+        self._board(world, vehicle, route, station, position, direction)
+
+        self.position[vehicle] = position
+        self.direction[vehicle] = direction
+        self.offset[vehicle] = 0.0
+        self.length[vehicle] = route.segment_length(position, direction)
+        self.velocity[vehicle] = 0.0
+        self.dwell[vehicle] = DWELL_TICKS[route.mode]
+        self.origin[vehicle] = station
+        self.target[vehicle] = route.stops[position + direction]
+
+    def _unload(self, world: World, vehicle: int, station: int):
+        riders = self.onboard[vehicle]
+        if not len(riders):
+            return
+        store = world.passengers
+        leaving = store.target[riders] == station
+        if not leaving.any():
+            return
+        self.onboard[vehicle] = riders[~leaving]
+        self.onboard_dirty = True
+        out = riders[leaving]
+        arrived = store.dest[out] == station
+        store.station[out] = station
+        line = int(self.line[vehicle])
+        finished = out[arrived]
+        if len(finished):
+            store.retire(finished, PassengerState.ARRIVED)
+            world.changes.emit(PassengerArrived(world.tick, station, line, finished))
+        transfers = out[~arrived]
+        if len(transfers):
+            world.changes.emit(PassengerAlighted(world.tick, station, line, transfers))
+            store.set_state(transfers, PassengerState.WAITING, line=NO_LINE)
+            store.vehicle[transfers] = -1
+            self.waiting[station] = np.concatenate((self.waiting[station], transfers))
+            world.stations[world.station_ids[station]].waiting += len(transfers)
+
+    def _board(self, world: World, vehicle: int, route: LineRoute, station: int, position: int, direction: int):
+        candidates = self.waiting[station]
+        free = int(self.capacity[vehicle]) - len(self.onboard[vehicle])
+        if not len(candidates) or free <= 0:
+            return
+        store = world.passengers
+        targets = world.planner.boarding_targets(world, station, route.line_index, direction, store.dest[candidates])
+        ahead = route.position[np.maximum(targets, 0)] * direction > position * direction
+        eligible = np.flatnonzero((targets >= 0) & ahead)[:free]
+        if not len(eligible):
+            return
+        boarding = candidates[eligible]
+        keep = np.ones(len(candidates), dtype=bool)
+        keep[eligible] = False
+        self.waiting[station] = candidates[keep]
+
+        store.set_state(boarding, PassengerState.ONBOARD, line=route.line_index, station=-1)
+        store.vehicle[boarding] = vehicle
+        store.target[boarding] = targets[eligible]
+        self.onboard[vehicle] = np.concatenate((self.onboard[vehicle], boarding))
+        self.onboard_dirty = True
+        world.stations[world.station_ids[station]].waiting -= len(boarding)
+        world.changes.emit(PassengerBoarded(world.tick, station, route.line_index, boarding))
+
+    # -- rendering helpers -------------------------------------------------
+
+    def vehicle_positions(self, world: World):
+        """Return (x, y) arrays with the current position of every vehicle."""
+        self._grow_stations(world)
+        t = np.minimum(self.offset / self.length, 1.0) if len(self.line) else self.offset
+        x0, y0 = self.station_x[self.origin], self.station_y[self.origin]
+        xs = x0 + (self.station_x[self.target] - x0) * t
+        ys = y0 + (self.station_y[self.target] - y0) * t
+        return xs, ys
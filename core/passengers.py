@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+
+NO_LINE = -1
+INITIAL_CAPACITY = 1024
+
+
+class PassengerState(IntEnum):
+    WAITING = 0
+    ONBOARD = 1
+    ARRIVED = 2
+    ABANDONED = 3
+
+
+ACTIVE_STATES = (PassengerState.WAITING, PassengerState.ONBOARD)
+
+
+class Passenger:
+    """Thin read/write view of one slot in a :class:`PassengerStore`.
+
+    Slots are recycled once a passenger is retired, so a view is only
+    meaningful while its passenger is active.
+    """
+
+    __slots__ = ("_store", "slot")
+
+    def __init__(self, store: PassengerStore, slot: int):
+        self._store = store
+        self.slot = slot
+
+    @property
+    def id(self) -> str:
+        return f"P{int(self._store.serial[self.slot])}"
+
+    @property
+    def origin(self) -> str:
+        return self._store.station_ids[self._store.origin[self.slot]]
+
+    @property
+    def dest(self) -> str:
+        return self._store.station_ids[self._store.dest[self.slot]]
+
+    @property
+    def station(self) -> Optional[str]:
+        index = self._store.station[self.slot]
+        return None if index < 0 else self._store.station_ids[index]
+
+    @property
+    def state(self) -> PassengerState:
+        return PassengerState(int(self._store.state[self.slot]))
+
+    @property
+    def progress(self) -> float:
+        return float(self._store.progress[self.slot])
+
+    @progress.setter
+    def progress(self, value: float):
+        self._store.progress[self.slot] = value
+
+    @property
+    def onboard(self) -> Optional[str]:
+        index = self._store.line[self.slot]
+        return None if index == NO_LINE else self._store.line_ids[index]
+
+    def __repr__(self) -> str:
+        return (
+            f"Passenger(id={self.id!r}, origin={self.origin!r}, dest={self.dest!r}, "
+            f"progress={self.progress!r}, onboard={self.onboard!r})"
+        )
+
+
+class PassengerStore:
+    """Struct-of-arrays passenger table.
+
+    Stations and lines are referenced by their integer index into the
+    world's ``station_ids`` / ``line_ids`` lists. The store keeps the
+    read-only mapping interface ``World.passengers`` used to have (ids to
+    :class:`Passenger` views) so existing callers keep working; it covers
+    active (waiting or onboard) passengers only.
+
+    Passengers that arrive or give up are retired: their slot goes on a
+    free list and is handed to the next spawn, so the arrays stop growing
+    once spawns and retirements balance. Ids come from ``next_serial`` and
+    are never reused.
+    """
+
+    COLUMNS = {
+        "serial": np.int64,
+        "origin": np.int32,
+        "dest": np.int32,
+        "station": np.int32,
+        "line": np.int32,
+        "vehicle": np.int32,
+        "target": np.int32,
+        "progress": np.float32,
+        "state": np.int8,
+        "spawned": np.int32,
+    }
+
+    def __init__(self, station_ids: Optional[List[str]] = None, line_ids: Optional[List[str]] = None, capacity: int = INITIAL_CAPACITY):
+        self.station_ids = station_ids if station_ids is not None else []
+        self.line_ids = line_ids if line_ids is not None else []
+        self.size = 0  # high-water mark of slots ever used
+        self.active = 0
+        self.next_serial = 1
+        self.free: List[int] = []
+        self.retired = [0] * len(PassengerState)  # running totals per final state
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    @classmethod
+    def from_columns(cls, columns, *, next_serial: int, free=(), retired=None) -> PassengerStore:
+        """Build a store around existing column arrays without copying them."""
+        store = cls(capacity=0)
+        for name, dtype in cls.COLUMNS.items():
+            setattr(store, name, np.asarray(columns[name], dtype=dtype))
+        store.size = len(store.serial)
+        store.next_serial = next_serial
+        store.free = np.asarray(free, dtype=np.int64).tolist()
+        store.active = int(np.count_nonzero(store.state <= PassengerState.ONBOARD))
+        if retired is not None:
+            store.retired = list(retired)
+        return store
+
+    # -- storage -----------------------------------------------------------
+
+    @property
+    def capacity(self) -> int:
+        return len(self.serial)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    def _reserve(self, count: int):
+        needed = self.size + count
+        if needed <= self.capacity:
+            return
+        capacity = max(self.capacity * 2, needed, INITIAL_CAPACITY)
+        for name, dtype in self.COLUMNS.items():
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[: self.size] = getattr(self, name)[: self.size]
+            setattr(self, name, grown)
+
+    def spawn(self, origins, dests, tick: int = 0) -> np.ndarray:
+        """Add passengers in bulk, reusing retired slots first, and return their slots."""
+        origins = np.asarray(origins, dtype=np.int32)
+        dests = np.asarray(dests, dtype=np.int32)
+        count = len(origins)
+        reused = min(count, len(self.free))
+        fresh = count - reused
+        self._reserve(fresh)
+        slots = np.empty(count, dtype=np.int64)
+        if reused:
+            slots[:reused] = self.free[-reused:]
+            del self.free[-reused:]
+        slots[reused:] = np.arange(self.size, self.size + fresh)
+        self.size += fresh
+
+        self.serial[slots] = np.arange(self.next_serial, self.next_serial + count)
+        self.origin[slots] = origins
+        self.dest[slots] = dests
+        self.station[slots] = origins
+        self.line[slots] = NO_LINE
+        self.vehicle[slots] = -1
+        self.target[slots] = -1
+        self.progress[slots] = 0.0
+        self.state[slots] = PassengerState.WAITING
+        self.spawned[slots] = tick
+        self.next_serial += count
+        self.active += count
+        return slots
+
+    def retire(self, slots, state: PassengerState):
+        """Finish many passengers' trips as ``state`` and release their slots."""
+        slots = np.asarray(slots, dtype=np.int64)
+        self.state[slots] = state
+        self.line[slots] = NO_LINE
+        self.vehicle[slots] = -1
+        self.free.extend(slots.tolist())
+        self.active -= len(slots)
+        self.retired[state] += len(slots)
+
+    def set_state(self, slots, state: PassengerState, *, line: Optional[int] = None, station: Optional[int] = None):
+        """Move many passengers to ``state`` at once."""
+        self.state[slots] = state
+        if line is not None:
+            self.line[slots] = line
+        if station is not None:
+            self.station[slots] = station
+
+    # -- vectorized queries ------------------------------------------------
+
+    def live(self, column: str) -> np.ndarray:
+        return getattr(self, column)[: self.size]
+
+    def active_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.live("state") <= PassengerState.ONBOARD)
+
+    def in_state(self, state: PassengerState) -> np.ndarray:
+        return np.flatnonzero(self.live("state") == state)
+
+    def waiting_at(self, station: int) -> np.ndarray:
+        return np.flatnonzero((self.live("state") == PassengerState.WAITING) & (self.live("station") == station))
+
+    def onboard_line(self, line: int) -> np.ndarray:
+        return np.flatnonzero((self.live("state") == PassengerState.ONBOARD) & (self.live("line") == line))
+
+    def waiting_counts(self) -> np.ndarray:
+        """Number of waiting passengers per station index."""
+        waiting = self.live("state") == PassengerState.WAITING
+        return np.bincount(self.live("station")[waiting], minlength=len(self.station_ids))
+
+    # -- mapping compatibility ---------------------------------------------
+
+    def slot_of(self, passenger_id: str) -> int:
+        serial = parse_passenger_id(passenger_id)
+        matches = np.flatnonzero((self.live("serial") == serial) & (self.live("state") <= PassengerState.ONBOARD))
+        if not len(matches):
+            raise KeyError(passenger_id)
+        return int(matches[0])
+
+    def __len__(self) -> int:
+        return self.active
+
+    @property
+    def spawned_total(self) -> int:
+        return self.next_serial - 1
+
+    def __contains__(self, passenger_id) -> bool:
+        try:
+            self.slot_of(passenger_id)
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def __getitem__(self, passenger_id: str) -> Passenger:
+        return Passenger(self, self.slot_of(passenger_id))
+
+    def get(self, passenger_id: str, default=None):
+        try:
+            return self[passenger_id]
+        except (KeyError, ValueError):
+            return default
+
+    def __iter__(self) -> Iterator[str]:
+        for serial in self.live("serial")[self.active_slots()]:
+            yield f"P{int(serial)}"
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def values(self) -> Iterator[Passenger]:
+        for slot in self.active_slots().tolist():
+            yield Passenger(self, slot)
+
+    def items(self):
+        for view in self.values():
+            yield view.id, view
+
+
+def parse_passenger_id(passenger_id: str) -> int:
+    if not passenger_id.startswith("P") or not passenger_id[1:].isdigit():
+        raise ValueError(f"Invalid passenger id: {passenger_id}")
+    return int(passenger_id[1:])
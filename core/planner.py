@@ -0,0 +1,437 @@
+"""Time-dependent, crowding-aware journey planning with cached results.
+
+Riders choose their next leg from a search over the line network that
+prices waiting, riding, crowding and transfers in ticks, rather than by
+transfer count alone.
+
+The search is round-based, in the style of RAPTOR: round ``r`` finds the
+earliest arrival at every station using at most ``r`` vehicles, by riding
+each line in both directions from the stations reached in the previous
+round. Every line of the network is scanned at once, as prefix minima
+over a ``(origins, lines, stops)`` array, and many origins are planned
+together in one batch. A round stops early once nothing improves.
+
+Costs come from a timetable of the network:
+
+* the wait at a stop is the time until the next vehicle in the wanted
+  direction gets there, then every headway after that, so it depends on
+  when the rider reaches the stop;
+* riding costs each segment's running and dwell time
+  (``LineRoute.segment_ticks``);
+* boarding a crowded vehicle adds up to ``CROWDING_PENALTY_TICKS`` in
+  proportion to its load factor, and a full one is skipped for the next;
+* each transfer adds ``TRANSFER_PENALTY_TICKS``.
+
+The timetable is read from the vehicles' positions and loads once per
+bucket of ``PLAN_BUCKET_TICKS``, and for a line again when it is edited,
+and journeys are planned as leaving at the start of the bucket. A plan is
+therefore a function of its origin and the bucket's timetable only: a
+cached one and a freshly computed one agree, and what riders do never
+depends on what happens to be cached. The timetable is saved in
+snapshots for the same reason.
+
+One search from an origin plans journeys to every destination, so results
+are cached as one row per origin, for the current bucket, holding the
+first leg to each destination. A query for ``(origin, dest)`` in a bucket
+is a row lookup and an array read. Rows are kept in least-recently-used
+order, dropped when the bucket ends, and dropped when an edited line
+stops at a station the row's search reached.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .modes import DWELL_TICKS
+
+if TYPE_CHECKING:
+    from .models import World
+    from .movement import LineRoute
+
+
+PLAN_BUCKET_TICKS = 600  # timetable refresh interval, ten simulated seconds
+MAX_RIDES = 4  # vehicles per journey, so at most three transfers
+TRANSFER_PENALTY_TICKS = 300
+CROWDING_PENALTY_TICKS = 600  # added for boarding a vehicle at its full load
+CACHE_ROWS = 2048  # cached origins; a row holds two int32 per station
+SEARCH_BATCH = 128  # origins searched together, at most
+REFRESH_BATCH = 32  # origins planned per call, topping up requests with stations not asked for yet
+
+
+class LineTimetable:
+    """When the next vehicle reaches each stop of a line, in each direction.
+
+    ``depart[0]`` holds the ticks after the bucket start until the next
+    vehicle heading along the line's stop order reaches each stop, and
+    ``depart[1]`` the same against that order (``inf`` where a vehicle
+    cannot be boarded that way). ``penalty`` is the crowding cost of
+    boarding that vehicle.
+    """
+
+    __slots__ = ("revision", "depart", "penalty", "headway")
+
+    def __init__(self, revision: int, depart: np.ndarray, penalty: np.ndarray, headway: float):
+        self.revision = revision
+        self.depart = depart
+        self.penalty = penalty
+        self.headway = headway
+
+    @classmethod
+    def measure(cls, world: World, route: LineRoute, elapsed: int) -> LineTimetable:
+        """Read a line's timetable from its vehicles, ``elapsed`` ticks into the bucket."""
+        movement = world.movement
+        stops = len(route.stops)
+        cum = np.concatenate(([0.0], np.cumsum(route.segment_ticks)))
+        total = cum[-1]
+        cycle = 2 * total
+        # a vehicle's round trip as one coordinate: out along the stops, then back
+        events = np.stack((cum, cycle - cum))
+        depart = np.full((2, stops), np.inf)
+        penalty = np.zeros((2, stops))
+        vehicles = np.flatnonzero(movement.line == route.line_index)
+        headway = cycle / max(len(vehicles), 1)
+        if len(vehicles):
+            position = movement.position[vehicles]
+            forward = movement.direction[vehicles] > 0
+            segment = np.where(forward, position, position - 1)
+            dwell = DWELL_TICKS[route.mode]
+            running = route.segment_ticks[segment] - dwell
+            fraction = np.minimum(movement.offset[vehicles] / movement.length[vehicles], 1.0)
+            since = (dwell - movement.dwell[vehicles]) + fraction * running
+            coordinate = np.where(forward, cum[position], cycle - cum[position]) + since
+            lag = np.mod(events[None] - coordinate[:, None, None], cycle)
+            lag[lag <= 0] = cycle  # a vehicle standing at the stop has already boarded there
+            nearest = lag.argmin(axis=0)
+            depart = np.take_along_axis(lag, nearest[None], axis=0)[0]
+            seats = movement.capacity[vehicles]
+            load = np.array([len(movement.onboard[vehicle]) for vehicle in vehicles.tolist()]) / np.maximum(seats, 1)
+            load = load[nearest]
+            depart = depart + np.where(load >= 1.0, headway, 0.0)
+            penalty = CROWDING_PENALTY_TICKS * np.minimum(load, 1.0)
+        depart[0, -1] = depart[1, 0] = np.inf  # nowhere to go from the ends
+        return cls(route.revision, (depart + elapsed).astype(np.float32), penalty.astype(np.float32), headway)
+
+
+class PlanRow:
+    """First legs from one origin: ``leg[dest]`` is ``line * 2 + forward`` (-1: no route)."""
+
+    __slots__ = ("leg", "alight")
+
+    def __init__(self, leg: np.ndarray, alight: np.ndarray):
+        self.leg = leg
+        self.alight = alight
+
+
+class JourneyPlanner:
+    """Plans riders' journeys against the network's current timetable.
+
+    Call :meth:`sync` once per tick, before vehicles move. Batches of
+    origins go through :meth:`prefetch`; :meth:`boarding_targets` decides
+    who boards a vehicle, from the cached rows.
+    """
+
+    def __init__(self, capacity: int = CACHE_ROWS, bucket_ticks: int = PLAN_BUCKET_TICKS):
+        self.capacity = capacity
+        self.bucket_ticks = bucket_ticks
+        self.bucket = -1
+        self.timetables: Dict[int, LineTimetable] = {}
+        self.rows: OrderedDict[Tuple[int, int], PlanRow] = OrderedDict()
+        self.pending: List[int] = []  # stations to plan ahead of requests this bucket
+        self.queries = 0
+        self.hits = 0
+        self.layout_key = (0, -1, -1)  # station count, movement revision and bucket the layout is for
+        # search layout: (stop position, line) arrays, padded to the longest line
+        self.lines = np.zeros(0, dtype=np.int32)
+        self.stops = np.zeros((0, 0), dtype=np.int32)
+        self.cum = np.zeros((0, 0), dtype=np.float32)
+        self.depart = np.zeros((2, 0, 0), dtype=np.float32)
+        self.penalty = np.zeros((2, 0, 0), dtype=np.float32)
+        self.headway = np.zeros(0, dtype=np.float32)
+        # arrival cells of the flattened (direction, stop position, line) arrays, grouped by station
+        self.columns = np.zeros(0, dtype=np.int64)
+        # a journey's first leg is kept as the cell where it first alights
+        self.cell_leg = np.zeros(0, dtype=np.int32)  # line * 2 + forward
+        self.cell_station = np.zeros(0, dtype=np.int32)
+        self.cells = np.zeros(0, dtype=np.int32)
+        self.layers = []
+        self.served = np.zeros(0, dtype=np.int64)
+        self.row_of = np.zeros(0, dtype=np.int32)
+        self.stop_rows = np.zeros((0, 0), dtype=np.int32)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.queries if self.queries else 0.0
+
+    # -- maintenance -------------------------------------------------------
+
+    def sync(self, world: World):
+        """Refresh the timetable at bucket starts and for edited lines, dropping stale rows."""
+        world.movement.sync(world)
+        routes = world.movement.routes
+        bucket = world.tick // self.bucket_ticks
+        elapsed = world.tick - bucket * self.bucket_ticks
+        started = bucket != self.bucket
+        if started:
+            self.bucket = bucket
+            self.rows.clear()
+            self.timetables = {index: LineTimetable.measure(world, route, elapsed) for index, route in routes.items()}
+        elif self.layout_key[1] != world.movement.revision:
+            for index, route in routes.items():
+                timetable = self.timetables.get(index)
+                if timetable is None or timetable.revision != route.revision:
+                    self.timetables[index] = LineTimetable.measure(world, route, elapsed)
+                    self._invalidate(route.stops)
+        key = (len(world.station_ids), world.movement.revision, bucket)
+        if key != self.layout_key:
+            self._build_layout(world)
+            self.layout_key = key
+        if started:
+            # busiest stations first, as far as the cache holds
+            self.pending = self.served[: self.capacity][::-1].tolist()
+
+    def _invalidate(self, stations: np.ndarray):
+        """Drop the rows whose search reached any of ``stations``."""
+        for key, row in list(self.rows.items()):
+            known = stations[stations < len(row.leg)]
+            if key[0] in stations or (row.leg[known] >= 0).any():
+                del self.rows[key]
+
+    def _build_layout(self, world: World):
+        self.lines = np.array(sorted(world.movement.routes), dtype=np.int32)
+        routes = [world.movement.routes[index] for index in self.lines.tolist()]
+        timetables = [self.timetables[index] for index in self.lines.tolist()]
+        count = len(routes)
+        lengths = np.fromiter((len(route.stops) for route in routes), dtype=np.int64, count=count)
+        width = int(lengths.max()) if count else 0
+        # every line's stops in one go: (stop position, line) cells in line order, as concatenated
+        position = np.arange(width)[:, None]
+        line_cells, stop_cells = np.nonzero((position < lengths).T)
+        line_segments, segment_cells = np.nonzero(((position > 0) & (position < lengths)).T)
+        self.stops = np.zeros((width, count), dtype=np.int32)
+        self.depart = np.full((2, width, count), np.inf, dtype=np.float32)
+        self.penalty = np.zeros((2, width, count), dtype=np.float32)
+        segments = np.zeros((width, count))
+        if count:
+            self.stops[stop_cells, line_cells] = np.concatenate([route.stops for route in routes])
+            self.depart[:, stop_cells, line_cells] = np.concatenate([timetable.depart for timetable in timetables], axis=1)
+            self.penalty[:, stop_cells, line_cells] = np.concatenate([timetable.penalty for timetable in timetables], axis=1)
+            segments[segment_cells, line_segments] = np.concatenate([route.segment_ticks for route in routes])
+        # summed down each column in stop order, as per line; past a line's end it holds at the last stop
+        self.cum = np.cumsum(segments, axis=0).astype(np.float32)
+        self.headway = np.fromiter((timetable.headway for timetable in timetables), dtype=np.float32, count=count)
+
+        # arrivals: along the stop order at every stop but the first, against it at every stop but the last
+        arrive = np.stack(((position > 0) & (position < lengths), position < lengths - 1))
+        columns = np.flatnonzero(arrive.ravel())
+        stations = np.broadcast_to(self.stops, arrive.shape).ravel()[columns]
+        forward = columns < width * count
+        lines = self.lines[columns % max(count, 1)]
+        # label rows: served stations, busiest first; cells in layers, the
+        # k-th cell of every station with more than k of them, in row order
+        served, group, counts = np.unique(stations, return_inverse=True, return_counts=True)
+        busiest = np.argsort(-counts, kind="stable")
+        row = np.empty(len(served), dtype=np.int64)
+        row[busiest] = np.arange(len(served))
+        by_station = np.argsort(group, kind="stable")
+        rank = np.empty(len(columns), dtype=np.int64)
+        rank[by_station] = np.arange(len(columns)) - np.repeat(np.cumsum(counts) - counts, counts)
+        order = np.lexsort((row[group], rank))
+        self.columns = columns[order]
+        self.cell_leg = (lines * 2 + forward)[order].astype(np.int32)
+        self.cell_station = stations[order].astype(np.int32)
+        self.cells = np.arange(len(columns), dtype=np.int32)
+        self.layers = np.bincount(rank).tolist()
+        self.served = served[busiest]
+        self.row_of = np.full(len(world.station_ids), -1, dtype=np.int32)
+        self.row_of[self.served] = np.arange(len(self.served))
+        self.stop_rows = np.maximum(self.row_of[self.stops], 0)
+
+    # -- queries -----------------------------------------------------------
+
+    def prefetch(self, world: World, origins):
+        """Make sure rows exist for ``origins`` (one query each), planning the missing ones in batches."""
+        origins = np.asarray(origins, dtype=np.int64)
+        if not len(origins):
+            return
+        unique, counts = np.unique(origins, return_counts=True)
+        cached = np.array([(origin, self.bucket) in self.rows for origin in unique.tolist()], dtype=bool)
+        self.queries += len(origins)
+        self.hits += int(counts[cached].sum())
+        missing = unique[~cached].tolist()
+        # planning a handful of origins costs nearly as much as a batch, so
+        # plan ahead: the rows are the same whenever they are computed
+        requested = set(missing)
+        while len(missing) < REFRESH_BATCH and self.pending:
+            origin = self.pending.pop()
+            if origin not in requested and (origin, self.bucket) not in self.rows:
+                missing.append(origin)
+        missing = np.array(missing, dtype=np.int64)
+        for start in range(0, len(missing), SEARCH_BATCH):
+            self._plan(world, missing[start : start + SEARCH_BATCH])
+
+    def row(self, world: World, origin: int) -> PlanRow:
+        """The plans from one origin, for the current bucket."""
+        key = (origin, self.bucket)
+        row = self.rows.get(key)
+        if row is None:
+            self._plan(world, np.array([origin], dtype=np.int64))
+            row = self.rows[key]
+        else:
+            self.rows.move_to_end(key)
+        return row
+
+    def lookup(self, world: World, origin_id: str, dest_id: str) -> Optional[Tuple[str, str, int]]:
+        """Return ``(line_id, alight_station_id, direction)`` for the next leg, or ``None``."""
+        self.sync(world)
+        self.prefetch(world, [world.station_index[origin_id]])
+        row = self.row(world, world.station_index[origin_id])
+        dest = world.station_index[dest_id]
+        if dest >= len(row.leg) or row.leg[dest] < 0:
+            return None
+        leg = int(row.leg[dest])
+        return world.line_ids[leg // 2], world.station_ids[row.alight[dest]], 1 if leg % 2 else -1
+
+    def boarding_targets(self, world: World, station: int, line: int, direction: int, dests: np.ndarray) -> np.ndarray:
+        """Where riders bound for ``dests`` should alight ``line`` heading ``direction`` (-1: don't board)."""
+        row = self.row(world, station)
+        known = dests < len(row.leg)
+        dests = np.where(known, dests, 0)
+        board = known & (row.leg[dests] == line * 2 + (direction > 0))
+        return np.where(board, row.alight[dests], -1)
+
+    # -- search ------------------------------------------------------------
+
+    def _plan(self, world: World, origins: np.ndarray):
+        """Search from ``origins`` and cache their rows."""
+        leg, alight = self._search(origins, len(world.station_ids))
+        leg, alight = leg.T.copy(), alight.T.copy()
+        for index, origin in enumerate(origins.tolist()):
+            self.rows[(origin, self.bucket)] = PlanRow(leg[index], alight[index])
+        while len(self.rows) > self.capacity:
+            self.rows.popitem(last=False)
+
+    def _search(self, origins: np.ndarray, station_count: int):
+        """Plans from each of ``origins`` to every station, as ``(station, origin)`` arrays."""
+        served = self.served
+        leg = np.full((station_count, len(origins)), -1, dtype=np.int32)
+        alight = np.full(leg.shape, -1, dtype=np.int32)
+        rows = np.where(origins < len(self.row_of), self.row_of[np.minimum(origins, len(self.row_of) - 1)], -1)
+        boarding = np.flatnonzero(rows >= 0)
+        if not len(boarding):
+            return leg, alight
+        # one row per served station, so gathering a line's stops reads whole rows
+        labels = np.full((len(served), len(origins)), np.inf, dtype=np.float32)
+        labels[rows[boarding], boarding] = 0.0
+        first = np.full(labels.shape, -1, dtype=np.int32)  # cell where the label's journey first alights
+        best = np.full(labels.shape, np.inf, dtype=np.float32)
+        best[rows[boarding], boarding] = 0.0
+        plan = np.full(labels.shape, -1, dtype=np.int32)
+        improved = np.empty(labels.shape, dtype=bool)
+        cost = np.empty(labels.shape, dtype=np.float32)
+        # the round's arrays are reused, as fresh ones this size cost more to fault in than to fill
+        width, count = self.stops.shape
+        work = _Workspace((width, count, len(origins)), len(self.columns))
+        for ride in range(MAX_RIDES):
+            self._ride_all(labels, first, work)
+            reached, legs = self._group_min(work)
+            np.less(reached, labels, out=improved)
+            if not improved.any():
+                break
+            np.minimum(labels, reached, out=labels)
+            _blend(first, legs, improved)
+            # a journey with more transfers is only better if it arrives earlier
+            np.add(reached, np.float32(ride * TRANSFER_PENALTY_TICKS), out=cost)
+            np.less(cost, best, out=improved)
+            np.minimum(best, cost, out=best)
+            _blend(plan, legs, improved)
+        planned = plan >= 0
+        plan[~planned] = 0
+        leg[served] = np.where(planned, self.cell_leg[plan], -1)
+        alight[served] = np.where(planned, self.cell_station[plan], -1)
+        return leg, alight
+
+    def _ride_all(self, labels: np.ndarray, first: np.ndarray, work: _Workspace):
+        """One round: arrivals at every stop of every line in both directions, and their first legs."""
+        np.take(labels, self.stop_rows, axis=0, out=work.at, mode="clip")  # (stop position, line, origin)
+        np.take(first, self.stop_rows, axis=0, out=work.inherited, mode="clip")
+        width = len(self.stops)
+        total = self.cum[-1]
+        self._ride(work, self.depart[0], self.penalty[0], self.cum, range(width), 0)
+        self._ride(work, self.depart[1], self.penalty[1], total - self.cum, range(width - 1, -1, -1), 1)
+        count = labels.shape[1]
+        np.take(work.arrival.reshape(-1, count), self.columns, axis=0, out=work.reached, mode="clip")
+        np.take(work.legs.reshape(-1, count), self.columns, axis=0, out=work.leg, mode="clip")
+
+    def _ride(self, work: _Workspace, depart, penalty, cum, order, direction: int):
+        """Ride each line one way, visiting stop positions in ``order``.
+
+        A rider reaching stop ``i`` at time ``t`` leaves on the first
+        vehicle at or after ``t`` and is at a later stop ``j``
+        ``cum[j] - cum[i]`` after that, so the best arrival at ``j`` is
+        ``cum[j]`` plus the least ``departure - cum`` over the stops before
+        it. That running minimum is carried along the line, together with
+        the first leg of the journey that achieved it.
+        """
+        headway = self.headway[:, None]
+        value = work.value
+        with np.errstate(invalid="ignore"):
+            # a rider past the next vehicle takes the one after it, a headway later, or the next
+            np.subtract(depart[:, :, None], work.at, out=value)
+            value /= headway
+            np.floor(value, out=value)
+            np.minimum(value, 0.0, out=value)
+            value *= headway
+            np.subtract((depart + penalty - cum)[:, :, None], value, out=value)  # NaN for stops not reached
+        arrival, legs = work.arrival[direction], work.legs[direction]
+        running, leg, better = work.running, work.running_leg, work.better
+        running.fill(np.inf)
+        leg.fill(-1)
+        for j in order:
+            np.add(running, cum[j][:, None], out=arrival[j])
+            legs[j] = leg
+            np.less(value[j], running, out=better)
+            np.fmin(running, value[j], out=running)
+            _blend(leg, work.inherited[j], better)
+
+    def _group_min(self, work: _Workspace):
+        """Earliest arrival at each served station over the lines stopping there, with its first leg."""
+        arrival, legs = work.reached, work.leg
+        # a journey still on its first vehicle alights here
+        np.copyto(legs, self.cells[:, None], where=legs < 0)
+        size = self.layers[0]
+        reached, leg = arrival[:size], legs[:size]
+        start = size
+        for size in self.layers[1:]:
+            candidate = arrival[start : start + size]
+            better = candidate < reached[:size]
+            np.minimum(reached[:size], candidate, out=reached[:size])
+            _blend(leg[:size], legs[start : start + size], better)
+            start += size
+        return reached, leg
+
+
+def _blend(target: np.ndarray, source: np.ndarray, mask: np.ndarray):
+    """``target[mask] = source[mask]`` for integers, without the branches of a masked copy."""
+    step = source - target
+    step *= mask
+    target += step
+
+
+class _Workspace:
+    """Arrays one search reuses from round to round."""
+
+    __slots__ = ("at", "inherited", "value", "arrival", "legs", "running", "running_leg", "better", "reached", "leg")
+
+    def __init__(self, shape, cells: int):
+        self.at = np.empty(shape, dtype=np.float32)
+        self.inherited = np.empty(shape, dtype=np.int32)
+        self.value = np.empty(shape, dtype=np.float32)
+        self.arrival = np.empty((2,) + shape, dtype=np.float32)
+        self.legs = np.empty((2,) + shape, dtype=np.int32)
+        self.running = np.empty(shape[1:], dtype=np.float32)
+        self.running_leg = np.empty(shape[1:], dtype=np.int32)
+        self.better = np.empty(shape[1:], dtype=bool)
+        self.reached = np.empty((cells, shape[2]), dtype=np.float32)
+        self.leg = np.empty((cells, shape[2]), dtype=np.int32)
@@ -0,0 +1,128 @@
+"""Low-overhead section timers for the tick loop, the frame loop and drawing.
+
+Instrumented code asks :data:`PROFILER` for a :class:`Laps` at the start
+of a phase sequence and marks the end of each phase::
+
+    laps = PROFILER.laps()
+    spawn_stations(world)
+    if laps:
+        laps.mark("tick.stations")
+
+While the profiler is disabled ``laps()`` returns ``None`` and each mark
+costs a single truth test, so the instrumentation can stay in shipped
+builds. When enabled, every section keeps its last ``WINDOW`` samples for
+rolling percentiles, and optionally the net number of memory blocks
+allocated during the section.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import sys
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+
+WINDOW = 1024  # samples kept per section for percentiles
+PERCENTILES = (50, 95, 99)
+REPORT_FIELDS = ("section", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "allocs_mean")
+
+
+class Section:
+    __slots__ = ("count", "total", "samples", "allocs")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = np.zeros(WINDOW)
+        self.allocs = np.zeros(WINDOW, dtype=np.int64)
+
+    def add(self, elapsed_ms: float, allocs: int):
+        index = self.count % WINDOW
+        self.samples[index] = elapsed_ms
+        self.allocs[index] = allocs
+        self.count += 1
+        self.total += elapsed_ms
+
+    def summary(self) -> Dict[str, float]:
+        filled = min(self.count, WINDOW)
+        recent = self.samples[:filled]
+        p50, p95, p99 = np.percentile(recent, PERCENTILES) if filled else (0.0, 0.0, 0.0)
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(recent.max()) if filled else 0.0,
+            "allocs_mean": float(self.allocs[:filled].mean()) if filled else 0.0,
+        }
+
+
+class Laps:
+    """Times consecutive phases: each :meth:`mark` closes the phase since the last one."""
+
+    __slots__ = ("profiler", "last", "blocks")
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+        self.blocks = sys.getallocatedblocks() if profiler.track_allocations else 0
+        self.last = time.perf_counter()
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        blocks = 0
+        if self.profiler.track_allocations:
+            current = sys.getallocatedblocks()
+            blocks, self.blocks = current - self.blocks, current
+        self.profiler.record(name, (now - self.last) * 1e3, blocks)
+        self.last = time.perf_counter()
+
+    def skip(self):
+        """Restart the clock without recording, to leave a phase untimed."""
+        self.last = time.perf_counter()
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.track_allocations = True
+        self.sections: Dict[str, Section] = {}
+
+    def laps(self) -> Optional[Laps]:
+        return Laps(self) if self.enabled else None
+
+    def record(self, name: str, elapsed_ms: float, allocs: int = 0):
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = Section()
+        section.add(elapsed_ms, allocs)
+
+    def reset(self):
+        self.sections.clear()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {name: self.sections[name].summary() for name in sorted(self.sections)}
+
+    def write_json(self, path):
+        with open(path, "w") as handle:
+            json.dump(self.report(), handle, indent=2)
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as handle:
+            writer = csv.DictWriter(handle, REPORT_FIELDS)
+            writer.writeheader()
+            for name, summary in self.report().items():
+                writer.writerow(dict(summary, section=name))
+
+    def export(self, path):
+        """Write the report as CSV when ``path`` ends in ``.csv``, JSON otherwise."""
+        if str(path).lower().endswith(".csv"):
+            self.write_csv(path)
+        else:
+            self.write_json(path)
+
+
+PROFILER = Profiler()
@@ -0,0 +1,188 @@
+"""Append-only log of network edits, and headless replay against checksums.
+
+A log is a JSON-lines file. The first record describes how the world was
+created (seed and starting stations, or a snapshot to load); then come
+the ``create_line`` / ``extend_line`` / ``insert_stations`` calls, each
+with the tick it was applied after, and a world checksum every
+``checksum_interval`` ticks. Because all simulation randomness comes from
+the world's seeded streams, replaying the edits on the same ticks
+reproduces the run, and the checksums prove it did.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import runner, simulation, snapshot
+from .changes import FeedCursor, LineCreated, LineExtended, LinesEdited, StationsInserted
+from .models import World
+from .passengers import PassengerStore
+
+
+LOG_VERSION = 4
+CHECKSUM_INTERVAL = 600  # ticks between checksums, ten simulated seconds
+
+OPERATIONS = {
+    "create_line": simulation.create_line,
+    "extend_line": simulation.extend_line,
+    "insert_stations": simulation.insert_stations,
+    "apply_edits": simulation.apply_edits,
+}
+# change record type -> (operation, the record fields that are its arguments)
+RECORDED = {
+    LineCreated: ("create_line", ("station_ids", "color", "mode")),
+    LineExtended: ("extend_line", ("line_id", "station_ids", "at_start")),
+    StationsInserted: ("insert_stations", ("line_id", "station_ids", "after_index")),
+    LinesEdited: ("apply_edits", ("edits",)),
+}
+
+
+def checksum(world: World) -> str:
+    """Digest of the simulation state: network, counters, passengers and vehicles."""
+    digest = hashlib.blake2b(digest_size=16)
+    network = {
+        "tick": world.tick,
+        "stations": [(s.id, s.x, s.y, s.type, s.waiting) for s in world.stations.values()],
+        "lines": [(line.id, line.mode, line.stations) for line in world.lines.values()],
+        "next_serial": world.passengers.next_serial,
+    }
+    digest.update(json.dumps(network, separators=(",", ":")).encode())
+    for name in PassengerStore.COLUMNS:
+        digest.update(np.ascontiguousarray(world.passengers.live(name)))
+    for name in snapshot.VEHICLE_COLUMNS:
+        digest.update(np.ascontiguousarray(getattr(world.movement, name)))
+    return digest.hexdigest()
+
+
+class EventLog:
+    """Records edits made to one world, in memory and optionally to a file.
+
+    Edits are read from the world's change feed after every tick and when
+    the log is closed.
+    """
+
+    def __init__(self, path=None, *, checksum_interval: int = CHECKSUM_INTERVAL):
+        self.path = path
+        self.checksum_interval = checksum_interval
+        self.records: List[Dict] = []
+        self.cursor: Optional[FeedCursor] = None
+        self.handle = open(path, "w") if path is not None else None
+
+    def _append(self, record: Dict):
+        self.records.append(record)
+        if self.handle is not None:
+            self.handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def attach(self, world: World, *, stations: Optional[int] = None, snapshot_path=None):
+        """Start recording ``world``.
+
+        Either the world was just made by ``runner.create_world(stations,
+        seed)``, or it was loaded from ``snapshot_path``; the replay
+        recreates it the same way.
+        """
+        if snapshot_path is None and (world.tick != 0 or stations is None):
+            raise ValueError("Recording a world that is not fresh needs the snapshot it started from")
+        header = {"version": LOG_VERSION, "seed": world.rng.seed, "interval": self.checksum_interval}
+        if snapshot_path is not None:
+            header["snapshot"] = str(snapshot_path)
+        else:
+            header.update(
+                stations=stations,
+                max_stations=world.max_stations,
+                spawn_rate=world.demand.rate,
+                map_size=list(world.map_size),
+            )
+        self._append(header)
+        self.cursor = world.changes.cursor()
+        world.event_log = self
+
+    def _collect(self):
+        changes = self.cursor.poll()
+        if changes is None:
+            raise RuntimeError("Event log fell behind the change feed; edits were lost")
+        for change in changes:
+            recorded = RECORDED.get(type(change))
+            if recorded is not None:
+                op, names = recorded
+                args = {name: getattr(change, name) for name in names}
+                self._append({"t": change.tick, "op": op, "args": args})
+
+    def after_tick(self, world: World):
+        self._collect()
+        if world.tick % self.checksum_interval == 0:
+            self._append({"t": world.tick, "checksum": checksum(world)})
+            if self.handle is not None:
+                self.handle.flush()
+
+    def close(self, world: Optional[World] = None):
+        if world is not None:
+            self._collect()
+            self._append({"t": world.tick, "end": True})
+            world.event_log = None
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def read_log(path) -> List[Dict]:
+    with open(path) as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+@dataclass
+class ReplayResult:
+    world: World
+    stats: runner.RunStats
+    checksums: int
+
+
+def replay(records: List[Dict], *, until: Optional[int] = None) -> ReplayResult:
+    """Re-run a recorded session headlessly, verifying every checksum on the way.
+
+    Raises ``ValueError`` at the first tick whose state differs from the
+    recording.
+    """
+    header, events = records[0], records[1:]
+    if header.get("version") != LOG_VERSION:
+        raise ValueError(f"Unsupported event log version {header.get('version')}")
+    if "snapshot" in header:
+        world = snapshot.load(header["snapshot"])
+    else:
+        world = runner.create_world(header["stations"], header["seed"], header.get("map_size"))
+        world.max_stations = header["max_stations"]
+        world.demand.rate = header["spawn_rate"]
+
+    edits: Dict[int, List[Dict]] = {}
+    expected: Dict[int, str] = {}
+    end = world.tick
+    for record in events:
+        end = max(end, record["t"])
+        if "op" in record:
+            edits.setdefault(record["t"], []).append(record)
+        elif "checksum" in record:
+            expected[record["t"]] = record["checksum"]
+    if until is not None:
+        end = min(end, until)
+
+    tick = simulation.tick
+    checked = 0
+    start = time.perf_counter()
+    ticks = 0
+    while True:
+        for record in edits.get(world.tick, ()):
+            OPERATIONS[record["op"]](world, **record["args"])
+        if world.tick >= end:
+            break
+        tick(world)
+        ticks += 1
+        digest = expected.get(world.tick)
+        if digest is not None:
+            if checksum(world) != digest:
+                raise ValueError(f"Replay diverged from the recording at tick {world.tick}")
+            checked += 1
+    return ReplayResult(world, runner.RunStats(ticks, time.perf_counter() - start), checked)
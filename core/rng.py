@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import random
+import secrets
+from typing import Dict, Optional
+
+import numpy as np
+
+
+STREAMS = ("stations", "passengers", "render")
+ARRAY_STREAMS = ("passengers",)  # numpy generators, for vectorized draws
+
+
+class RandomStreams:
+    """Independent seeded generators, one per consumer.
+
+    Each stream is derived from the world seed and its name, so drawing
+    more numbers in one (say, render jitter) never shifts another (say,
+    passenger spawns) and a seed reproduces a run exactly. Streams in
+    ``ARRAY_STREAMS`` are ``numpy.random.Generator`` objects; the rest are
+    ``random.Random``.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed if seed is not None else secrets.randbits(32)
+        for name in STREAMS:
+            stream = random.Random(f"{self.seed}:{name}")
+            if name in ARRAY_STREAMS:
+                stream = np.random.default_rng(stream.getrandbits(128))
+            setattr(self, name, stream)
+
+    def getstate(self) -> Dict:
+        state = {}
+        for name in STREAMS:
+            stream = getattr(self, name)
+            state[name] = stream.bit_generator.state if name in ARRAY_STREAMS else stream.getstate()
+        return state
+
+    def setstate(self, state: Dict):
+        for name, value in state.items():
+            if name in ARRAY_STREAMS:
+                getattr(self, name).bit_generator.state = value
+            else:
+                version, internal, gauss = value
+                getattr(self, name).setstate((version, tuple(internal), gauss))
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+from . import simulation
+from .models import World
+from .rng import RandomStreams
+
+
+TICK_RATE = 60  # simulation ticks per simulated second
+MAX_CATCH_UP_TICKS = 240
+
+
+@dataclass
+class RunStats:
+    ticks: int
+    elapsed: float
+
+    @property
+    def ticks_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return float("inf") if self.ticks else 0.0
+        return self.ticks / self.elapsed
+
+    @property
+    def simulated_seconds(self) -> float:
+        return self.ticks / TICK_RATE
+
+    def summary(self) -> str:
+        return (
+            f"{self.ticks} ticks in {self.elapsed:.3f}s "
+            f"({self.ticks_per_second:,.0f} ticks/s, "
+            f"{self.simulated_seconds / self.elapsed if self.elapsed > 0 else float('inf'):,.1f}x real time)"
+        )
+
+
+class SimulationClock:
+    """Fixed-timestep accumulator that turns elapsed wall time into whole ticks."""
+
+    def __init__(self, tick_rate: float = TICK_RATE, multiplier: float = 1.0, max_ticks: int = MAX_CATCH_UP_TICKS):
+        self.tick_rate = tick_rate
+        self.multiplier = multiplier
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+
+    @property
+    def step(self) -> float:
+        return 1.0 / self.tick_rate
+
+    @property
+    def alpha(self) -> float:
+        """Fraction of the next tick already accumulated, for render interpolation."""
+        return self.accumulator / self.step
+
+    def advance(self, elapsed: float) -> int:
+        """Add wall-clock seconds and return how many ticks are now due."""
+        self.accumulator += elapsed * self.multiplier
+        due = int(self.accumulator / self.step)
+        if due > self.max_ticks:
+            # Drop the backlog rather than spiralling when ticks cost more than real time.
+            due = self.max_ticks
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= due * self.step
+        return due
+
+
+def create_world(station_count: int = 2, seed: int | None = None, map_size=None) -> World:
+    world = World(rng=RandomStreams(seed))
+    if map_size is not None:
+        world.map_size = tuple(map_size)
+    for index in range(station_count):
+        simulation.spawn_station(world, f"S{index + 1}")
+    return world
+
+
+def run_ticks(world: World, count: int) -> RunStats:
+    """Step the simulation ``count`` times as fast as possible."""
+    tick = simulation.tick
+    start = time.perf_counter()
+    for _ in range(count):
+        tick(world)
+    return RunStats(count, time.perf_counter() - start)
+
+
+def run_for(world: World, seconds: float, batch: int = 256) -> RunStats:
+    """Step the simulation as fast as possible for ``seconds`` of wall time."""
+    tick = simulation.tick
+    start = time.perf_counter()
+    deadline = start + seconds
+    ticks = 0
+    while time.perf_counter() < deadline:
+        for _ in range(batch):
+            tick(world)
+        ticks += batch
+    return RunStats(ticks, time.perf_counter() - start)
+
+
+def run_realtime(world: World, seconds: float, multiplier: float = 1.0, tick_rate: float = TICK_RATE) -> RunStats:
+    """Step the simulation paced to wall time, ``multiplier`` times faster than real time."""
+    clock = SimulationClock(tick_rate=tick_rate, multiplier=multiplier)
+    tick = simulation.tick
+    start = last = time.perf_counter()
+    deadline = start + seconds
+    ticks = 0
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        for _ in range(clock.advance(now - last)):
+            tick(world)
+            ticks += 1
+        last = now
+        remaining = (clock.step - clock.accumulator) / multiplier
+        time.sleep(max(0.0, min(remaining, deadline - time.perf_counter())))
+    return RunStats(ticks, time.perf_counter() - start)
@@ -0,0 +1,443 @@
+"""Asyncio host that runs one world in real time and serves it over TCP.
+
+The protocol is JSON lines in both directions. A client sends commands::
+
+    {"id": 1, "cmd": "create_line", "args": {"station_ids": ["S1", "S2"], "color": [255, 0, 0]}}
+
+and gets ``{"type": "reply", "id": 1, "ok": true, "result": ...}`` back, or
+``"ok": false`` with an ``"error"`` message. Commands are applied between
+ticks. ``apply_edits`` takes a whole list of ``[operation, arguments]``
+line edits, as for a network import, and applies all of them or none.
+After ``subscribe``, the client also receives a telemetry message every
+``telemetry_interval`` ticks:
+
+* ``{"type": "full", ...}``: every station and line plus the metrics,
+  sent first and again whenever the client has to resynchronize;
+* ``{"type": "delta", ...}``: new stations, lines whose stops changed,
+  stations whose waiting count changed, and the metrics.
+
+Deltas carry absolute values, so applying one on top of a newer full
+state is harmless. Each telemetry message is encoded once and shared by
+all subscribers. The tick loop only ever appends to per-client buffers.
+When a subscriber falls ``queue_limit`` messages behind, its backlog is
+discarded and it receives a fresh full state instead, so a slow client
+costs memory bounded by the limit and never stalls the simulation.
+
+The ``spawn`` command changes the world outside the recorded line edits,
+so an event log attached to the world will not replay such a session.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+import numpy as np
+
+from . import simulation
+from .changes import (
+    LINE_CHANGES,
+    LinesEdited,
+    PassengerAbandoned,
+    PassengerAlighted,
+    PassengerBoarded,
+    PassengerSpawned,
+    StationSpawned,
+)
+from .models import World
+from .modes import DEFAULT_MODE
+from .passengers import PassengerState
+from .runner import TICK_RATE, SimulationClock
+
+
+DEFAULT_PORT = 7878
+TELEMETRY_INTERVAL = 6  # ticks between telemetry messages, 10 per simulated second
+QUEUE_LIMIT = 64  # telemetry messages buffered per subscriber before it is resynced
+REPLY_LIMIT = 256  # replies buffered per client before its commands stop being read
+WAITING_CHANGES = (PassengerBoarded, PassengerAlighted)  # passenger records that move one station's count
+
+
+def _encode(message: Dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def _station_entry(station) -> Dict:
+    return {"id": station.id, "x": station.x, "y": station.y, "type": station.type, "name": station.name}
+
+
+def _line_entry(line) -> Dict:
+    return {
+        "id": line.id,
+        "color": list(line.color),
+        "mode": line.mode,
+        "stations": list(line.stations),
+        "revision": line.revision,
+    }
+
+
+class Client:
+    """One connection: buffered replies and telemetry, drained by its own writer task."""
+
+    def __init__(self, writer: asyncio.StreamWriter, queue_limit: int):
+        self.writer = writer
+        self.queue_limit = queue_limit
+        self.replies: Deque[bytes] = deque()
+        self.telemetry: Deque[bytes] = deque()
+        self.subscribed = False
+        self.resync = True
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+        self.replies_drained = asyncio.Event()
+        self.replies_drained.set()
+
+    def reply(self, message: Dict):
+        self.replies.append(_encode(message))
+        if len(self.replies) >= REPLY_LIMIT:
+            self.replies_drained.clear()
+        self.wakeup.set()
+
+    def offer(self, delta: bytes, full: Callable[[], bytes]):
+        """Queue this interval's telemetry without waiting; called from the tick loop."""
+        if len(self.telemetry) >= self.queue_limit:
+            self.dropped += len(self.telemetry)
+            self.telemetry.clear()
+            self.resync = True
+        if self.resync:
+            self.telemetry.append(full())
+            self.resync = False
+        else:
+            self.telemetry.append(delta)
+        self.wakeup.set()
+
+    async def pump(self):
+        """Write buffered messages as fast as the peer reads them."""
+        writer = self.writer
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.replies or self.telemetry:
+                    if self.replies:
+                        data = self.replies.popleft()
+                        if not self.replies:
+                            self.replies_drained.set()
+                    else:
+                        data = self.telemetry.popleft()
+                    writer.write(data)
+                    await writer.drain()
+        except ConnectionError:
+            pass  # the reader side notices the closed connection
+
+
+class SimulationServer:
+    """Runs ``world`` at ``tick_rate`` x ``multiplier`` and serves the protocol above."""
+
+    def __init__(
+        self,
+        world: World,
+        *,
+        tick_rate: float = TICK_RATE,
+        multiplier: float = 1.0,
+        telemetry_interval: int = TELEMETRY_INTERVAL,
+        queue_limit: int = QUEUE_LIMIT,
+    ):
+        self.world = world
+        self.clock = SimulationClock(tick_rate=tick_rate, multiplier=multiplier)
+        self.telemetry_interval = telemetry_interval
+        self.queue_limit = queue_limit
+        self.clients: Set[Client] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.ticks = 0
+        self.tick_seconds = 0.0
+        self.started = 0.0
+        self.published = 0
+        self._ticker: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # state as of the last telemetry message, for deltas
+        self._cursor = world.changes.cursor()
+        self._waiting: List[int] = []
+        self._waiting_total = 0
+        self._commands = {
+            "create_line": self._create_line,
+            "extend_line": self._extend_line,
+            "insert_stations": self._insert_stations,
+            "apply_edits": self._apply_edits,
+            "spawn": self._spawn,
+            "subscribe": self._subscribe,
+            "unsubscribe": self._unsubscribe,
+            "status": self._status,
+            "stats": self._stats,
+        }
+
+    # -- lifecycle ---------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        """Listen and start ticking; returns the bound ``(host, port)``."""
+        self.server = await asyncio.start_server(self._serve_client, host, port)
+        self.started = time.perf_counter()
+        self._rescan()
+        self._ticker = asyncio.create_task(self._tick_loop())
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        await self._ticker
+
+    async def close(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self.server is not None:
+            self.server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        for client in list(self.clients):
+            client.writer.close()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    @property
+    def ticks_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.ticks / elapsed if elapsed > 0 else 0.0
+
+    # -- simulation --------------------------------------------------------
+
+    async def _tick_loop(self):
+        clock = self.clock
+        tick = simulation.tick
+        world = self.world
+        last = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            due = clock.advance(now - last)
+            last = now
+            if due:
+                for _ in range(due):
+                    tick(world)
+                self.ticks += due
+                self.tick_seconds += time.perf_counter() - now
+                if world.tick // self.telemetry_interval != (world.tick - due) // self.telemetry_interval:
+                    self._publish()
+            await asyncio.sleep(max(0.0, (clock.step - clock.accumulator) / clock.multiplier))
+
+    def _metrics(self) -> Dict:
+        store = self.world.passengers
+        waiting = self._waiting_total
+        return {
+            "waiting": waiting,
+            "onboard": store.active - waiting,
+            "arrived": store.retired[PassengerState.ARRIVED],
+            "abandoned": store.retired[PassengerState.ABANDONED],
+            "tick_ms": self.tick_seconds / self.ticks * 1e3 if self.ticks else 0.0,
+            "ticks_per_second": self.ticks_per_second,
+            "window": self.world.stats.world_summary(self.world),
+        }
+
+    def _full(self) -> Dict:
+        world = self.world
+        return {
+            "type": "full",
+            "tick": world.tick,
+            "stations": [_station_entry(world.stations[station_id]) for station_id in world.station_ids],
+            "lines": [_line_entry(world.lines[line_id]) for line_id in world.line_ids],
+            "waiting": dict(zip(world.station_ids, self._waiting)),
+            "metrics": self._metrics(),
+        }
+
+    def _delta(self) -> Optional[Dict]:
+        """What changed since the last message, from the change feed; ``None`` after falling behind it."""
+        world = self.world
+        changes = self._cursor.poll()
+        if changes is None:
+            self._rescan()
+            return None
+        new_stations: List[str] = []
+        edited: Set[str] = set()
+        touched: Set[int] = set()
+        for change in changes:
+            kind = type(change)
+            if kind is StationSpawned:
+                new_stations.append(change.station_id)
+            elif kind is LinesEdited:
+                edited.update(change.line_ids)
+            elif kind in LINE_CHANGES:
+                edited.add(change.line_id)
+            elif kind is PassengerSpawned:
+                touched.update(np.unique(change.origins).tolist())
+            elif kind is PassengerAbandoned:
+                touched.update(np.unique(change.stations).tolist())
+            elif kind in WAITING_CHANGES:
+                touched.add(change.station)
+
+        stations = world.station_ids
+        previous = self._waiting
+        known = len(previous)
+        previous.extend(0 for _ in range(len(stations) - known))
+        touched.update(range(known, len(stations)))
+        waiting = {}
+        for index in sorted(touched):
+            count = world.stations[stations[index]].waiting
+            if count != previous[index] or index >= known:
+                self._waiting_total += count - previous[index]
+                previous[index] = count
+                waiting[stations[index]] = count
+        return {
+            "type": "delta",
+            "tick": world.tick,
+            "stations": [_station_entry(world.stations[station_id]) for station_id in new_stations],
+            "lines": [_line_entry(world.lines[line_id]) for line_id in sorted(edited, key=world.line_index.get)],
+            "waiting": waiting,
+            "metrics": self._metrics(),
+        }
+
+    def _rescan(self):
+        """Take the whole world as the delta baseline, for a start or after falling behind the feed."""
+        world = self.world
+        self._cursor.skip()
+        self._waiting = [world.stations[station_id].waiting for station_id in world.station_ids]
+        self._waiting_total = sum(self._waiting)
+
+    def _publish(self):
+        subscribers = [client for client in self.clients if client.subscribed]
+        message = self._delta()  # always advance the delta baseline
+        if not subscribers:
+            return
+        if message is None:
+            for client in subscribers:
+                client.resync = True
+        delta = _encode(message) if message is not None else b""
+        full: List[bytes] = []
+
+        def full_state() -> bytes:
+            if not full:
+                full.append(_encode(self._full()))
+            return full[0]
+
+        for client in subscribers:
+            client.offer(delta, full_state)
+        self.published += 1
+
+    # -- connections -------------------------------------------------------
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = Client(writer, self.queue_limit)
+        self.clients.add(client)
+        pump = asyncio.create_task(client.pump())
+        self._tasks.add(pump)
+        try:
+            while True:
+                await client.replies_drained.wait()
+                line = await reader.readline()
+                if not line:
+                    break
+                self._handle(client, line)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # peer went away, or sent a line over the stream limit
+        finally:
+            self.clients.discard(client)
+            pump.cancel()
+            self._tasks.discard(pump)
+            writer.close()
+
+    def _handle(self, client: Client, line: bytes):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get("id")
+            command = self._commands.get(request.get("cmd"))
+            if command is None:
+                raise ValueError(f"Unknown command: {request.get('cmd')}")
+            args = request.get("args", {})
+            if not isinstance(args, dict):
+                raise ValueError("args must be a JSON object")
+            result = command(client, **args)
+        except (ValueError, TypeError, KeyError) as error:
+            client.reply({"type": "reply", "id": request_id, "ok": False, "error": str(error)})
+            return
+        client.reply({"type": "reply", "id": request_id, "ok": True, "result": result})
+
+    # -- commands ----------------------------------------------------------
+
+    def _create_line(self, client: Client, station_ids, color=(255, 255, 255), mode=DEFAULT_MODE):
+        return {"line": simulation.create_line(self.world, station_ids, color, mode).id}
+
+    def _extend_line(self, client: Client, line_id, station_ids, at_start=False):
+        return _line_entry(simulation.extend_line(self.world, line_id, station_ids, at_start=bool(at_start)))
+
+    def _insert_stations(self, client: Client, line_id, station_ids, after_index):
+        return _line_entry(simulation.insert_stations(self.world, line_id, station_ids, after_index=int(after_index)))
+
+    def _apply_edits(self, client: Client, edits):
+        """Many line edits as ``[operation, arguments]`` pairs, applied all or none."""
+        if not isinstance(edits, list) or not all(isinstance(edit, list) and len(edit) == 2 for edit in edits):
+            raise ValueError("edits must be a list of [operation, arguments] pairs")
+        return {"lines": [_line_entry(line) for line in simulation.apply_edits(self.world, edits)]}
+
+    def _spawn(self, client: Client, rate=None, max_stations=None, passengers=0):
+        """Adjust the demand rate or station cap, and optionally add passengers now."""
+        world = self.world
+        passengers = int(passengers)
+        if rate is not None and rate < 0:
+            raise ValueError("Spawn rate cannot be negative")
+        if passengers < 0:
+            raise ValueError("Passenger count cannot be negative")
+        if rate is not None:
+            world.demand.rate = float(rate)
+        if max_stations is not None:
+            world.max_stations = int(max_stations)
+        # with fewer than two stations there is nowhere to go, so nobody spawns
+        origins, dests = world.demand.sample(world, passengers)
+        if len(origins):
+            simulation.spawn_passengers(world, origins, dests)
+        return {"rate": world.demand.rate, "max_stations": world.max_stations, "spawned": len(origins)}
+
+    def _subscribe(self, client: Client):
+        client.subscribed = True
+        client.resync = True
+        return {"interval": self.telemetry_interval}
+
+    def _unsubscribe(self, client: Client):
+        client.subscribed = False
+        client.telemetry.clear()
+        return {"dropped": client.dropped}
+
+    def _status(self, client: Client):
+        world = self.world
+        return {
+            "tick": world.tick,
+            "stations": len(world.stations),
+            "lines": len(world.lines),
+            "passengers": len(world.passengers),
+            "clients": len(self.clients),
+            "subscribers": sum(1 for other in self.clients if other.subscribed),
+            "ticks_per_second": self.ticks_per_second,
+            "dropped": client.dropped,
+        }
+
+    def _stats(self, client: Client, station_id=None, line_id=None):
+        """Rolling-window stats for one station, one line, or the whole world."""
+        world = self.world
+        if station_id is not None:
+            if station_id not in world.stations:
+                raise ValueError(f"Unknown station id: {station_id}")
+            return world.stats.station_summary(world, station_id)
+        if line_id is not None:
+            if line_id not in world.lines:
+                raise ValueError(f"Unknown line id: {line_id}")
+            return world.stats.line_summary(world, line_id)
+        return world.stats.world_summary(world)
+
+
+async def serve(world: World, host: str = "127.0.0.1", port: int = DEFAULT_PORT, **options):
+    """Run a :class:`SimulationServer` until cancelled."""
+    server = SimulationServer(world, **options)
+    bound = await server.start(host, port)
+    print(f"serving tick {world.tick} on {bound[0]}:{bound[1]}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
@@ -1,8 +1,20 @@
 from __future__ import annotations
 
-import random
-
-from .models import Line, Passenger, Station, World
+import numpy as np
+
+from .changes import (
+    LineCreated,
+    LineExtended,
+    LinesEdited,
+    PassengerAbandoned,
+    PassengerSpawned,
+    StationSpawned,
+    StationsInserted,
+)
+from .models import Line, Station, World
+from .modes import DEFAULT_MODE, get_mode
+from .passengers import PassengerState, parse_passenger_id
+from .profiler import PROFILER
 
 
 STATION_TYPES = [
@@ -13,6 +25,10 @@ STATION_TYPES = [
     "Commercial",
 ]
 
+PASSENGER_PATIENCE_TICKS = 60 * 120  # waiting passengers give up after two simulated minutes
+ABANDON_CHECK_INTERVAL = 60
+STATION_MARGIN = 50  # distance kept between spawned stations and the map edge
+
 
 def generate_station_name(counter: int) -> str:
     alphabet = [chr(ord('a') + i) for i in range(26)]
@@ -24,26 +40,64 @@ def generate_station_name(counter: int) -> str:
 
 
 def spawn_station(world: World, id_: str):
-    x, y = random.randint(50, 600), random.randint(50, 400)
-    station_type = random.choice(STATION_TYPES)
+    rng = world.rng.stations
+    width, height = world.map_size
+    x, y = rng.randint(STATION_MARGIN, width - STATION_MARGIN), rng.randint(STATION_MARGIN, height - STATION_MARGIN)
+    station_type = rng.choice(STATION_TYPES)
     station_name = generate_station_name(world.station_name_counter)
     world.station_name_counter += 1
     station = Station(id=id_, x=x, y=y, type=station_type, name=station_name)
     world.stations[station.id] = station
+    world.station_index[station.id] = len(world.station_ids)
+    world.station_ids.append(station.id)
+    world.station_grid.insert(station.id, station.x, station.y)
+    world.changes.emit(StationSpawned(world.tick, station.id))
+
 
+def spawn_passengers(world: World, origins, dests):
+    """Add many waiting passengers at once, given station indices."""
+    slots = world.passengers.spawn(origins, dests, world.tick)
+    for origin, count in zip(*np.unique(world.passengers.origin[slots], return_counts=True)):
+        world.stations[world.station_ids[origin]].waiting += int(count)
+    world.movement.enqueue(world, slots)
+    world.changes.emit(PassengerSpawned(world.tick, slots, world.passengers.origin[slots]))
+    return slots
 
-def spawn_passenger(world: World, id_: str):
-    if len(world.stations) < 2:
+
+def spawn_passenger(world: World, id_: str | None = None):
+    if len(world.station_ids) < 2:
         return
 
-    origin_id, dest_id = random.sample(list(world.stations.keys()), 2)
-    passenger = Passenger(id=id_, origin=origin_id, dest=dest_id)
-    world.passengers[passenger.id] = passenger
-    world.stations[origin_id].waiting += 1
+    if id_ is not None:
+        serial = parse_passenger_id(id_)
+        if serial < world.passengers.next_serial:
+            raise ValueError(f"Passenger id already issued: {id_}")
+        world.passengers.next_serial = serial
+    origins, dests = world.demand.sample(world, 1)
+    spawn_passengers(world, origins, dests)
+
 
+def abandon_waiting(world: World, patience: int = PASSENGER_PATIENCE_TICKS):
+    """Retire passengers who have waited longer than ``patience`` ticks since spawning."""
+    store = world.passengers
+    expired = np.flatnonzero(
+        (store.live("state") == PassengerState.WAITING) & (world.tick - store.live("spawned") > patience)
+    )
+    if len(expired):
+        world.changes.emit(PassengerAbandoned(world.tick, expired, store.station[expired]))
+        world.movement.dequeue(world, expired)
+        store.retire(expired, PassengerState.ABANDONED)
+    return expired
 
-def create_line(world: World, station_ids, color):
-    """Create a transit line connecting an ordered sequence of stations."""
+
+def _touch_line(world: World, line: Line):
+    line.revision += 1
+    world.topology_revision += 1
+
+
+def create_line(world: World, station_ids, color, mode: str = DEFAULT_MODE):
+    """Create a transit line of the given mode connecting an ordered sequence of stations."""
+    get_mode(mode)
     station_ids = list(station_ids)
     if len(station_ids) < 2:
         raise ValueError("Line requires at least two stations")
@@ -55,12 +109,14 @@ def create_line(world: World, station_ids, color):
             raise ValueError(f"Unknown station id: {station_id}")
 
     line_id = f"L{len(world.lines) + 1}"
-    line = Line(id=line_id, color=color, stations=list(station_ids))
+    line = Line(id=line_id, color=tuple(color), stations=list(station_ids), mode=mode)
     world.lines[line.id] = line
+    world.line_index[line.id] = len(world.line_ids)
+    world.line_ids.append(line.id)
+    _touch_line(world, line)
+    world.serve(line, station_ids)
 
-    for station_id in station_ids:
-        world.stations[station_id].connected = True
-
+    world.changes.emit(LineCreated(world.tick, line.id, list(station_ids), line.color, line.mode))
     return line
 
 
@@ -80,17 +136,19 @@ def extend_line(world: World, line_id: str, station_ids, *, at_start: bool = Fal
     for station_id in additions:
         if station_id not in world.stations:
             raise ValueError(f"Unknown station id: {station_id}")
-        if station_id in line.stations:
+        if line.serves(station_id):
             raise ValueError("Station already exists on this line")
 
     if at_start:
-        line.stations = list(reversed(additions)) + line.stations
+        line.stations[0:0] = reversed(additions)
+        line.reindex()
     else:
         line.stations.extend(additions)
+        line.reindex(len(line.stations) - len(additions))
+    _touch_line(world, line)
+    world.serve(line, additions)
 
-    for station_id in additions:
-        world.stations[station_id].connected = True
-
+    world.changes.emit(LineExtended(world.tick, line_id, additions, at_start))
     return line
 
 
@@ -114,31 +172,252 @@ def insert_stations(world: World, line_id: str, station_ids, *, after_index: int
     for station_id in additions:
         if station_id not in world.stations:
             raise ValueError(f"Unknown station id: {station_id}")
-        if station_id in line.stations:
+        if line.serves(station_id):
             raise ValueError("Station already exists on this line")
 
     insert_pos = after_index + 1
     line.stations[insert_pos:insert_pos] = additions
+    line.reindex(insert_pos)
+    _touch_line(world, line)
+    world.serve(line, additions)
 
-    for station_id in additions:
-        world.stations[station_id].connected = True
-
+    world.changes.emit(StationsInserted(world.tick, line_id, additions, after_index))
     return line
 
 
+class LineBatch:
+    """Line edits queued now and applied together by :meth:`commit`, all or none.
+
+    The methods mirror ``create_line``, ``extend_line`` and
+    ``insert_stations``. ``create_line`` returns the id the line will get,
+    so later edits in the batch can refer to it. As a context manager the
+    batch commits when the block ends without an exception::
+
+        with LineBatch(world) as batch:
+            line_id = batch.create_line(["S1", "S2"], (255, 0, 0))
+            batch.extend_line(line_id, ["S3"])
+    """
+
+    def __init__(self, world: World):
+        self.world = world
+        self.edits: list = []
+        self.first_line = len(world.lines) + 1  # number in the id of the first line created
+        self.created = 0
+
+    def __len__(self) -> int:
+        return len(self.edits)
+
+    def __enter__(self) -> LineBatch:
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        if kind is None:
+            self.commit()
+
+    def create_line(self, station_ids, color, mode: str = DEFAULT_MODE) -> str:
+        self.edits.append(("create_line", {"station_ids": list(station_ids), "color": list(color), "mode": mode}))
+        self.created += 1
+        return f"L{self.first_line + self.created - 1}"
+
+    def extend_line(self, line_id: str, station_ids, *, at_start: bool = False):
+        self.edits.append(("extend_line", {"line_id": line_id, "station_ids": list(station_ids), "at_start": bool(at_start)}))
+
+    def insert_stations(self, line_id: str, station_ids, *, after_index: int):
+        self.edits.append(("insert_stations", {"line_id": line_id, "station_ids": list(station_ids), "after_index": int(after_index)}))
+
+    def commit(self) -> list[Line]:
+        """Apply the queued edits; see :func:`apply_edits`. The batch is empty afterwards, unless they failed."""
+        if self.first_line != len(self.world.lines) + 1:
+            raise ValueError("Lines were created outside the batch; its line ids no longer hold")
+        lines = apply_edits(self.world, self.edits)
+        self.edits, self.created = [], 0
+        self.first_line = len(self.world.lines) + 1
+        return lines
+
+
+def _stage_edits(world: World, edits) -> dict:
+    """Check ``edits`` in order against the network they build up; return the resulting stops per line.
+
+    Nothing in ``world`` changes. Raises ``ValueError`` naming the first
+    edit that fails, with the message the single-edit function would give.
+    """
+    staged: dict = {}  # line id -> [stations, set of them, color, mode]; color is None for existing lines
+    stations = world.stations
+    next_line = len(world.lines) + 1
+
+    def line_stops(line_id):
+        entry = staged.get(line_id)
+        if entry is None:
+            line = world.lines.get(line_id)
+            if line is None:
+                raise ValueError(f"Unknown line id: {line_id}")
+            entry = staged[line_id] = [list(line.stations), set(line.positions), None, line.mode]
+        return entry
+
+    def check_additions(served, additions, duplicate_message):
+        if len(set(additions)) != len(additions):
+            raise ValueError(duplicate_message)
+        for station_id in additions:
+            if station_id not in stations:
+                raise ValueError(f"Unknown station id: {station_id}")
+            if station_id in served:
+                raise ValueError("Station already exists on this line")
+
+    for number, (op, args) in enumerate(edits):
+        try:
+            if op == "create_line":
+                get_mode(args.get("mode", DEFAULT_MODE))
+                station_ids = list(args["station_ids"])
+                if len(station_ids) < 2:
+                    raise ValueError("Line requires at least two stations")
+                check_additions((), station_ids, "Line cannot include the same station twice")
+                staged[f"L{next_line}"] = [station_ids, set(station_ids), tuple(args["color"]), args.get("mode", DEFAULT_MODE)]
+                next_line += 1
+            elif op == "extend_line":
+                stops, served = line_stops(args["line_id"])[:2]
+                additions = list(args["station_ids"])
+                check_additions(served, additions, "Cannot add the same station multiple times in one extension")
+                if args.get("at_start", False):
+                    stops[0:0] = reversed(additions)
+                else:
+                    stops.extend(additions)
+                served.update(additions)
+            elif op == "insert_stations":
+                stops, served = line_stops(args["line_id"])[:2]
+                additions = list(args["station_ids"])
+                if not additions:
+                    continue
+                after_index = args["after_index"]
+                if len(stops) < 2:
+                    raise ValueError("Line must have at least two stations to insert between")
+                if after_index < 0 or after_index >= len(stops) - 1:
+                    raise ValueError("Insertion index out of range")
+                check_additions(served, additions, "Cannot insert the same station multiple times")
+                stops[after_index + 1 : after_index + 1] = additions
+                served.update(additions)
+            else:
+                raise ValueError(f"Unknown line edit: {op}")
+        except KeyError as missing:
+            raise ValueError(f"Edit {number} ({op}): missing argument {missing}") from None
+        except ValueError as error:
+            raise ValueError(f"Edit {number} ({op}): {error}") from None
+    # edits that added nothing leave their line alone
+    return {line_id: entry for line_id, entry in staged.items() if entry[2] is not None or len(entry[0]) != len(world.lines[line_id].stations)}
+
+
+def apply_edits(world: World, edits) -> list[Line]:
+    """Apply many line edits at once, all of them or none; return the lines created or changed.
+
+    ``edits`` is a sequence of ``(operation, arguments)`` pairs, where the
+    operation is ``"create_line"``, ``"extend_line"`` or
+    ``"insert_stations"`` and the arguments are those of that function, by
+    name. Each edit sees the ones before it, so a batch can create a line
+    and then extend it as ``"L<n>"``. Everything is validated before the
+    world changes. Each touched line, and the topology, gets one revision,
+    and the change feed a single :class:`LinesEdited` record, so consumers
+    rebuild once for the whole batch.
+    """
+    laps = PROFILER.laps()
+    edits = [(op, dict(args)) for op, args in edits]
+    staged = _stage_edits(world, edits)
+    if laps:
+        laps.mark("edits.validate")
+    if not staged:
+        return []
+
+    # undo information: previous stops of edited lines, and every (station, line index) newly served
+    previous = {line_id: (world.lines[line_id].stations, world.lines[line_id].revision) for line_id in staged if line_id in world.lines}
+    line_count = len(world.line_ids)
+    served = []
+    touched = []
+    try:
+        for line_id, (stops, _, color, mode) in staged.items():
+            line = world.lines.get(line_id)
+            if line is None:
+                line = Line(id=line_id, color=color, stations=stops, mode=mode)
+                world.lines[line_id] = line
+                world.line_index[line_id] = len(world.line_ids)
+                world.line_ids.append(line_id)
+                added = stops
+            else:
+                known = line.positions
+                added = [station_id for station_id in stops if station_id not in known]
+                line.stations = stops
+                line.reindex()
+            line.revision += 1
+            line_index = world.line_index[line_id]
+            served.extend((station_id, line_index) for station_id in added)
+            world.serve(line, added)
+            touched.append(line)
+    except BaseException:
+        _rollback_edits(world, previous, line_count, served)
+        raise
+    world.topology_revision += 1
+    world.changes.emit(LinesEdited(world.tick, edits, [line.id for line in touched]))
+    if laps:
+        laps.mark("edits.apply")
+    return touched
+
+
+def _rollback_edits(world: World, previous: dict, line_count: int, served: list):
+    """Undo a partly applied :func:`apply_edits`."""
+    for line_id, (stops, revision) in previous.items():
+        line = world.lines[line_id]
+        line.stations = stops
+        line.revision = revision
+        line.positions.clear()
+        line.reindex()
+    for line_id in world.line_ids[line_count:]:
+        world.lines.pop(line_id, None)
+        world.line_index.pop(line_id, None)
+    del world.line_ids[line_count:]
+    for station_id, line_index in served:
+        lines = world.station_lines.get(station_id)
+        if lines is not None:
+            lines.discard(line_index)
+            if not lines:
+                del world.station_lines[station_id]
+        world.stations[station_id].connected = bool(lines)
+
+
 def tick(world: World):
+    laps = PROFILER.laps()
     world.tick += 1
 
     # spawn new stations occasionally
-    if world.tick % 420 == 0:
+    if world.tick % 420 == 0 and (world.max_stations is None or len(world.stations) < world.max_stations):
         station_id = f"S{len(world.stations) + 1}"
         spawn_station(world, station_id)
-
-    # spawn passengers frequently
-    if world.tick % 60 == 0:
-        passenger_id = f"P{len(world.passengers) + 1}"
-        spawn_passenger(world, passenger_id)
-
-    # TODO: simulate passenger movement on lines
-
-
+    if laps:
+        laps.mark("tick.stations")
+
+    # spawn passengers from the demand model
+    origins, dests = world.demand.draw(world)
+    if len(origins):
+        spawn_passengers(world, origins, dests)
+    if laps:
+        laps.mark("tick.demand")
+
+    world.planner.sync(world)
+    if len(origins):
+        world.planner.prefetch(world, origins)
+    if laps:
+        laps.mark("tick.routes")
+
+    world.movement.step(world)
+    if laps:
+        laps.mark("tick.movement")
+
+    if world.tick % ABANDON_CHECK_INTERVAL == 0:
+        abandon_waiting(world)
+        if laps:
+            laps.mark("tick.abandon")
+
+    world.stats.update(world)
+    if laps:
+        laps.mark("tick.stats")
+
+    if world.event_log is not None:
+        world.event_log.after_tick(world)
+        if laps:
+            laps.mark("tick.event_log")
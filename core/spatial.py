@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+
+DEFAULT_CELL_SIZE = 64.0
+DEFAULT_SEGMENT_CELL_SIZE = 256.0
+
+
+class SpatialGrid:
+    """Uniform hash grid over points, each with an optional hit radius.
+
+    Point queries only visit the cells within reach of the query, so
+    lookups stay near constant time however many entries the grid holds.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Dict[Hashable, Tuple[float, float, float]]] = {}
+        self.entries: Dict[Hashable, Tuple[float, float, float, Tuple[int, int]]] = {}
+        self.max_radius = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, key: Hashable, x: float, y: float, radius: float = 0.0):
+        """Add ``key`` at ``(x, y)``, moving it if it is already indexed."""
+        if key in self.entries:
+            self.remove(key)
+        cell = self._cell(x, y)
+        self.cells.setdefault(cell, {})[key] = (x, y, radius)
+        self.entries[key] = (x, y, radius, cell)
+        if radius > self.max_radius:
+            self.max_radius = radius
+
+    def remove(self, key: Hashable):
+        x, y, radius, cell = self.entries.pop(key)
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.max_radius = 0.0
+
+    def _candidates(self, x0: float, y0: float, x1: float, y1: float):
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        cells = self.cells
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            # the query covers more cells than are occupied; walk the occupied ones
+            for (cx, cy), bucket in cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield from bucket.items()
+            return
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield from bucket.items()
+
+    def within(self, x: float, y: float, radius: float = 0.0) -> List[Hashable]:
+        """Keys whose hit circle intersects the circle of ``radius`` around ``(x, y)``."""
+        reach = radius + self.max_radius
+        found = []
+        for key, (ex, ey, er) in self._candidates(x - reach, y - reach, x + reach, y + reach):
+            limit = radius + er
+            dx = ex - x
+            dy = ey - y
+            if dx * dx + dy * dy <= limit * limit:
+                found.append(key)
+        return found
+
+    def hit(self, x: float, y: float, radius: float = 0.0) -> Optional[Hashable]:
+        """Nearest key whose hit circle intersects the query circle, or ``None``."""
+        reach = radius + self.max_radius
+        best = None
+        best_distance = math.inf
+        for key, (ex, ey, er) in self._candidates(x - reach, y - reach, x + reach, y + reach):
+            limit = radius + er
+            dx = ex - x
+            dy = ey - y
+            distance = dx * dx + dy * dy
+            if distance <= limit * limit and distance < best_distance:
+                best = key
+                best_distance = distance
+        return best
+
+    def along(self, x0: float, y0: float, x1: float, y1: float, radius: float = 0.0) -> List[Hashable]:
+        """Keys whose hit circle comes within ``radius`` of the segment, ordered from ``(x0, y0)``.
+
+        This is what a circle of ``radius`` sweeping the segment touches.
+        Only the cells along the segment are visited, not its bounding box.
+        """
+        reach = radius + self.max_radius
+        dx = x1 - x0
+        dy = y1 - y0
+        length_sq = dx * dx + dy * dy
+        found = []
+        for key, (ex, ey, er) in self._swept_candidates(x0, y0, x1, y1, reach):
+            t = min(1.0, max(0.0, ((ex - x0) * dx + (ey - y0) * dy) / length_sq)) if length_sq else 0.0
+            limit = radius + er
+            ox = ex - x0 - t * dx
+            oy = ey - y0 - t * dy
+            if ox * ox + oy * oy <= limit * limit:
+                found.append((t, key))
+        found.sort(key=lambda item: item[0])
+        return [key for _, key in found]
+
+    def _swept_candidates(self, x0: float, y0: float, x1: float, y1: float, reach: float):
+        if x0 > x1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        size = self.cell_size
+        cells = self.cells
+        slope = (y1 - y0) / (x1 - x0) if x1 > x0 else 0.0
+        for cx in range(int(math.floor((x0 - reach) / size)), int(math.floor((x1 + reach) / size)) + 1):
+            # the part of the segment within reach of this column, and the rows it spans
+            left = min(max(cx * size - reach, x0), x1)
+            right = max(min((cx + 1) * size + reach, x1), x0)
+            ya = y0 + (left - x0) * slope
+            yb = y0 + (right - x0) * slope if x1 > x0 else y1
+            low = int(math.floor((min(ya, yb) - reach) / size))
+            high = int(math.floor((max(ya, yb) + reach) / size))
+            for cy in range(low, high + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield from bucket.items()
+
+    def in_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[Hashable]:
+        """Keys whose hit circle overlaps the axis-aligned rectangle."""
+        reach = self.max_radius
+        found = []
+        for key, (ex, ey, er) in self._candidates(x0 - reach, y0 - reach, x1 + reach, y1 + reach):
+            if x0 - er <= ex <= x1 + er and y0 - er <= ey <= y1 + er:
+                found.append(key)
+        return found
+
+
+class SegmentGrid:
+    """Uniform hash grid over line segments, for finding those inside a rectangle.
+
+    Each segment is listed in every cell it passes through, so a rectangle
+    query visits only the cells it overlaps, and a long diagonal segment
+    costs cells along its length rather than across its bounding box.
+    """
+
+    def __init__(self, cell_size: float = DEFAULT_SEGMENT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Dict[Hashable, Tuple[float, float, float, float]]] = {}
+        self.entries: Dict[Hashable, Tuple[Tuple[float, float, float, float], List[Tuple[int, int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, key: Hashable, x0: float, y0: float, x1: float, y1: float):
+        """Add the segment ``key`` from ``(x0, y0)`` to ``(x1, y1)``, replacing any earlier one."""
+        if key in self.entries:
+            self.remove(key)
+        box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        cx0, cy0 = self._cell(box[0], box[1])
+        cx1, cy1 = self._cell(box[2], box[3])
+        if cx0 == cx1:
+            cells = [(cx0, cy) for cy in range(cy0, cy1 + 1)]
+        else:
+            # walk the columns, covering the rows the segment spans within each
+            size = self.cell_size
+            slope = (y1 - y0) / (x1 - x0)
+            cells = []
+            for cx in range(cx0, cx1 + 1):
+                left = y0 + (max(box[0], cx * size) - x0) * slope
+                right = y0 + (min(box[2], (cx + 1) * size) - x0) * slope
+                low = int(math.floor(min(left, right) / size))
+                high = int(math.floor(max(left, right) / size))
+                cells.extend((cx, cy) for cy in range(low, high + 1))
+        for cell in cells:
+            self.cells.setdefault(cell, {})[key] = box
+        self.entries[key] = (box, cells)
+
+    def remove(self, key: Hashable):
+        _, cells = self.entries.pop(key)
+        for cell in cells:
+            bucket = self.cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def in_rect(self, x0: float, y0: float, x1: float, y1: float, margin: float = 0.0) -> Set[Hashable]:
+        """Keys of segments whose bounding box, grown by ``margin``, overlaps the rectangle."""
+        x0, y0, x1, y1 = x0 - margin, y0 - margin, x1 + margin, y1 + margin
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        found: Set[Hashable] = set()
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            buckets = (bucket for (cx, cy), bucket in self.cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1)
+        else:
+            buckets = (self.cells.get((cx, cy)) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1))
+        for bucket in buckets:
+            if not bucket:
+                continue
+            for key, (bx0, by0, bx1, by1) in bucket.items():
+                if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                    found.add(key)
+        return found
@@ -0,0 +1,299 @@
+"""Rolling-window statistics per station, per line and for the whole world.
+
+The engine reads the world's change feed once per tick and folds each
+record into time-bucketed sums. A window is ``WINDOW_BUCKETS`` buckets of
+``BUCKET_TICKS`` ticks kept as a ring, next to a running total per entity.
+Adding a value touches one bucket cell and one total. Reading a windowed
+value is one lookup. Once per bucket the oldest bucket is subtracted from
+the totals and reused.
+
+Time-weighted figures are integrated between changes rather than sampled:
+
+* overcrowding is the ticks a station spent with ``waiting`` above its
+  ``capacity``;
+* load is passengers on board times ticks, and the load factor divides it
+  by the seats across the line's vehicles.
+
+Open intervals are credited to their bucket when it closes, so bucket
+boundaries cost O(stations + lines) once per bucket and nothing per tick.
+
+Stats are derived state and are not saved in snapshots. A restored world,
+or an engine that fell behind the feed, starts again from the passengers
+currently in the store.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+import numpy as np
+
+from .changes import (
+    FeedCursor,
+    PassengerAbandoned,
+    PassengerAlighted,
+    PassengerArrived,
+    PassengerBoarded,
+    PassengerSpawned,
+)
+from .passengers import PassengerState
+
+if TYPE_CHECKING:
+    from .models import World
+
+
+BUCKET_TICKS = 300  # five simulated seconds per bucket
+WINDOW_BUCKETS = 12  # rolling window of one simulated minute
+
+STATION_METRICS = ("spawns", "boardings", "arrivals", "abandoned", "wait_ticks", "trip_ticks", "crowded_ticks")
+LINE_METRICS = ("boardings", "arrivals", "trip_ticks", "load_ticks")
+WORLD_METRICS = ("spawns", "boardings", "arrivals", "abandoned", "wait_ticks", "trip_ticks")
+
+
+class RollingWindow:
+    """Per-entity sums of named metrics over a ring of time buckets."""
+
+    def __init__(self, metrics: Sequence[str], buckets: int = WINDOW_BUCKETS, entities: int = 0):
+        self.columns = {name: column for column, name in enumerate(metrics)}
+        self.buckets = np.zeros((buckets, entities, len(metrics)))
+        self.totals = np.zeros((entities, len(metrics)))
+        self.row = 0
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def resize(self, entities: int):
+        if entities <= len(self.totals):
+            return
+        grown = np.zeros((len(self.buckets), entities, self.totals.shape[1]))
+        grown[:, : len(self.totals)] = self.buckets
+        self.buckets = grown
+        totals = np.zeros((entities, self.totals.shape[1]))
+        totals[: len(self.totals)] = self.totals
+        self.totals = totals
+
+    def add(self, entity, metric: str, amount=1.0):
+        """Add ``amount`` to the current bucket; ``entity`` and ``amount`` may be arrays."""
+        column = self.columns[metric]
+        if np.ndim(entity):
+            np.add.at(self.buckets[self.row, :, column], entity, amount)
+            np.add.at(self.totals[:, column], entity, amount)
+        else:
+            self.buckets[self.row, entity, column] += amount
+            self.totals[entity, column] += amount
+
+    def add_all(self, metric: str, amounts: np.ndarray):
+        """Add one amount per entity, for every entity at once."""
+        column = self.columns[metric]
+        self.buckets[self.row, : len(amounts), column] += amounts
+        self.totals[: len(amounts), column] += amounts
+
+    def advance(self):
+        """Start a new bucket, dropping the oldest from the totals."""
+        self.row = (self.row + 1) % len(self.buckets)
+        self.totals -= self.buckets[self.row]
+        self.buckets[self.row] = 0.0
+
+    def get(self, entity: int, metric: str) -> float:
+        return float(self.totals[entity, self.columns[metric]])
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return float(numerator / denominator) if denominator > 0 else 0.0
+
+
+class StatsEngine:
+    """Windowed spawns, boardings, arrivals, wait and trip times, load and crowding."""
+
+    def __init__(self, buckets: int = WINDOW_BUCKETS, bucket_ticks: int = BUCKET_TICKS):
+        self.bucket_ticks = bucket_ticks
+        self.cursor: Optional[FeedCursor] = None
+        self.started = 0
+        self.bucket = 0
+        self.stations = RollingWindow(STATION_METRICS, buckets)
+        self.lines = RollingWindow(LINE_METRICS, buckets)
+        self.world = RollingWindow(WORLD_METRICS, buckets, entities=1)
+        # per passenger slot: tick spawned and tick the current wait began
+        self.spawned = np.zeros(0, dtype=np.int64)
+        self.since = np.zeros(0, dtype=np.int64)
+        # open intervals for the time-weighted metrics
+        self.crowded_since = np.zeros(0, dtype=np.int64)  # -1 while not overcrowded
+        self.onboard = np.zeros(0, dtype=np.int64)
+        self.load_since = np.zeros(0, dtype=np.int64)
+
+    # -- maintenance -------------------------------------------------------
+
+    def _grow(self, world: World):
+        stations, lines = len(world.station_ids), len(world.line_ids)
+        if stations > len(self.stations):
+            self.crowded_since = np.concatenate((self.crowded_since, np.full(stations - len(self.stations), -1, dtype=np.int64)))
+            self.stations.resize(stations)
+        if lines > len(self.lines):
+            missing = lines - len(self.lines)
+            self.onboard = np.concatenate((self.onboard, np.zeros(missing, dtype=np.int64)))
+            self.load_since = np.concatenate((self.load_since, np.full(missing, world.tick, dtype=np.int64)))
+            self.lines.resize(lines)
+        capacity = world.passengers.capacity
+        if capacity > len(self.spawned):
+            self.spawned = np.concatenate((self.spawned, np.zeros(capacity - len(self.spawned), dtype=np.int64)))
+            self.since = np.concatenate((self.since, np.zeros(capacity - len(self.since), dtype=np.int64)))
+
+    def _resync(self, world: World):
+        """Rebuild the per-passenger and open-interval state from the world as it is now."""
+        now = world.tick
+        if self.cursor is None:
+            self.started = now
+            self.bucket = now // self.bucket_ticks
+        self.cursor = world.changes.cursor()
+        self._grow(world)
+        store = world.passengers
+        self.spawned[: store.size] = store.live("spawned")
+        self.since[: store.size] = store.live("spawned")
+        onboard = store.in_state(PassengerState.ONBOARD)
+        self.onboard[:] = np.bincount(store.line[onboard], minlength=len(self.onboard))[: len(self.onboard)]
+        self.load_since[:] = now
+        self.crowded_since[:] = -1
+        for index in range(len(world.station_ids)):
+            self._touch_station(world, index, now)
+
+    def _close_bucket(self, end: int):
+        """Credit open intervals up to tick ``end`` to the current bucket, then start the next."""
+        crowded = self.crowded_since >= 0
+        if crowded.any():
+            self.stations.add(np.flatnonzero(crowded), "crowded_ticks", end - self.crowded_since[crowded])
+            self.crowded_since[crowded] = end
+        self.lines.add_all("load_ticks", self.onboard * (end - self.load_since))
+        self.load_since[:] = end
+        for window in (self.stations, self.lines, self.world):
+            window.advance()
+        self.bucket += 1
+
+    def _touch_station(self, world: World, index: int, now: int):
+        station = world.stations[world.station_ids[index]]
+        if station.waiting > station.capacity:
+            if self.crowded_since[index] < 0:
+                self.crowded_since[index] = now
+        elif self.crowded_since[index] >= 0:
+            self.stations.add(index, "crowded_ticks", now - self.crowded_since[index])
+            self.crowded_since[index] = -1
+
+    def _load(self, line: int, delta: int, now: int):
+        self.lines.add(line, "load_ticks", self.onboard[line] * (now - self.load_since[line]))
+        self.load_since[line] = now
+        self.onboard[line] += delta
+
+    def update(self, world: World):
+        """Fold the changes since the last call into the windows; called once per tick."""
+        now = world.tick
+        if self.cursor is None or self.cursor.feed is not world.changes:
+            self._resync(world)
+            return
+        changes = self.cursor.poll()
+        self._grow(world)
+        while self.bucket < now // self.bucket_ticks:
+            self._close_bucket((self.bucket + 1) * self.bucket_ticks)
+        if changes is None:
+            self._resync(world)
+            return
+
+        stations, totals = self.stations, self.world
+        touched = set()
+        for change in changes:
+            kind = type(change)
+            if kind is PassengerSpawned:
+                slots = change.slots
+                self.spawned[slots] = now
+                self.since[slots] = now
+                stations.add(change.origins, "spawns")
+                totals.add(0, "spawns", len(slots))
+                touched.update(np.unique(change.origins).tolist())
+            elif kind is PassengerBoarded:
+                count = len(change.slots)
+                waited = float((now - self.since[change.slots]).sum())
+                stations.add(change.station, "boardings", count)
+                stations.add(change.station, "wait_ticks", waited)
+                self.lines.add(change.line, "boardings", count)
+                totals.add(0, "boardings", count)
+                totals.add(0, "wait_ticks", waited)
+                self._load(change.line, count, now)
+                touched.add(change.station)
+            elif kind is PassengerAlighted:
+                self.since[change.slots] = now
+                self._load(change.line, -len(change.slots), now)
+                touched.add(change.station)
+            elif kind is PassengerArrived:
+                count = len(change.slots)
+                trip = float((now - self.spawned[change.slots]).sum())
+                stations.add(change.station, "arrivals", count)
+                stations.add(change.station, "trip_ticks", trip)
+                self.lines.add(change.line, "arrivals", count)
+                self.lines.add(change.line, "trip_ticks", trip)
+                totals.add(0, "arrivals", count)
+                totals.add(0, "trip_ticks", trip)
+                self._load(change.line, -count, now)
+            elif kind is PassengerAbandoned:
+                stations.add(change.stations, "abandoned")
+                totals.add(0, "abandoned", len(change.slots))
+                touched.update(np.unique(change.stations).tolist())
+        for index in touched:
+            self._touch_station(world, index, now)
+
+    # -- queries -----------------------------------------------------------
+
+    def window_ticks(self, world: World) -> int:
+        """Ticks the windows currently cover: the full buckets plus the one in progress."""
+        current = world.tick - self.bucket * self.bucket_ticks
+        return max(0, min(world.tick - self.started, (len(self.world.buckets) - 1) * self.bucket_ticks + current))
+
+    def station_summary(self, world: World, station_id: str) -> Dict[str, float]:
+        index = world.station_index[station_id]
+        station = world.stations[station_id]
+        if index >= len(self.stations):
+            return {"waiting": station.waiting, "capacity": station.capacity}
+        get = self.stations.get
+        crowded = get(index, "crowded_ticks")
+        if self.crowded_since[index] >= 0:
+            crowded += world.tick - self.crowded_since[index]
+        boardings, arrivals = get(index, "boardings"), get(index, "arrivals")
+        return {
+            "waiting": station.waiting,
+            "capacity": station.capacity,
+            "spawns": get(index, "spawns"),
+            "boardings": boardings,
+            "arrivals": arrivals,
+            "abandoned": get(index, "abandoned"),
+            "avg_wait_ticks": _ratio(get(index, "wait_ticks"), boardings),
+            "avg_trip_ticks": _ratio(get(index, "trip_ticks"), arrivals),
+            "crowded_fraction": min(1.0, _ratio(crowded, self.window_ticks(world))),
+        }
+
+    def line_summary(self, world: World, line_id: str) -> Dict[str, float]:
+        index = world.line_index[line_id]
+        seats = world.movement.line_seats(index)
+        if index >= len(self.lines):
+            return {"onboard": 0, "seats": seats, "load_factor": 0.0}
+        get = self.lines.get
+        onboard = int(self.onboard[index])
+        load = get(index, "load_ticks") + onboard * (world.tick - self.load_since[index])
+        arrivals = get(index, "arrivals")
+        return {
+            "onboard": onboard,
+            "seats": seats,
+            "load_factor": _ratio(onboard, seats),
+            "avg_load_factor": _ratio(load, seats * self.window_ticks(world)),
+            "boardings": get(index, "boardings"),
+            "arrivals": arrivals,
+            "avg_trip_ticks": _ratio(get(index, "trip_ticks"), arrivals),
+        }
+
+    def world_summary(self, world: World) -> Dict[str, float]:
+        get = self.world.get
+        boardings, arrivals = get(0, "boardings"), get(0, "arrivals")
+        return {
+            "window_ticks": self.window_ticks(world),
+            "spawns": get(0, "spawns"),
+            "boardings": boardings,
+            "arrivals": arrivals,
+            "abandoned": get(0, "abandoned"),
+            "avg_wait_ticks": _ratio(get(0, "wait_ticks"), boardings),
+            "avg_trip_ticks": _ratio(get(0, "trip_ticks"), arrivals),
+        }
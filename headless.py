@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from core import replay, runner, server, snapshot
+from core.profiler import PROFILER
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Transit Empire simulation without a window.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--ticks", type=int, help="run exactly N ticks as fast as possible")
+    mode.add_argument("--seconds", type=float, help="run as fast as possible for T wall-clock seconds")
+    mode.add_argument("--replay", metavar="LOG", help="re-run a recorded event log, verifying its checksums")
+    mode.add_argument(
+        "--serve",
+        type=int,
+        nargs="?",
+        const=server.DEFAULT_PORT,
+        metavar="PORT",
+        help=f"run in real time and accept JSON-lines commands and subscribers on PORT (default {server.DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--realtime",
+        type=float,
+        metavar="MULTIPLIER",
+        help="pace ticks to wall time at MULTIPLIER x real time (use with --seconds or --serve)",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on with --serve")
+    parser.add_argument("--stations", type=int, default=2, help="stations to create before the run")
+    parser.add_argument("--map-size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="area new stations spawn in")
+    parser.add_argument("--seed", type=int, help="seed for the world's random streams")
+    parser.add_argument("--load", metavar="PATH", help="start from a snapshot instead of a fresh world")
+    parser.add_argument("--base", metavar="PATH", help="full snapshot that a --load delta snapshot applies to")
+    parser.add_argument("--save", metavar="PATH", help="write a snapshot of the world after the run")
+    parser.add_argument("--profile", metavar="PATH", help="time each tick phase and write percentiles to PATH (.json or .csv)")
+    return parser.parse_args(argv)
+
+
+def run(world, args):
+    if args.serve is not None:
+        start, ticks = time.perf_counter(), world.tick
+        try:
+            asyncio.run(server.serve(world, args.host, args.serve, multiplier=args.realtime or 1.0))
+        except KeyboardInterrupt:
+            pass
+        return runner.RunStats(world.tick - ticks, time.perf_counter() - start)
+    if args.realtime is not None:
+        return runner.run_realtime(world, args.seconds if args.seconds is not None else 10.0, args.realtime)
+    if args.seconds is not None:
+        return runner.run_for(world, args.seconds)
+    return runner.run_ticks(world, args.ticks if args.ticks is not None else runner.TICK_RATE * 60)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    PROFILER.enabled = args.profile is not None
+    if args.replay:
+        result = replay.replay(replay.read_log(args.replay))
+        world, stats = result.world, result.stats
+        print(f"replay matched {result.checksums} checksums")
+    else:
+        if args.load:
+            world = snapshot.load(args.load, base_path=args.base)
+        else:
+            world = runner.create_world(args.stations, args.seed, args.map_size)
+        stats = run(world, args)
+
+    print(stats.summary())
+    print(
+        f"world tick {world.tick}: {len(world.stations)} stations, "
+        f"{len(world.passengers)} active passengers ({world.passengers.spawned_total} spawned)"
+    )
+    if args.profile:
+        PROFILER.export(args.profile)
+        print(f"wrote tick profile to {args.profile}")
+    if args.save:
+        size = snapshot.save(world, args.save)
+        print(f"saved {size:,} bytes to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
+import argparse
+
 from ui.game import run_game
 
 if __name__ == "__main__":
-    run_game()
+    parser = argparse.ArgumentParser(description="Play Transit Empire.")
+    parser.add_argument("--seed", type=int, help="seed for the world's random streams")
+    parser.add_argument("--record", metavar="LOG", help="record network edits to LOG for headless replay")
+    parser.add_argument("--stations", type=int, default=2, help="stations to start with")
+    parser.add_argument("--map-size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="area new stations spawn in")
+    args = parser.parse_args()
+    run_game(seed=args.seed, record=args.record, map_size=args.map_size, stations=args.stations)
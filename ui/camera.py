@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import numpy as np
+
+MIN_ZOOM = 0.02
+MAX_ZOOM = 4.0
+DETAIL_ZOOM = 0.5  # below this, draw the simplified level of detail
+WHEEL_ZOOM_STEP = 1.15
+KEY_PAN_SPEED = 600  # screen pixels per second
+
+
+class Camera:
+    """Pan and zoom over the world: ``screen = (world - (x, y)) * zoom``.
+
+    ``(x, y)`` is the world point at the top-left corner of the screen. At
+    the default position and zoom, world and screen coordinates coincide.
+    """
+
+    def __init__(self, size, x: float = 0.0, y: float = 0.0, zoom: float = 1.0):
+        self.size = size
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+
+    @property
+    def key(self):
+        """Changes whenever anything drawn in world space would move on screen."""
+        return self.x, self.y, self.zoom
+
+    @property
+    def detailed(self) -> bool:
+        return self.zoom >= DETAIL_ZOOM
+
+    # -- transforms --------------------------------------------------------
+
+    def to_screen(self, x: float, y: float) -> tuple[int, int]:
+        return int((x - self.x) * self.zoom), int((y - self.y) * self.zoom)
+
+    def to_world(self, pos) -> tuple[float, float]:
+        return pos[0] / self.zoom + self.x, pos[1] / self.zoom + self.y
+
+    def transform(self, xs: np.ndarray, ys: np.ndarray):
+        """Screen coordinates of many world points, as integer arrays."""
+        return (
+            ((xs - self.x) * self.zoom).astype(np.int64),
+            ((ys - self.y) * self.zoom).astype(np.int64),
+        )
+
+    def scale(self, length: float, minimum: int = 1) -> int:
+        """A world-space length in screen pixels, never below ``minimum``."""
+        return max(minimum, int(round(length * self.zoom)))
+
+    def visible(self, margin: float = 0.0) -> tuple[float, float, float, float]:
+        """The world rectangle on screen as ``(x0, y0, x1, y1)``, grown by ``margin`` world units."""
+        width, height = self.size
+        return (
+            self.x - margin,
+            self.y - margin,
+            self.x + width / self.zoom + margin,
+            self.y + height / self.zoom + margin,
+        )
+
+    # -- movement ----------------------------------------------------------
+
+    def pan(self, dx: float, dy: float):
+        """Move the view by ``(dx, dy)`` screen pixels."""
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+
+    def zoom_at(self, factor: float, pos):
+        """Zoom by ``factor``, keeping the world point under screen position ``pos`` in place."""
+        anchor_x, anchor_y = self.to_world(pos)
+        self.zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom * factor))
+        self.x = anchor_x - pos[0] / self.zoom
+        self.y = anchor_y - pos[1] / self.zoom
+
+    def fit(self, width: float, height: float):
+        """Centre the world rectangle from the origin to ``(width, height)``, zooming out until it fits."""
+        screen_width, screen_height = self.size
+        self.zoom = max(MIN_ZOOM, min(1.0, screen_width / width, screen_height / height))
+        self.x = (width - screen_width / self.zoom) / 2
+        self.y = (height - screen_height / self.zoom) / 2
@@ -1,261 +1,79 @@
 from __future__ import annotations
 
-import math
-import random
 import sys
 
-from core import simulation
-from core.models import Station, World
+from core import replay, runner, simulation
+from core.models import World
+from core.profiler import PROFILER
+from ui.camera import KEY_PAN_SPEED, Camera
+from ui.geometry import GeometryCache
+from ui.input import EXTEND, INSERT, LINE_COLORS, NEW, InputController
+from ui.render import HOVER_COLOR, LINE_WIDTH, LayeredRenderer, draw_handle, handle_key
+from ui.text import TextPanel
 
-LINE_COLORS = [
-    (239, 71, 111),
-    (17, 138, 178),
-    (6, 214, 160),
-    (255, 209, 102),
-    (17, 45, 78),
-    (149, 125, 173),
-]
-
-LINE_WIDTH = 6
-STATION_DRAW_RADIUS = 12
 HOVER_RING_RADIUS = 18
-STATION_SELECT_RADIUS = 20
-END_HANDLE_STEM_LENGTH = 18
-END_HANDLE_CAP_HALF_WIDTH = 10
-END_HANDLE_HIT_RADIUS = 14
-SEGMENT_HANDLE_RADIUS = 6
-SEGMENT_HANDLE_HIT_RADIUS = 12
-EDGE_OFFSET_DISTANCE = 8
-HOVER_COLOR = (255, 255, 255)
-DEFAULT_STATION_COLOR = (200, 200, 200)
-CONNECTED_STATION_COLOR = (0, 0, 0)
-
+PROFILER_PANEL_REFRESH = 30  # frames between overlay redraws
+PROFILER_PANEL_ROWS = 16
 
-def lighten_color(color, factor: float = 0.6):
-    """Return a lightened version of the given RGB color."""
-    return tuple(min(255, int(c + (255 - c) * factor)) for c in color)
 
+def draw_station_panel(surface, station, font, summary=None, panel: TextPanel | None = None):
+    """Station details, plus rolling-window figures from ``StatsEngine.station_summary``.
 
-def draw_station_panel(surface, station, font):
-    import pygame
-
+    With a ``panel``, the panel surface is only laid out again when the text changes.
+    """
     lines = [
         f"Station {station.name}",
         f"Type: {station.type}",
         f"Passengers: {station.waiting}/{station.capacity}",
     ]
-    padding = 12
-    line_height = font.get_linesize()
-    width = max(font.size(line)[0] for line in lines) + padding * 2
-    height = line_height * len(lines) + padding * 2
-    panel_rect = pygame.Rect(16, surface.get_height() - height - 16, width, height)
-
-    pygame.draw.rect(surface, (28, 30, 44), panel_rect)
-    pygame.draw.rect(surface, (90, 120, 200), panel_rect, 2)
-
-    y = panel_rect.top + padding
-    for line in lines:
-        text_surf = font.render(line, True, (235, 235, 245))
-        surface.blit(text_surf, (panel_rect.left + padding, y))
-        y += line_height
-
-
-def station_at_position(world: World, pos: tuple[int, int], radius: int = STATION_SELECT_RADIUS) -> Station | None:
-    px, py = pos
-    radius_sq = radius * radius
-    for station in world.stations.values():
-        dx = station.x - px
-        dy = station.y - py
-        if dx * dx + dy * dy <= radius_sq:
-            return station
-    return None
-
-
-def build_end_handle(line_id: str, origin: Station, neighbor: Station, color, *, is_start: bool, offset: float = 0.0):
-    dx = origin.x - neighbor.x
-    dy = origin.y - neighbor.y
-    distance = math.hypot(dx, dy)
-    if distance == 0:
-        return None
-
-    dir_x = dx / distance
-    dir_y = dy / distance
-
-    perp_x, perp_y = -dir_y, dir_x
-
-    offset_x = perp_x * offset
-    offset_y = perp_y * offset
-
-    stem_inner = (
-        origin.x + dir_x * STATION_DRAW_RADIUS + offset_x,
-        origin.y + dir_y * STATION_DRAW_RADIUS + offset_y,
-    )
-    stem_outer = (
-        origin.x + dir_x * (STATION_DRAW_RADIUS + END_HANDLE_STEM_LENGTH) + offset_x,
-        origin.y + dir_y * (STATION_DRAW_RADIUS + END_HANDLE_STEM_LENGTH) + offset_y,
-    )
-
-    cap_start = (
-        stem_outer[0] + perp_x * END_HANDLE_CAP_HALF_WIDTH,
-        stem_outer[1] + perp_y * END_HANDLE_CAP_HALF_WIDTH,
-    )
-    cap_end = (
-        stem_outer[0] - perp_x * END_HANDLE_CAP_HALF_WIDTH,
-        stem_outer[1] - perp_y * END_HANDLE_CAP_HALF_WIDTH,
-    )
-
-    return {
-        "kind": "end",
-        "line_id": line_id,
-        "station_id": origin.id,
-        "is_start": is_start,
-        "pos": stem_outer,
-        "stem_inner": stem_inner,
-        "stem_outer": stem_outer,
-        "cap_start": cap_start,
-        "cap_end": cap_end,
-        "color": color,
-        "hit_radius": END_HANDLE_HIT_RADIUS,
-    }
-
-
-def build_segment_handle(line_id: str, left: Station, right: Station, color, index: int, offset: float = 0.0):
-    midpoint = ((left.x + right.x) * 0.5, (left.y + right.y) * 0.5)
-    dx = right.x - left.x
-    dy = right.y - left.y
-    length = math.hypot(dx, dy)
-    if length != 0 and offset != 0:
-        perp_x = -dy / length
-        perp_y = dx / length
-        midpoint = (midpoint[0] + perp_x * offset, midpoint[1] + perp_y * offset)
-    return {
-        "kind": "segment",
-        "line_id": line_id,
-        "index": index,
-        "pos": midpoint,
-        "left_station_id": left.id,
-        "right_station_id": right.id,
-        "color": color,
-        "hit_radius": SEGMENT_HANDLE_HIT_RADIUS,
-    }
-
-
-def build_line_handles(world: World, edge_usage: dict[tuple[str, str], list[str]] | None = None):
-    if edge_usage is None:
-        edge_usage = compute_edge_usage(world)
-
-    handles = []
-    for line in world.lines.values():
-        station_objs = [world.stations[sid] for sid in line.stations if sid in world.stations]
-        if len(station_objs) < 2:
-            continue
-
-        first_edge = tuple(sorted((line.stations[0], line.stations[1])))
-        first_siblings = edge_usage.get(first_edge, [line.id])
-        first_offset = lane_offset(first_siblings.index(line.id)) if len(first_siblings) > 1 else 0.0
-        start_handle = build_end_handle(line.id, station_objs[0], station_objs[1], line.color, is_start=True, offset=first_offset)
-
-        last_edge = tuple(sorted((line.stations[-2], line.stations[-1])))
-        last_siblings = edge_usage.get(last_edge, [line.id])
-        last_offset = lane_offset(last_siblings.index(line.id)) if len(last_siblings) > 1 else 0.0
-        end_handle = build_end_handle(line.id, station_objs[-1], station_objs[-2], line.color, is_start=False, offset=last_offset)
-
-        if start_handle:
-            handles.append(start_handle)
-        if end_handle:
-            handles.append(end_handle)
-
-        for index in range(len(station_objs) - 1):
-            edge_key = tuple(sorted((line.stations[index], line.stations[index + 1])))
-            siblings = edge_usage.get(edge_key, [line.id])
-            offset_amount = lane_offset(siblings.index(line.id)) if len(siblings) > 1 else 0.0
-            segment_handle = build_segment_handle(line.id, station_objs[index], station_objs[index + 1], line.color, index, offset=offset_amount)
-            handles.append(segment_handle)
-    return handles
-
-
-def handle_at_position(handles, pos: tuple[int, int], default_radius: int = END_HANDLE_HIT_RADIUS):
-    px, py = pos
-    for handle in handles:
-        hx, hy = handle["pos"]
-        radius = handle.get("hit_radius", default_radius)
-        dx = hx - px
-        dy = hy - py
-        if dx * dx + dy * dy <= radius * radius:
-            return handle
-    return None
-
-
-def draw_handle(surface, handle, highlight: bool = False):
+    if summary is not None and "boardings" in summary:
+        lines.append(f"Boarded: {summary['boardings']:.0f}  Avg wait: {summary['avg_wait_ticks'] / runner.TICK_RATE:.1f}s")
+        lines.append(f"Overcrowded: {summary['crowded_fraction']:.0%}")
+    image = (panel if panel is not None else TextPanel()).render(lines, font)
+    return surface.blit(image, (16, surface.get_height() - image.get_height() - 16))
+
+
+def render_profiler_panel(font):
+    """Rolling tick/frame timings as a translucent panel surface."""
     import pygame
 
-    color = HOVER_COLOR if highlight else handle["color"]
-    if handle["kind"] == "end":
-        stem_inner = (int(handle["stem_inner"][0]), int(handle["stem_inner"][1]))
-        stem_outer = (int(handle["stem_outer"][0]), int(handle["stem_outer"][1]))
-        cap_start = (int(handle["cap_start"][0]), int(handle["cap_start"][1]))
-        cap_end = (int(handle["cap_end"][0]), int(handle["cap_end"][1]))
-        pygame.draw.line(surface, color, stem_inner, stem_outer, LINE_WIDTH)
-        pygame.draw.line(surface, color, cap_start, cap_end, LINE_WIDTH)
-    else:
-        center = (int(handle["pos"][0]), int(handle["pos"][1]))
-        radius = SEGMENT_HANDLE_RADIUS + (2 if highlight else 0)
-        pygame.draw.circle(surface, handle["color"], center, SEGMENT_HANDLE_RADIUS)
-        if highlight:
-            pygame.draw.circle(surface, color, center, radius, 2)
-
-
-def gather_station_points(world: World, station_ids):
+    report = PROFILER.report()
+    rows = sorted(report.items(), key=lambda item: item[1]["p95_ms"], reverse=True)[:PROFILER_PANEL_ROWS]
+    table = [("section", "p50", "p95", "p99", "alloc")]
+    for name, summary in rows:
+        table.append((
+            name,
+            f"{summary['p50_ms']:.2f}",
+            f"{summary['p95_ms']:.2f}",
+            f"{summary['p99_ms']:.2f}",
+            f"{summary['allocs_mean']:.0f}",
+        ))
+    padding, gap = 8, 12
+    line_height = font.get_linesize()
+    widths = [max(font.size(row[column])[0] for row in table) for column in range(len(table[0]))]
+    width = sum(widths) + gap * (len(widths) - 1) + padding * 2
+    panel = pygame.Surface((width, line_height * len(table) + padding * 2), pygame.SRCALPHA)
+    panel.fill((10, 10, 16, 210))
+    for row_index, row in enumerate(table):
+        x = padding
+        for column, (cell, cell_width) in enumerate(zip(row, widths)):
+            text = font.render(cell, True, (235, 235, 245))
+            offset = 0 if column == 0 else cell_width - text.get_width()  # numbers right-aligned
+            panel.blit(text, (x + offset, padding + row_index * line_height))
+            x += cell_width + gap
+    return panel
+
+
+def gather_station_points(world: World, station_ids, camera: Camera):
     points = []
     for station_id in station_ids:
         station = world.stations.get(station_id)
         if station:
-            points.append((int(station.x), int(station.y)))
+            points.append(camera.to_screen(station.x, station.y))
     return points
 
 
-def compute_edge_usage(world: World) -> dict[tuple[str, str], list[str]]:
-    usage: dict[tuple[str, str], list[str]] = {}
-    for line_id, line in world.lines.items():
-        stations = line.stations
-        for idx in range(len(stations) - 1):
-            key = tuple(sorted((stations[idx], stations[idx + 1])))
-            usage.setdefault(key, []).append(line_id)
-    return usage
-
-
-def lane_offset(index: int) -> float:
-    if index == 0:
-        return 0.0
-    steps = (index + 1) // 2
-    direction = 1 if index % 2 == 1 else -1
-    return steps * EDGE_OFFSET_DISTANCE * direction
-
-
-def offset_segment(start: tuple[float, float], end: tuple[float, float], offset: float) -> tuple[tuple[int, int], tuple[int, int]]:
-    if offset == 0:
-        return (
-            (int(round(start[0])), int(round(start[1]))),
-            (int(round(end[0])), int(round(end[1]))),
-        )
-    dx = end[0] - start[0]
-    dy = end[1] - start[1]
-    length = math.hypot(dx, dy)
-    if length == 0:
-        return (
-            (int(round(start[0])), int(round(start[1]))),
-            (int(round(end[0])), int(round(end[1]))),
-        )
-    perp_x = -dy / length
-    perp_y = dx / length
-    ox = perp_x * offset
-    oy = perp_y * offset
-    return (
-        (int(round(start[0] + ox)), int(round(start[1] + oy))),
-        (int(round(end[0] + ox)), int(round(end[1] + oy))),
-    )
-
-def run_game():
+def run_game(seed: int | None = None, record: str | None = None, map_size=None, stations: int = 2):
     try:
         import pygame
     except Exception:
@@ -267,310 +85,153 @@ def run_game():
     screen = pygame.display.set_mode((width, height))
     clock = pygame.time.Clock()
     font = pygame.font.SysFont("arial", 16)
-
-    world = World()
-    simulation.spawn_station(world, "S1")
-    simulation.spawn_station(world, "S2")
-
-    color_index = 0
-    cursor_pos = (0, 0)
-
-    dragging = False
-    drag_mode: str | None = None  # "new", "extend", "insert"
-
-    active_line_stations: list[str] = []
-
-    extend_line_id: str | None = None
-    extend_from_start = False
-    extend_anchor_station: str | None = None
-    extend_new_stations: list[str] = []
-
-    insert_line_id: str | None = None
-    insert_segment_index: int | None = None
-    insert_anchor_left: str | None = None
-    insert_anchor_right: str | None = None
-    insert_target_station: str | None = None
-
-    hover_station_id: str | None = None
-    hover_handle = None
-    selected_station_id: str | None = None
+    panel_font = pygame.font.SysFont("arial", 13)
+    profiler_panel = None
+    station_panel = TextPanel()
+    frame_number = 0
+
+    world = runner.create_world(stations, seed, map_size)
+    event_log = None
+    if record is not None:
+        event_log = replay.EventLog(record)
+        event_log.attach(world, stations=stations)
+    sim_clock = runner.SimulationClock()
+
+    camera = Camera((width, height))
+    if world.map_size[0] > width or world.map_size[1] > height:
+        camera.fit(*world.map_size)
+    geometry = GeometryCache()
+    renderer = LayeredRenderer((width, height), camera)
+    controls = InputController(world, camera, geometry)
 
     running = True
     while running:
         dt = clock.tick(60)
-        handles_for_events = build_line_handles(world)
+        frame_number += 1
+        laps = PROFILER.laps()
+        geometry.refresh(world)
+        if laps:
+            laps.mark("frame.geometry")
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.MOUSEMOTION:
-                cursor_pos = event.pos
-                station = station_at_position(world, event.pos)
-                if drag_mode == "new":
-                    if station and station.id not in active_line_stations:
-                        active_line_stations.append(station.id)
-                elif drag_mode == "extend" and extend_line_id:
-                    line = world.lines.get(extend_line_id)
-                    if station and station.id != extend_anchor_station:
-                        if line and station.id not in line.stations and station.id not in extend_new_stations:
-                            extend_new_stations.append(station.id)
-                elif drag_mode == "insert" and insert_line_id is not None and insert_segment_index is not None:
-                    line = world.lines.get(insert_line_id)
-                    if station and line:
-                        if station.id not in (insert_anchor_left, insert_anchor_right) and station.id not in line.stations:
-                            insert_target_station = station.id
-                        else:
-                            insert_target_station = None
-                    else:
-                        insert_target_station = None
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    cursor_pos = event.pos
-                    handle = handle_at_position(handles_for_events, event.pos)
-                    station = station_at_position(world, event.pos)
-                    if station:
-                        selected_station_id = station.id
-                    elif not handle:
-                        selected_station_id = None
-                    if handle:
-                        dragging = True
-                        if handle["kind"] == "end":
-                            drag_mode = "extend"
-                            extend_line_id = handle["line_id"]
-                            extend_from_start = handle["is_start"]
-                            extend_anchor_station = handle["station_id"]
-                            extend_new_stations = []
-                            active_line_stations = []
-                            insert_line_id = None
-                            insert_segment_index = None
-                            insert_anchor_left = None
-                            insert_anchor_right = None
-                            insert_target_station = None
-                        elif handle["kind"] == "segment":
-                            drag_mode = "insert"
-                            insert_line_id = handle["line_id"]
-                            insert_segment_index = handle["index"]
-                            insert_anchor_left = handle["left_station_id"]
-                            insert_anchor_right = handle["right_station_id"]
-                            insert_target_station = None
-                            active_line_stations = []
-                            extend_line_id = None
-                            extend_new_stations = []
-                            extend_anchor_station = None
-                            extend_from_start = False
-                    elif station:
-                        dragging = True
-                        drag_mode = "new"
-                        active_line_stations = [station.id]
-                        extend_line_id = None
-                        extend_new_stations = []
-                        extend_anchor_station = None
-                        extend_from_start = False
-                        insert_line_id = None
-                        insert_segment_index = None
-                        insert_anchor_left = None
-                        insert_anchor_right = None
-                        insert_target_station = None
-                elif event.button == 3:
-                    dragging = False
-                    drag_mode = None
-                    active_line_stations = []
-                    extend_line_id = None
-                    extend_new_stations = []
-                    extend_anchor_station = None
-                    extend_from_start = False
-                    insert_line_id = None
-                    insert_segment_index = None
-                    insert_anchor_left = None
-                    insert_anchor_right = None
-                    insert_target_station = None
-                    selected_station_id = None
-            elif event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1 and dragging:
-                    if drag_mode == "new":
-                        if len(active_line_stations) >= 2:
-                            color = LINE_COLORS[color_index]
-                            try:
-                                simulation.create_line(world, active_line_stations, color)
-                                color_index = (color_index + 1) % len(LINE_COLORS)
-                            except ValueError as exc:
-                                print(f"Could not create line: {exc}")
-                        active_line_stations = []
-                    elif drag_mode == "extend" and extend_line_id:
-                        additions = list(extend_new_stations)
-                        if extend_from_start:
-                            additions = list(reversed(additions))
-                        if additions:
-                            try:
-                                simulation.extend_line(world, extend_line_id, additions, at_start=extend_from_start)
-                            except ValueError as exc:
-                                print(f"Could not extend line: {exc}")
-                        extend_line_id = None
-                        extend_new_stations = []
-                        extend_anchor_station = None
-                        extend_from_start = False
-                    elif drag_mode == "insert" and insert_line_id is not None and insert_segment_index is not None:
-                        if insert_target_station:
-                            try:
-                                simulation.insert_stations(world, insert_line_id, [insert_target_station], after_index=insert_segment_index)
-                            except ValueError as exc:
-                                print(f"Could not insert station: {exc}")
-                        insert_line_id = None
-                        insert_segment_index = None
-                        insert_anchor_left = None
-                        insert_anchor_right = None
-                        insert_target_station = None
-                    dragging = False
-                    drag_mode = None
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    dragging = False
-                    drag_mode = None
-                    active_line_stations = []
-                    extend_line_id = None
-                    extend_new_stations = []
-                    extend_anchor_station = None
-                    extend_from_start = False
-                    insert_line_id = None
-                    insert_segment_index = None
-                    insert_anchor_left = None
-                    insert_anchor_right = None
-                    insert_target_station = None
-
-        simulation.tick(world)
-
-        current_station = station_at_position(world, cursor_pos)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                PROFILER.enabled = not PROFILER.enabled
+                profiler_panel = None
+            else:
+                controls.handle(event)
+        controls.update()
+
+        keys = pygame.key.get_pressed()
+        pan_x = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+        pan_y = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+        if pan_x or pan_y:
+            step = max(1, round(KEY_PAN_SPEED * dt / 1000.0))  # whole pixels, so the static layer scrolls
+            camera.pan(pan_x * step, pan_y * step)
+        if laps:
+            laps.mark("frame.events")
+
+        for _ in range(sim_clock.advance(dt / 1000.0)):
+            simulation.tick(world)
+        if laps:
+            laps.mark("frame.simulation")
+
+        cursor_pos = controls.cursor_pos
+        drag = controls.drag
+        current_station = controls.station_under(cursor_pos)
         hover_station_id = current_station.id if current_station else None
 
-        screen.fill((20, 20, 28))
-
-        edge_usage = compute_edge_usage(world)
-
-        for line_id, line in world.lines.items():
-            station_ids = [sid for sid in line.stations if sid in world.stations]
-            if len(station_ids) < 2:
-                continue
-            draw_color = line.color
-            if drag_mode == "insert" and insert_line_id == line.id:
-                draw_color = lighten_color(line.color)
-            for idx in range(len(station_ids) - 1):
-                start_station = world.stations[station_ids[idx]]
-                end_station = world.stations[station_ids[idx + 1]]
-                edge_key = tuple(sorted((station_ids[idx], station_ids[idx + 1])))
-                siblings = edge_usage.get(edge_key, [line.id])
-                if len(siblings) > 1:
-                    offset_index = siblings.index(line.id)
-                    offset_amount = lane_offset(offset_index)
-                else:
-                    offset_amount = 0.0
-                offset_start, offset_end = offset_segment(
-                    (start_station.x, start_station.y),
-                    (end_station.x, end_station.y),
-                    offset_amount,
-                )
-                pygame.draw.line(screen, draw_color, offset_start, offset_end, LINE_WIDTH)
-
-        handles_for_draw = build_line_handles(world)
-        if not dragging:
-            hover_handle = handle_at_position(handles_for_draw, cursor_pos)
-        else:
-            hover_handle = None
+        hidden_handles = drag.hidden_handles() if drag is not None else frozenset()
+        renderer.begin(
+            screen,
+            world,
+            geometry,
+            highlight_line_id=drag.line_id if drag is not None and drag.mode == INSERT else None,
+            hidden_handles=hidden_handles,
+        )
+        if laps:
+            laps.mark("draw.static")
+        renderer.draw_dynamic(screen, world)
+        if laps:
+            laps.skip()
+
+        hover_handle = controls.handle_under(cursor_pos) if drag is None else None
+        if hover_handle is not None and handle_key(hover_handle) not in hidden_handles:
+            renderer.mark(draw_handle(screen, hover_handle, highlight=True, camera=camera))
+
+        line_width = camera.scale(LINE_WIDTH)
 
         # previews for new lines
-        if drag_mode == "new" and active_line_stations:
-            preview_points = gather_station_points(world, active_line_stations)
+        if drag is not None and drag.mode == NEW and drag.stations:
+            color = LINE_COLORS[controls.color_index]
+            preview_points = gather_station_points(world, drag.stations, camera)
             if len(preview_points) >= 2:
-                pygame.draw.lines(screen, LINE_COLORS[color_index], False, preview_points, LINE_WIDTH)
+                renderer.mark(pygame.draw.lines(screen, color, False, preview_points, line_width))
             if preview_points:
-                pygame.draw.line(screen, LINE_COLORS[color_index], preview_points[-1], cursor_pos, LINE_WIDTH)
+                renderer.mark(pygame.draw.line(screen, color, preview_points[-1], cursor_pos, line_width))
 
         # previews for line extensions
-        if drag_mode == "extend" and extend_line_id and extend_anchor_station:
-            line = world.lines.get(extend_line_id)
-            anchor_station = world.stations.get(extend_anchor_station)
+        if drag is not None and drag.mode == EXTEND:
+            line = world.lines.get(drag.line_id)
+            anchor_station = world.stations.get(drag.anchor)
             if line and anchor_station:
-                if extend_from_start:
-                    preview_ids = list(reversed(extend_new_stations)) + [extend_anchor_station]
-                else:
-                    preview_ids = [extend_anchor_station] + list(extend_new_stations)
-                preview_points = gather_station_points(world, preview_ids)
+                preview_points = gather_station_points(world, drag.extended_ids(), camera)
                 if len(preview_points) >= 2:
-                    pygame.draw.lines(screen, line.color, False, preview_points, LINE_WIDTH)
+                    renderer.mark(pygame.draw.lines(screen, line.color, False, preview_points, line_width))
                 if preview_points:
-                    if extend_from_start:
-                        free_point = preview_points[0]
-                    else:
-                        free_point = preview_points[-1]
+                    free_point = preview_points[0] if drag.from_start else preview_points[-1]
                 else:
-                    free_point = (int(anchor_station.x), int(anchor_station.y))
-                pygame.draw.line(screen, line.color, free_point, cursor_pos, LINE_WIDTH)
+                    free_point = camera.to_screen(anchor_station.x, anchor_station.y)
+                renderer.mark(pygame.draw.line(screen, line.color, free_point, cursor_pos, line_width))
 
         # previews for inserting stations mid-line
-        if drag_mode == "insert" and insert_line_id and insert_segment_index is not None:
-            line = world.lines.get(insert_line_id)
-            if line and 0 <= insert_segment_index < len(line.stations) - 1:
-                left_station = world.stations.get(line.stations[insert_segment_index])
-                right_station = world.stations.get(line.stations[insert_segment_index + 1])
+        if drag is not None and drag.mode == INSERT:
+            line = world.lines.get(drag.line_id)
+            if line and 0 <= drag.segment_index < len(line.stations) - 1:
+                left_station = world.stations.get(line.stations[drag.segment_index])
+                right_station = world.stations.get(line.stations[drag.segment_index + 1])
                 if left_station and right_station:
-                    left_pos = (int(left_station.x), int(left_station.y))
-                    right_pos = (int(right_station.x), int(right_station.y))
-                    if insert_target_station and insert_target_station in world.stations:
-                        target_station = world.stations[insert_target_station]
-                        target_pos = (int(target_station.x), int(target_station.y))
+                    left_pos = camera.to_screen(left_station.x, left_station.y)
+                    right_pos = camera.to_screen(right_station.x, right_station.y)
+                    if drag.target and drag.target in world.stations:
+                        target_station = world.stations[drag.target]
+                        target_pos = camera.to_screen(target_station.x, target_station.y)
                     else:
                         target_pos = (int(cursor_pos[0]), int(cursor_pos[1]))
-                    pygame.draw.lines(screen, line.color, False, [left_pos, target_pos, right_pos], LINE_WIDTH)
-
-        for handle in handles_for_draw:
-            if drag_mode == "extend" and extend_line_id and handle["kind"] == "end":
-                if handle["line_id"] == extend_line_id and handle["is_start"] == extend_from_start:
-                    continue
-            if drag_mode == "insert" and insert_line_id and handle["kind"] == "segment":
-                if handle["line_id"] == insert_line_id and handle["index"] == insert_segment_index:
-                    continue
-            highlight = handle is hover_handle
-            draw_handle(screen, handle, highlight)
-
-        for station in world.stations.values():
-            pos = (int(station.x), int(station.y))
-            fill_color = CONNECTED_STATION_COLOR if station.connected else DEFAULT_STATION_COLOR
-            pygame.draw.circle(screen, fill_color, pos, STATION_DRAW_RADIUS)
-
-            highlight = False
-            if hover_station_id == station.id:
-                highlight = True
-            if selected_station_id == station.id:
-                highlight = True
-            if drag_mode == "new" and station.id in active_line_stations:
-                highlight = True
-            if drag_mode == "extend":
-                if station.id == extend_anchor_station or station.id in extend_new_stations:
-                    highlight = True
-            if drag_mode == "insert":
-                if station.id in (insert_anchor_left, insert_anchor_right, insert_target_station):
-                    highlight = True
-            if highlight:
-                pygame.draw.circle(screen, HOVER_COLOR, pos, HOVER_RING_RADIUS, 2)
-
-        for passenger in world.passengers.values():
-            if passenger.onboard is None:
-                origin = world.stations.get(passenger.origin)
-                if origin:
-                    jittered = (
-                        int(origin.x) + random.randint(-6, 6),
-                        int(origin.y) + random.randint(-6, 6),
-                    )
-                    pygame.draw.circle(screen, (255, 200, 100), jittered, 3)
-
-        if selected_station_id:
-            station = world.stations.get(selected_station_id)
-            if station:
-                draw_station_panel(screen, station, font)
-            else:
-                selected_station_id = None
+                    renderer.mark(pygame.draw.lines(screen, line.color, False, [left_pos, target_pos, right_pos], line_width))
 
-        pygame.display.flip()
+        highlighted = {hover_station_id, controls.selected_station_id}
+        if drag is not None:
+            highlighted.update(drag.highlighted())
+        for station_id in highlighted:
+            station = world.stations.get(station_id) if station_id else None
+            if station:
+                pos = camera.to_screen(station.x, station.y)
+                renderer.mark(pygame.draw.circle(screen, HOVER_COLOR, pos, camera.scale(HOVER_RING_RADIUS, 4), 2))
 
+        if controls.selected_station_id:
+            station = world.stations.get(controls.selected_station_id)
+            if station:
+                renderer.mark(draw_station_panel(screen, station, font, world.stats.station_summary(world, station.id), station_panel))
+            else:
+                controls.selected_station_id = None
+        if laps:
+            laps.mark("draw.overlay")
+
+        if PROFILER.enabled:
+            if profiler_panel is None or frame_number % PROFILER_PANEL_REFRESH == 0:
+                profiler_panel = render_profiler_panel(panel_font)
+            renderer.mark(screen.blit(profiler_panel, (width - profiler_panel.get_width() - 16, 16)))
+            if laps:
+                laps.skip()
+
+        renderer.present()
+        if laps:
+            laps.mark("draw.present")
+
+    if event_log is not None:
+        event_log.close(world)
     pygame.quit()
     sys.exit(0)
 
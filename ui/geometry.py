@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import bisect
+import math
+
+from core.changes import FeedCursor, edited_lines
+from core.models import Line, Station, World
+from core.profiler import PROFILER
+from core.spatial import SegmentGrid, SpatialGrid
+
+STATION_SELECT_RADIUS = 20
+END_HANDLE_STEM_LENGTH = 18
+END_HANDLE_CAP_HALF_WIDTH = 10
+END_HANDLE_HIT_RADIUS = 14
+SEGMENT_HANDLE_HIT_RADIUS = 12
+EDGE_OFFSET_DISTANCE = 8
+STATION_DRAW_RADIUS = 12
+
+
+def station_at_position(world: World, pos: tuple[int, int], radius: int = STATION_SELECT_RADIUS) -> Station | None:
+    station_id = world.station_grid.hit(pos[0], pos[1], radius)
+    return world.stations.get(station_id) if station_id is not None else None
+
+
+def build_end_handle(line_id: str, origin: Station, neighbor: Station, color, *, is_start: bool, offset: float = 0.0):
+    dx = origin.x - neighbor.x
+    dy = origin.y - neighbor.y
+    distance = math.hypot(dx, dy)
+    if distance == 0:
+        return None
+
+    dir_x = dx / distance
+    dir_y = dy / distance
+
+    perp_x, perp_y = -dir_y, dir_x
+
+    offset_x = perp_x * offset
+    offset_y = perp_y * offset
+
+    stem_inner = (
+        origin.x + dir_x * STATION_DRAW_RADIUS + offset_x,
+        origin.y + dir_y * STATION_DRAW_RADIUS + offset_y,
+    )
+    stem_outer = (
+        origin.x + dir_x * (STATION_DRAW_RADIUS + END_HANDLE_STEM_LENGTH) + offset_x,
+        origin.y + dir_y * (STATION_DRAW_RADIUS + END_HANDLE_STEM_LENGTH) + offset_y,
+    )
+
+    cap_start = (
+        stem_outer[0] + perp_x * END_HANDLE_CAP_HALF_WIDTH,
+        stem_outer[1] + perp_y * END_HANDLE_CAP_HALF_WIDTH,
+    )
+    cap_end = (
+        stem_outer[0] - perp_x * END_HANDLE_CAP_HALF_WIDTH,
+        stem_outer[1] - perp_y * END_HANDLE_CAP_HALF_WIDTH,
+    )
+
+    return {
+        "kind": "end",
+        "line_id": line_id,
+        "station_id": origin.id,
+        "is_start": is_start,
+        "pos": stem_outer,
+        "stem_inner": stem_inner,
+        "stem_outer": stem_outer,
+        "cap_start": cap_start,
+        "cap_end": cap_end,
+        "color": color,
+        "hit_radius": END_HANDLE_HIT_RADIUS,
+    }
+
+
+def build_segment_handle(line_id: str, left: Station, right: Station, color, index: int, offset: float = 0.0):
+    midpoint = ((left.x + right.x) * 0.5, (left.y + right.y) * 0.5)
+    dx = right.x - left.x
+    dy = right.y - left.y
+    length = math.hypot(dx, dy)
+    if length != 0 and offset != 0:
+        perp_x = -dy / length
+        perp_y = dx / length
+        midpoint = (midpoint[0] + perp_x * offset, midpoint[1] + perp_y * offset)
+    return {
+        "kind": "segment",
+        "line_id": line_id,
+        "index": index,
+        "pos": midpoint,
+        "left_station_id": left.id,
+        "right_station_id": right.id,
+        "color": color,
+        "hit_radius": SEGMENT_HANDLE_HIT_RADIUS,
+    }
+
+
+def line_lane_offsets(line, edge_usage: dict[tuple[str, str], list[str]]) -> list[float]:
+    """Lane offset of each of the line's segments, given which lines share each edge."""
+    offsets = []
+    for index in range(len(line.stations) - 1):
+        edge_key = tuple(sorted((line.stations[index], line.stations[index + 1])))
+        siblings = edge_usage.get(edge_key, [line.id])
+        offsets.append(lane_offset(siblings.index(line.id)) if len(siblings) > 1 else 0.0)
+    return offsets
+
+
+def build_handles_for_line(world: World, line, offsets: list[float]):
+    station_objs = [world.stations[sid] for sid in line.stations if sid in world.stations]
+    if len(station_objs) < 2:
+        return []
+
+    handles = []
+    start_handle = build_end_handle(line.id, station_objs[0], station_objs[1], line.color, is_start=True, offset=offsets[0])
+    end_handle = build_end_handle(line.id, station_objs[-1], station_objs[-2], line.color, is_start=False, offset=offsets[-1])
+    if start_handle:
+        handles.append(start_handle)
+    if end_handle:
+        handles.append(end_handle)
+
+    for index in range(len(station_objs) - 1):
+        segment_handle = build_segment_handle(line.id, station_objs[index], station_objs[index + 1], line.color, index, offset=offsets[index])
+        handles.append(segment_handle)
+    return handles
+
+
+def build_line_segments(world: World, line, offsets: list[float]):
+    """Screen endpoints of each of the line's segments, shifted into their lanes."""
+    segments = []
+    for index in range(len(line.stations) - 1):
+        start_station = world.stations[line.stations[index]]
+        end_station = world.stations[line.stations[index + 1]]
+        segments.append(offset_segment((start_station.x, start_station.y), (end_station.x, end_station.y), offsets[index]))
+    return segments
+
+
+def build_line_handles(world: World, edge_usage: dict[tuple[str, str], list[str]] | None = None):
+    if edge_usage is None:
+        edge_usage = compute_edge_usage(world)
+
+    handles = []
+    for line in world.lines.values():
+        if len(line.stations) < 2:
+            continue
+        handles.extend(build_handles_for_line(world, line, line_lane_offsets(line, edge_usage)))
+    return handles
+
+
+def handle_at_position(handles, pos: tuple[int, int], default_radius: int = END_HANDLE_HIT_RADIUS):
+    px, py = pos
+    for handle in handles:
+        hx, hy = handle["pos"]
+        radius = handle.get("hit_radius", default_radius)
+        dx = hx - px
+        dy = hy - py
+        if dx * dx + dy * dy <= radius * radius:
+            return handle
+    return None
+
+
+def compute_edge_usage(world: World) -> dict[tuple[str, str], list[str]]:
+    usage: dict[tuple[str, str], list[str]] = {}
+    for line_id, line in world.lines.items():
+        stations = line.stations
+        for idx in range(len(stations) - 1):
+            key = tuple(sorted((stations[idx], stations[idx + 1])))
+            usage.setdefault(key, []).append(line_id)
+    return usage
+
+
+def lane_offset(index: int) -> float:
+    if index == 0:
+        return 0.0
+    steps = (index + 1) // 2
+    direction = 1 if index % 2 == 1 else -1
+    return steps * EDGE_OFFSET_DISTANCE * direction
+
+
+def offset_segment(start: tuple[float, float], end: tuple[float, float], offset: float) -> tuple[tuple[int, int], tuple[int, int]]:
+    if offset == 0:
+        return (
+            (int(round(start[0])), int(round(start[1]))),
+            (int(round(end[0])), int(round(end[1]))),
+        )
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length = math.hypot(dx, dy)
+    if length == 0:
+        return (
+            (int(round(start[0])), int(round(start[1]))),
+            (int(round(end[0])), int(round(end[1]))),
+        )
+    perp_x = -dy / length
+    perp_y = dx / length
+    ox = perp_x * offset
+    oy = perp_y * offset
+    return (
+        (int(round(start[0] + ox)), int(round(start[1] + oy))),
+        (int(round(end[0] + ox)), int(round(end[1] + oy))),
+    )
+
+
+class LineGeometry:
+    __slots__ = ("revision", "edges", "offsets", "segments", "handles", "points", "bounds")
+
+    def __init__(self, revision: int, edges, offsets, segments, handles):
+        self.revision = revision
+        self.edges = edges
+        self.offsets = offsets
+        self.segments = segments
+        self.handles = handles
+        self.points: list[tuple[float, float]] = []  # stop positions, without lane offsets
+        self.bounds: tuple[float, float, float, float] | None = None
+
+
+class GeometryCache:
+    """Edge usage, lane offsets, segment endpoints and handles for every line.
+
+    Reads the world's change feed: a frame where no line changed costs one
+    integer comparison, and a line edit rebuilds only that line and the
+    lines sharing an edge with it (whose lanes may shift). Every line is
+    compared against its cached revision only when the cache is new or
+    fell behind the feed.
+    """
+
+    def __init__(self):
+        self.revision = -1
+        self.cursor: FeedCursor | None = None
+        self.lines: dict[str, LineGeometry] = {}
+        self.edge_usage: dict[tuple[str, str], list[str]] = {}
+        self.handles: list[dict] = []
+        self.grid = SpatialGrid()
+        self.segment_grid = SegmentGrid()
+        self._handle_keys: dict[str, list[tuple[str, int]]] = {}
+        self._handles_by_key: dict[tuple[str, int], dict] = {}
+        self._segment_counts: dict[str, int] = {}
+
+    def refresh(self, world: World) -> bool:
+        """Bring the cache up to date; return True when anything was rebuilt."""
+        if world.topology_revision == self.revision:
+            if self.cursor is not None:
+                self.cursor.skip()
+            return False
+        self.revision = world.topology_revision
+        laps = PROFILER.laps()
+
+        changes = None
+        if self.cursor is not None and self.cursor.feed is world.changes:
+            changes = self.cursor.poll()
+        else:
+            self.cursor = world.changes.cursor()
+        if changes is None:
+            candidates = world.lines.values()
+        else:
+            candidates = [world.lines[line_id] for line_id in edited_lines(changes)]
+
+        dirty: set[str] = set()
+        for line in candidates:
+            cached = self.lines.get(line.id)
+            if cached is not None and cached.revision == line.revision:
+                continue
+            edges = [tuple(sorted(pair)) for pair in zip(line.stations, line.stations[1:])]
+            old_edges = cached.edges if cached is not None else []
+            for edge in set(old_edges) - set(edges):
+                siblings = self.edge_usage[edge]
+                siblings.remove(line.id)
+                dirty.update(siblings)
+                if not siblings:
+                    del self.edge_usage[edge]
+            for edge in set(edges) - set(old_edges):
+                siblings = self.edge_usage.setdefault(edge, [])
+                order = [world.line_index[sid] for sid in siblings]
+                siblings.insert(bisect.bisect(order, world.line_index[line.id]), line.id)
+                dirty.update(siblings)
+            self.lines[line.id] = LineGeometry(line.revision, edges, [], [], [])
+            dirty.add(line.id)
+        if laps:
+            laps.mark("geometry.edge_usage")
+
+        for line_id in dirty:
+            self._rebuild_line(world, world.lines[line_id])
+        self.handles = [handle for line_id in world.lines for handle in self.lines[line_id].handles]
+        if laps:
+            laps.mark("geometry.lines")
+        return True
+
+    def _rebuild_line(self, world: World, line: Line):
+        geometry = self.lines[line.id]
+        if len(line.stations) < 2:
+            geometry.offsets, geometry.segments, geometry.handles = [], [], []
+        else:
+            geometry.offsets = line_lane_offsets(line, self.edge_usage)
+            geometry.segments = build_line_segments(world, line, geometry.offsets)
+            geometry.handles = build_handles_for_line(world, line, geometry.offsets)
+        geometry.points = [(world.stations[sid].x, world.stations[sid].y) for sid in line.stations]
+        if geometry.points:
+            xs, ys = zip(*geometry.points)
+            geometry.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+        for index in range(len(geometry.segments), self._segment_counts.get(line.id, 0)):
+            self.segment_grid.remove((line.id, index))
+        for index, (start, end) in enumerate(geometry.segments):
+            self.segment_grid.insert((line.id, index), start[0], start[1], end[0], end[1])
+        self._segment_counts[line.id] = len(geometry.segments)
+
+        for key in self._handle_keys.pop(line.id, []):
+            self.grid.remove(key)
+            del self._handles_by_key[key]
+        keys = []
+        for index, handle in enumerate(geometry.handles):
+            key = (line.id, index)
+            hx, hy = handle["pos"]
+            self.grid.insert(key, hx, hy, handle.get("hit_radius", END_HANDLE_HIT_RADIUS))
+            self._handles_by_key[key] = handle
+            keys.append(key)
+        self._handle_keys[line.id] = keys
+
+    def segments(self, line_id: str):
+        geometry = self.lines.get(line_id)
+        return geometry.segments if geometry is not None else []
+
+    def visible_segments(self, world: World, rect, margin: float = 0.0) -> list[tuple[str, int]]:
+        """``(line_id, segment index)`` of the segments inside a world rectangle, in drawing order."""
+        found = self.segment_grid.in_rect(*rect, margin=margin)
+        return sorted(found, key=lambda key: (world.line_index[key[0]], key[1]))
+
+    def visible_lines(self, rect) -> list[str]:
+        """Ids of the lines whose stops' bounding box overlaps a world rectangle."""
+        x0, y0, x1, y1 = rect
+        visible = []
+        for line_id, geometry in self.lines.items():
+            bounds = geometry.bounds
+            if bounds is not None and bounds[0] <= x1 and x0 <= bounds[2] and bounds[1] <= y1 and y0 <= bounds[3]:
+                visible.append(line_id)
+        return visible
+
+    def visible_handles(self, world: World, rect, margin: float = 0.0) -> list[dict]:
+        """Handles whose hit area overlaps a world rectangle, in drawing order."""
+        x0, y0, x1, y1 = rect
+        found = self.grid.in_rect(x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+        found.sort(key=lambda key: (world.line_index[key[0]], key[1]))
+        return [self._handles_by_key[key] for key in found]
+
+    def handle_at(self, pos: tuple[int, int]):
+        key = self.grid.hit(pos[0], pos[1])
+        return self._handles_by_key[key] if key is not None else None
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+from core import simulation
+from core.models import World
+from core.modes import DEFAULT_MODE, MODE_NAMES
+from ui.camera import WHEEL_ZOOM_STEP, Camera
+from ui.geometry import STATION_SELECT_RADIUS, GeometryCache, station_at_position
+
+LINE_COLORS = [
+    (239, 71, 111),
+    (17, 138, 178),
+    (6, 214, 160),
+    (255, 209, 102),
+    (17, 45, 78),
+    (149, 125, 173),
+]
+
+MODE_KEYS = "1234"  # number keys choosing the mode of the next line, in MODE_NAMES order
+MAX_STROKE_POINTS = 64  # cursor positions kept per frame for the drag sweep
+
+NEW, EXTEND, INSERT = "new", "extend", "insert"
+
+
+def thin_stroke(points: list, keep: int) -> list:
+    """The ``keep`` points of a polyline that bend it most, both ends included, in order.
+
+    A point's bend is its distance from the chord between its neighbours,
+    so corners outlast points on a straight run.
+    """
+    bends = [math.inf]
+    for (ax, ay), (bx, by), (cx, cy) in zip(points, points[1:], points[2:]):
+        chord = math.hypot(cx - ax, cy - ay)
+        bends.append(abs((cx - ax) * (by - ay) - (cy - ay) * (bx - ax)) / chord if chord else math.hypot(bx - ax, by - ay))
+    bends.append(math.inf)
+    kept = sorted(range(len(points)), key=bends.__getitem__, reverse=True)[:keep]
+    return [points[index] for index in sorted(kept)]
+
+
+@dataclass
+class Drag:
+    """One line edit in progress, from button press to release.
+
+    ``new`` collects the stations of a new line. ``extend`` grows
+    ``line_id`` from ``anchor``, its first station when ``from_start``,
+    collecting ``stations`` in the order they were dragged over.
+    ``insert`` puts ``target`` between ``left`` and ``right``, the ends of
+    segment ``segment_index``.
+    """
+
+    mode: str
+    stations: list[str] = field(default_factory=list)
+    line_id: str | None = None
+    anchor: str | None = None
+    from_start: bool = False
+    segment_index: int | None = None
+    left: str | None = None
+    right: str | None = None
+    target: str | None = None
+
+    def hidden_handles(self) -> frozenset:
+        """Handles the drag replaces with its own preview, as ``handle_key`` tuples."""
+        if self.mode == EXTEND:
+            return frozenset({(self.line_id, "end", self.from_start)})
+        if self.mode == INSERT:
+            return frozenset({(self.line_id, "segment", self.segment_index)})
+        return frozenset()
+
+    def highlighted(self) -> set:
+        if self.mode == NEW:
+            return set(self.stations)
+        if self.mode == EXTEND:
+            return {self.anchor, *self.stations}
+        return {self.left, self.right, self.target}
+
+    def extended_ids(self) -> list[str]:
+        """The anchor and the added stations, in line order."""
+        if self.from_start:
+            return list(reversed(self.stations)) + [self.anchor]
+        return [self.anchor] + list(self.stations)
+
+
+class InputController:
+    """Turns mouse and keyboard events into camera moves, selection and line edits.
+
+    The controller is either idle or holds one :class:`Drag`; every way a
+    drag ends goes through :meth:`cancel`. Motion events only record the
+    cursor: :meth:`update` handles the motion once per frame, sweeping the
+    path through the frame's cursor positions against the station grid, so
+    stations are picked up however fast or curved the stroke. At most
+    ``MAX_STROKE_POINTS`` positions are kept, the half that bend the path
+    least dropped when that fills up, which bounds the swept queries per
+    frame whatever the number of events. Button events flush pending
+    motion first, so nothing swept before a release is lost.
+    """
+
+    def __init__(self, world: World, camera: Camera, geometry: GeometryCache):
+        self.world = world
+        self.camera = camera
+        self.geometry = geometry
+        self.cursor_pos = (0, 0)
+        self.drag: Drag | None = None
+        self.swept_from: tuple[float, float] | None = None  # world position motion was last handled at
+        self.stroke: list[tuple[int, int]] = []  # screen positions of this frame's drag motion
+        self.selected_station_id: str | None = None
+        self.panning = False
+        self.pan_pending = [0, 0]
+        self.line_mode = DEFAULT_MODE
+        self.color_index = 0
+
+    # -- picking -----------------------------------------------------------
+
+    @property
+    def pick_radius(self) -> float:
+        """The station pick radius in world units; it stays constant on screen."""
+        return STATION_SELECT_RADIUS / self.camera.zoom
+
+    def station_under(self, pos):
+        return station_at_position(self.world, self.camera.to_world(pos), self.pick_radius)
+
+    def handle_under(self, pos):
+        """The handle under a screen position; handles are not drawn, nor hit, in the overview."""
+        if not self.camera.detailed:
+            return None
+        return self.geometry.handle_at(self.camera.to_world(pos))
+
+    # -- events ------------------------------------------------------------
+
+    def handle(self, event):
+        """Feed one pygame event; anything the controller doesn't use is ignored."""
+        import pygame
+
+        if event.type == pygame.MOUSEMOTION:
+            self.cursor_pos = event.pos
+            if self.drag is not None and not self.panning:
+                self._record(event.pos)
+            if self.panning:
+                self.pan_pending[0] -= event.rel[0]
+                self.pan_pending[1] -= event.rel[1]
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            self.cursor_pos = event.pos
+            self.update()
+            if event.button == 1:
+                self._press(event.pos)
+            elif event.button == 2:
+                self.panning = True
+            elif event.button == 3:
+                self.cancel()
+                self.selected_station_id = None
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.cursor_pos = event.pos
+            self.update()
+            if event.button == 2:
+                self.panning = False
+            elif event.button == 1 and self.drag is not None:
+                self._release()
+        elif event.type == pygame.MOUSEWHEEL:
+            self.update()
+            self.camera.zoom_at(WHEEL_ZOOM_STEP ** event.y, pygame.mouse.get_pos())
+            if self.drag is not None:
+                self.swept_from = self.camera.to_world(self.cursor_pos)  # zooming is not a stroke
+        elif event.type == pygame.KEYDOWN:
+            if event.unicode and event.unicode in MODE_KEYS[: len(MODE_NAMES)]:
+                self.line_mode = MODE_NAMES[MODE_KEYS.index(event.unicode)]
+                pygame.display.set_caption(f"Transit Empire - new lines: {self.line_mode}")
+            elif event.key == pygame.K_ESCAPE:
+                self.cancel()
+
+    def _record(self, pos):
+        if len(self.stroke) >= MAX_STROKE_POINTS:
+            self.stroke = thin_stroke(self.stroke, MAX_STROKE_POINTS // 2)
+        self.stroke.append(pos)
+
+    def update(self):
+        """Apply the motion recorded since the last update: pan, then sweep the cursor's path."""
+        if self.pan_pending != [0, 0]:
+            self.camera.pan(*self.pan_pending)
+            self.pan_pending = [0, 0]
+        stroke = self.stroke
+        self.stroke = []
+        drag = self.drag
+        if drag is None:
+            return
+        to_world = self.camera.to_world
+        end = to_world(self.cursor_pos)
+        start = self.swept_from if self.swept_from is not None else end
+        self.swept_from = end
+        world = self.world
+        if drag.mode == INSERT:
+            # the target follows the cursor rather than everything it crossed
+            station = station_at_position(world, end, self.pick_radius)
+            line = world.lines.get(drag.line_id)
+            if station and line and station.id not in (drag.left, drag.right) and not line.serves(station.id):
+                drag.target = station.id
+            else:
+                drag.target = None
+            return
+        path = [start, *map(to_world, stroke), end]
+        line = world.lines.get(drag.line_id)
+        for a, b in zip(path, path[1:]):
+            if a == b:
+                continue
+            for station_id in world.station_grid.along(*a, *b, self.pick_radius):
+                if station_id in drag.stations:
+                    continue
+                if drag.mode == NEW:
+                    drag.stations.append(station_id)
+                elif station_id != drag.anchor and line and not line.serves(station_id):
+                    drag.stations.append(station_id)
+
+    def cancel(self):
+        """Drop the drag in progress, if any."""
+        self.drag = None
+        self.swept_from = None
+        self.stroke = []
+
+    # -- drags -------------------------------------------------------------
+
+    def _press(self, pos):
+        handle = self.handle_under(pos)
+        station = self.station_under(pos)
+        if station:
+            self.selected_station_id = station.id
+        elif not handle:
+            self.selected_station_id = None
+        if handle and handle["kind"] == "end":
+            self.drag = Drag(EXTEND, line_id=handle["line_id"], anchor=handle["station_id"], from_start=handle["is_start"])
+        elif handle and handle["kind"] == "segment":
+            self.drag = Drag(
+                INSERT,
+                line_id=handle["line_id"],
+                segment_index=handle["index"],
+                left=handle["left_station_id"],
+                right=handle["right_station_id"],
+            )
+        elif station:
+            self.drag = Drag(NEW, stations=[station.id])
+        else:
+            self.cancel()
+            return
+        self.swept_from = self.camera.to_world(pos)
+
+    def _release(self):
+        drag = self.drag
+        self.cancel()
+        world = self.world
+        if drag.mode == NEW:
+            if len(drag.stations) >= 2:
+                try:
+                    simulation.create_line(world, drag.stations, LINE_COLORS[self.color_index], self.line_mode)
+                    self.color_index = (self.color_index + 1) % len(LINE_COLORS)
+                except ValueError as exc:
+                    print(f"Could not create line: {exc}")
+        elif drag.mode == EXTEND:
+            additions = list(reversed(drag.stations)) if drag.from_start else list(drag.stations)
+            if additions:
+                try:
+                    simulation.extend_line(world, drag.line_id, additions, at_start=drag.from_start)
+                except ValueError as exc:
+                    print(f"Could not extend line: {exc}")
+        elif drag.target:
+            try:
+                simulation.insert_stations(world, drag.line_id, [drag.target], after_index=drag.segment_index)
+            except ValueError as exc:
+                print(f"Could not insert station: {exc}")
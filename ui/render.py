@@ -0,0 +1,557 @@
+from __future__ import annotations
+
+from itertools import repeat
+
+import numpy as np
+
+from core.changes import LINE_CHANGES, StationSpawned
+from core.models import World
+from core.profiler import PROFILER
+from ui.camera import Camera
+from ui.geometry import END_HANDLE_STEM_LENGTH, STATION_DRAW_RADIUS, GeometryCache
+from ui.text import TEXTS, TextCache
+
+BACKGROUND_COLOR = (20, 20, 28)
+LINE_WIDTH = 6
+SEGMENT_HANDLE_RADIUS = 6
+VEHICLE_SIZE = 10
+PASSENGER_COLOR = (255, 200, 100)
+PASSENGER_DOT_RADIUS = 3
+PASSENGER_JITTER = 6
+MAX_PASSENGER_DOTS = 12
+BADGE_TEXT_COLOR = (20, 20, 28)
+CLUSTER_COLORKEY = (255, 0, 255)  # transparent in passenger clusters; the badge text uses the background colour
+BADGE_CACHE_SIZE = 512
+HOVER_COLOR = (255, 255, 255)
+DEFAULT_STATION_COLOR = (200, 200, 200)
+CONNECTED_STATION_COLOR = (0, 0, 0)
+MAX_DIRTY_RECTS = 256
+OVERVIEW_STATION_RADIUS = 2  # smallest station drawn in the overview level of detail
+LABEL_FONT_SIZE = 14
+LABEL_COLOR = (220, 220, 230)
+LABEL_CELL_WIDTH = 72  # screen cells holding at most one station label each
+LABEL_CELL_HEIGHT = 18
+SCROLL_TOLERANCE = 1e-6  # pixels a pan may be off a whole number and still scroll the static layer
+
+
+def lighten_color(color, factor: float = 0.6):
+    """Return a lightened version of the given RGB color."""
+    return tuple(min(255, int(c + (255 - c) * factor)) for c in color)
+
+
+def draw_handle(surface, handle, highlight: bool = False, camera: Camera | None = None):
+    import pygame
+
+    to_screen = camera.to_screen if camera is not None else lambda x, y: (int(x), int(y))
+    width = camera.scale(LINE_WIDTH) if camera is not None else LINE_WIDTH
+    color = HOVER_COLOR if highlight else handle["color"]
+    if handle["kind"] == "end":
+        stem_inner = to_screen(*handle["stem_inner"])
+        stem_outer = to_screen(*handle["stem_outer"])
+        cap_start = to_screen(*handle["cap_start"])
+        cap_end = to_screen(*handle["cap_end"])
+        return pygame.draw.line(surface, color, stem_inner, stem_outer, width).union(
+            pygame.draw.line(surface, color, cap_start, cap_end, width)
+        )
+    center = to_screen(*handle["pos"])
+    radius = camera.scale(SEGMENT_HANDLE_RADIUS) if camera is not None else SEGMENT_HANDLE_RADIUS
+    rect = pygame.draw.circle(surface, handle["color"], center, radius)
+    if highlight:
+        rect = rect.union(pygame.draw.circle(surface, color, center, radius + 2, 2))
+    return rect
+
+
+def passenger_offsets(serials: np.ndarray):
+    """Deterministic jitter for each passenger, derived from its serial number."""
+    mixed = (serials.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    span = 2 * PASSENGER_JITTER + 1
+    dx = (mixed % np.uint64(span)).astype(np.int64) - PASSENGER_JITTER
+    dy = ((mixed >> np.uint64(16)) % np.uint64(span)).astype(np.int64) - PASSENGER_JITTER
+    return dx, dy
+
+
+def stamp_discs(surface, xs: np.ndarray, ys: np.ndarray, radius: int, color):
+    """Write filled discs centred on screen points straight into the pixels, clipped to the surface's clip rect.
+
+    Used for thousands of small, identical markers, where one numpy write
+    per disc pixel offset beats a draw or blit call per marker.
+    """
+    import pygame
+
+    clip = surface.get_clip()
+    offsets = [(dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1) if dx * dx + dy * dy <= radius * radius]
+    pixels = pygame.surfarray.pixels2d(surface)
+    value = surface.map_rgb(color)
+    for dx, dy in offsets:
+        px, py = xs + dx, ys + dy
+        inside = (px >= clip.left) & (px < clip.right) & (py >= clip.top) & (py < clip.bottom)
+        pixels[px[inside], py[inside]] = value
+    del pixels  # release the surface lock
+
+
+def label_cells(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """The label cell of each pixel position, as one integer per point."""
+    return (xs // LABEL_CELL_WIDTH) * (1 << 32) + ys // LABEL_CELL_HEIGHT
+
+
+def handle_key(handle):
+    """Stable identity of a handle across geometry rebuilds."""
+    if handle["kind"] == "end":
+        return handle["line_id"], "end", handle["is_start"]
+    return handle["line_id"], "segment", handle["index"]
+
+
+class LayeredRenderer:
+    """Composites a cached static layer with per-frame dynamic and overlay drawing.
+
+    Lines, handles and stations are drawn once into an off-screen surface
+    that is rebuilt only when a line changes or the camera zooms. Panning
+    by whole pixels scrolls the surface and draws only the strips it
+    exposes; stations spawned since the last frame, read from the world's
+    change feed, are drawn into it without a rebuild. Each frame the areas touched last
+    frame are restored from that surface, dynamic content (vehicles,
+    passengers) and overlays are drawn on top with every drawn rect
+    recorded via :meth:`mark`, and only those rects are pushed to the
+    display.
+
+    Only what intersects the viewport is drawn: segments, handles and
+    stations come from spatial queries over the camera's visible
+    rectangle. Below ``DETAIL_ZOOM`` the overview level of detail draws
+    each line as one polyline through its stops (parallel lanes merge),
+    hides handles, draws stations as sprites, and shows one dot per
+    station with waiting passengers.
+
+    Station names are drawn into the static layer too, up close only. The
+    map is split into label-sized cells, fixed to the world so they scroll
+    with it, and each cell shows the label of its lowest-indexed station on
+    screen when the cell is first drawn, so labels never pile up and their
+    number is bounded by the screen size rather than the station count.
+    Label text comes from a shared :class:`~ui.text.TextCache`.
+    """
+
+    def __init__(self, size, camera: Camera | None = None, texts: TextCache = TEXTS):
+        self.size = size
+        self.texts = texts
+        self.camera = camera if camera is not None else Camera(size)
+        self.static = None
+        self.static_key = None
+        self.static_origin = (0.0, 0.0)  # the camera's top-left in pixels when the static layer was drawn
+        self.static_cursor = None
+        self.static_stations = 0  # stations considered for the static layer
+        self.visible_stations: list[int] = []  # indices of the stations drawn there
+        self.station_xs = np.zeros(0)
+        self.station_ys = np.zeros(0)
+        self.station_connected = np.zeros(0, dtype=bool)
+        self.connected_revision = None
+        self.dirty = []
+        self.previous = []
+        self.full = True
+        self.full_redraw = False  # force the pre-layer behaviour, for benchmarks
+        self.scroll = True  # scroll the static layer on whole-pixel pans rather than redrawing it
+        self.dot_sprite = None
+        self.badge_font = None
+        self.badges = {}
+        self.clusters: dict[int, tuple] = {}  # station index -> (head serials, cluster sprite)
+        self.labels = True
+        self.label_font = None
+        self.label_cells: dict[int, int] = {}  # label cell -> index of the station labelled there
+        self.label_reach = LABEL_CELL_WIDTH  # widest label drawn, in pixels
+
+    # -- static layer ------------------------------------------------------
+
+    def _draw_static(self, world: World, geometry: GeometryCache, highlight_line_id, hidden_handles):
+        import pygame
+
+        if self.static is None:
+            self.static = pygame.Surface(self.size).convert()
+        self.static.fill(BACKGROUND_COLOR)
+        camera = self.camera
+        self.static_origin = (camera.x * camera.zoom, camera.y * camera.zoom)
+        self.label_cells = {}
+        self._sync_station_positions(world)
+        view = camera.visible()
+        # with the whole network on screen, the spatial queries would return everything
+        everything = self._shows_everything(view)
+        self.visible_stations = list(range(len(self.station_xs))) if everything else self._stations_in_view(world)
+        self._draw_region(world, geometry, view, self.visible_stations, highlight_line_id, hidden_handles, everything)
+        self.static_stations = len(world.station_ids)
+
+    def _scroll_shift(self):
+        """Whole pixels the camera panned since the static layer was drawn, or ``None`` if it can't scroll."""
+        camera = self.camera
+        dx = camera.x * camera.zoom - self.static_origin[0]
+        dy = camera.y * camera.zoom - self.static_origin[1]
+        shift = round(dx), round(dy)
+        width, height = self.size
+        if abs(dx - shift[0]) > SCROLL_TOLERANCE or abs(dy - shift[1]) > SCROLL_TOLERANCE:
+            return None
+        if abs(shift[0]) >= width or abs(shift[1]) >= height:
+            return None
+        return shift
+
+    def _scroll_static(self, world: World, geometry: GeometryCache, shift, highlight_line_id, hidden_handles):
+        """Move the static layer by ``shift`` pixels and draw the strips that come into view."""
+        import pygame
+
+        dx, dy = shift
+        width, height = self.size
+        surface = self.static
+        surface.scroll(-dx, -dy)
+        self.static_origin = (self.static_origin[0] + dx, self.static_origin[1] + dy)
+        strips = []
+        if dx:
+            strips.append(pygame.Rect(width - dx if dx > 0 else 0, 0, abs(dx), height))
+        if dy:
+            left = -dx if dx < 0 else 0
+            strips.append(pygame.Rect(left, height - dy if dy > 0 else 0, width - abs(dx), abs(dy)))
+        camera = self.camera
+        zoom = camera.zoom
+        margin = STATION_DRAW_RADIUS
+        reach = margin
+        if self.labels and camera.detailed:
+            reach = (self.label_reach + STATION_DRAW_RADIUS * zoom) / zoom  # labels reach right of their station
+            margin = max(margin, LABEL_CELL_HEIGHT / zoom)
+        index = world.station_index
+        candidates = [np.array(self.visible_stations, dtype=np.int64)]
+        for strip in strips:
+            surface.set_clip(strip)
+            surface.fill(BACKGROUND_COLOR)
+            x0, y0 = camera.to_world(strip.topleft)
+            x1, y1 = camera.to_world(strip.bottomright)
+            found = world.station_grid.in_rect(x0 - reach, y0 - margin, x1 + margin, y1 + margin)
+            stations = sorted(index[station_id] for station_id in found)
+            self._draw_region(world, geometry, (x0, y0, x1, y1), stations, highlight_line_id, hidden_handles, False)
+            candidates.append(np.array(stations, dtype=np.int64))
+        surface.set_clip(None)
+        # the stations on screen are the ones kept from last frame plus those the strips brought in
+        seen = np.zeros(len(self.station_xs), dtype=bool)
+        for found in candidates:
+            seen[found] = True
+        candidates = np.flatnonzero(seen)
+        xs, ys = self.station_xs[candidates], self.station_ys[candidates]
+        x0, y0, x1, y1 = camera.visible(margin=STATION_DRAW_RADIUS)
+        self.visible_stations = candidates[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)].tolist()
+
+    def _draw_region(self, world: World, geometry: GeometryCache, view, stations, highlight_line_id, hidden_handles, everything: bool):
+        """Draw lines, handles and ``stations`` reaching into the world rectangle ``view``."""
+        import pygame
+
+        surface = self.static
+        camera = self.camera
+        width = camera.scale(LINE_WIDTH)
+
+        def color_of(line):
+            return lighten_color(line.color) if line.id == highlight_line_id else line.color
+
+        if camera.detailed:
+            if everything:
+                visible = [(line_id, index) for line_id in world.lines for index in range(len(geometry.segments(line_id)))]
+                handles = geometry.handles
+            else:
+                visible = geometry.visible_segments(world, view, margin=LINE_WIDTH)
+                handles = geometry.visible_handles(world, view, margin=END_HANDLE_STEM_LENGTH)
+            if visible:
+                ends = np.array([geometry.lines[line_id].segments[index] for line_id, index in visible], dtype=np.float64)
+                xs, ys = camera.transform(ends[..., 0].ravel(), ends[..., 1].ravel())
+                points = list(zip(xs.tolist(), ys.tolist()))
+                colors = {line_id: color_of(world.lines[line_id]) for line_id in {line_id for line_id, _ in visible}}
+                for position, (line_id, _) in enumerate(visible):
+                    pygame.draw.line(surface, colors[line_id], points[2 * position], points[2 * position + 1], width)
+            for handle in handles:
+                if handle_key(handle) in hidden_handles:
+                    continue
+                draw_handle(surface, handle, camera=camera)
+        else:
+            # transform every visible line's stops in one batch, then split per line
+            line_ids = [line_id for line_id in geometry.visible_lines(view) if len(geometry.lines[line_id].points) >= 2]
+            if line_ids:
+                stops = [geometry.lines[line_id].points for line_id in line_ids]
+                xs, ys = camera.transform(*np.concatenate(stops).T)
+                points = list(zip(xs.tolist(), ys.tolist()))
+                start = 0
+                for line_id, line_stops in zip(line_ids, stops):
+                    end = start + len(line_stops)
+                    pygame.draw.lines(surface, color_of(world.lines[line_id]), False, points[start:end], width)
+                    start = end
+
+        visible = np.array(stations, dtype=np.int64)
+        radius = camera.scale(STATION_DRAW_RADIUS, OVERVIEW_STATION_RADIUS)
+        if camera.detailed:
+            xs, ys = camera.transform(self.station_xs[visible], self.station_ys[visible])
+            for x, y, connected in zip(xs.tolist(), ys.tolist(), self.station_connected[visible].tolist()):
+                pygame.draw.circle(surface, CONNECTED_STATION_COLOR if connected else DEFAULT_STATION_COLOR, (x, y), radius)
+            if self.labels:
+                self._draw_labels(world, visible, xs, ys)
+        else:
+            for connected, color in ((False, DEFAULT_STATION_COLOR), (True, CONNECTED_STATION_COLOR)):
+                shown = visible[self.station_connected[visible] == connected]
+                stamp_discs(surface, *camera.transform(self.station_xs[shown], self.station_ys[shown]), radius, color)
+
+    def _draw_labels(self, world: World, indices: np.ndarray, xs: np.ndarray, ys: np.ndarray):
+        """Label the first station of every free label cell, given stations in index order.
+
+        Stations already holding their cell are labelled again, for when
+        only part of the layer is being drawn.
+        """
+        import pygame
+
+        if not len(indices):
+            return []
+        if self.label_font is None:
+            self.label_font = pygame.font.Font(None, LABEL_FONT_SIZE)
+        origin_x, origin_y = (round(value) for value in self.static_origin)
+        cells, first = np.unique(label_cells(xs + origin_x, ys + origin_y), return_index=True)
+        owners = self.label_cells
+        positions = {index: position for position, index in enumerate(indices.tolist())} if owners else {}
+        chosen = []
+        for cell, position in zip(cells.tolist(), first.tolist()):
+            owner = owners.get(cell)
+            if owner is None:
+                owners[cell] = int(indices[position])
+                chosen.append(position)
+            elif owner in positions:
+                chosen.append(positions[owner])
+        chosen.sort()
+        offset = self.camera.scale(STATION_DRAW_RADIUS, OVERVIEW_STATION_RADIUS) + 2
+        stations, station_ids, render = world.stations, world.station_ids, self.texts.render
+        sprites = []
+        for index, x, y in zip(indices[chosen].tolist(), xs[chosen].tolist(), ys[chosen].tolist()):
+            station = stations[station_ids[index]]
+            text = render(station.name or station.id, self.label_font, LABEL_COLOR)
+            self.label_reach = max(self.label_reach, offset + text.get_width())
+            sprites.append((text, (x + offset, y - text.get_height() // 2)))
+        return self.static.blits(sprites)
+
+    def _sync_station_positions(self, world: World):
+        known = len(self.station_xs)
+        if len(world.station_ids) > known:
+            added = [world.stations[station_id] for station_id in world.station_ids[known:]]
+            self.station_xs = np.concatenate((self.station_xs, [station.x for station in added]))
+            self.station_ys = np.concatenate((self.station_ys, [station.y for station in added]))
+            self.connected_revision = None
+        if self.connected_revision != world.topology_revision:
+            stations = world.stations
+            self.station_connected = np.array([stations[station_id].connected for station_id in world.station_ids], dtype=bool)
+            self.connected_revision = world.topology_revision
+
+    def _shows_everything(self, view) -> bool:
+        """Whether every station lies inside ``view``, so culling would skip nothing worth skipping.
+
+        Lines and handles only reach a little past their stations; the part
+        drawn off-screen is clipped.
+        """
+        xs, ys = self.station_xs, self.station_ys
+        if not len(xs):
+            return True
+        return view[0] <= xs.min() and xs.max() <= view[2] and view[1] <= ys.min() and ys.max() <= view[3]
+
+    def _stations_in_view(self, world: World) -> list[int]:
+        """Indices of the stations on screen: a grid query up close, one array mask in the overview."""
+        camera = self.camera
+        x0, y0, x1, y1 = camera.visible(margin=STATION_DRAW_RADIUS)
+        if camera.detailed:
+            index = world.station_index
+            return sorted(index[station_id] for station_id in world.station_grid.in_rect(x0, y0, x1, y1))
+        xs, ys = self.station_xs, self.station_ys
+        return np.flatnonzero((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)).tolist()
+
+    def _draw_station(self, world: World, station):
+        import pygame
+
+        camera = self.camera
+        fill_color = CONNECTED_STATION_COLOR if station.connected else DEFAULT_STATION_COLOR
+        radius = camera.scale(STATION_DRAW_RADIUS, OVERVIEW_STATION_RADIUS)
+        center = camera.to_screen(station.x, station.y)
+        rect = pygame.draw.circle(self.static, fill_color, center, radius)
+        if self.labels and camera.detailed:
+            index = np.array([world.station_index[station.id]])
+            for label in self._draw_labels(world, index, np.array([center[0]]), np.array([center[1]])):
+                rect = rect.union(label)
+        return rect
+
+    def _static_changes(self, world: World):
+        """Changes since the last frame, or ``None`` when the static layer must be rebuilt."""
+        cursor = self.static_cursor
+        if cursor is None or cursor.feed is not world.changes:
+            self.static_cursor = world.changes.cursor()
+            return None
+        changes = cursor.poll()
+        if changes is None or any(isinstance(change, LINE_CHANGES) for change in changes):
+            return None
+        return [change for change in changes if isinstance(change, StationSpawned)]
+
+    # -- frame lifecycle ---------------------------------------------------
+
+    def begin(self, screen, world: World, geometry: GeometryCache, *, highlight_line_id=None, hidden_handles=frozenset()):
+        """Start a frame: refresh the static layer if needed and erase last frame's drawing."""
+        geometry.refresh(world)
+        key = (highlight_line_id, hidden_handles, self.camera.zoom)
+        spawned = self._static_changes(world)
+        if spawned is not None and len(spawned) != len(world.station_ids) - self.static_stations:
+            spawned = None  # stations were added without going through the feed
+        shift = self._scroll_shift()
+        if (
+            spawned is None
+            or key != self.static_key
+            or self.static is None
+            or self.full_redraw
+            or shift is None
+            or (shift != (0, 0) and (spawned or not self.scroll))
+        ):
+            laps = PROFILER.laps()
+            self.static_key = key
+            self._draw_static(world, geometry, highlight_line_id, hidden_handles)
+            self.full = True
+            if laps:
+                laps.mark("draw.static_rebuild")
+        elif shift != (0, 0):
+            laps = PROFILER.laps()
+            self._scroll_static(world, geometry, shift, highlight_line_id, hidden_handles)
+            self.full = True
+            if laps:
+                laps.mark("draw.static_scroll")
+        elif spawned:
+            self._sync_station_positions(world)
+            x0, y0, x1, y1 = self.camera.visible(margin=STATION_DRAW_RADIUS)
+            for change in spawned:
+                station = world.stations[change.station_id]
+                if x0 <= station.x <= x1 and y0 <= station.y <= y1:
+                    self.visible_stations.append(world.station_index[station.id])
+                    self.previous.append(self._draw_station(world, station))
+            self.static_stations = len(world.station_ids)
+        if self.full:
+            screen.blit(self.static, (0, 0))
+        else:
+            static = self.static
+            screen.blits([(static, rect, rect) for rect in self.previous], doreturn=False)
+        self.dirty = []
+
+    def mark(self, rect):
+        """Record a rect drawn this frame so it is presented now and erased next frame."""
+        if rect is not None and rect.width and rect.height:
+            self.dirty.append(rect)
+        return rect
+
+    def draw_dynamic(self, screen, world: World):
+        """Draw the vehicles and waiting passengers inside the viewport."""
+        import pygame
+
+        laps = PROFILER.laps()
+        camera = self.camera
+        movement = world.movement
+        vehicle_xs, vehicle_ys = movement.vehicle_positions(world)
+        x0, y0, x1, y1 = camera.visible(margin=VEHICLE_SIZE)
+        shown = np.flatnonzero((vehicle_xs >= x0) & (vehicle_xs <= x1) & (vehicle_ys >= y0) & (vehicle_ys <= y1))
+        screen_xs, screen_ys = camera.transform(vehicle_xs[shown], vehicle_ys[shown])
+        size = camera.scale(VEHICLE_SIZE, 3)
+        half = size // 2
+        colors = {}
+        for vehicle_line, vx, vy in zip(movement.line[shown].tolist(), screen_xs.tolist(), screen_ys.tolist()):
+            color = colors.get(vehicle_line)
+            if color is None:
+                color = colors[vehicle_line] = lighten_color(world.lines[world.line_ids[vehicle_line]].color, 0.3)
+            self.mark(pygame.draw.rect(screen, color, (vx - half, vy - half, size, size)))
+        if laps:
+            laps.mark("draw.vehicles")
+
+        self.draw_passengers(screen, world)
+        if laps:
+            laps.mark("draw.passengers")
+
+    def _badge(self, count: int):
+        import pygame
+
+        badge = self.badges.get(count)
+        if badge is None:
+            if self.badge_font is None:
+                self.badge_font = pygame.font.Font(None, 16)
+            if len(self.badges) >= BADGE_CACHE_SIZE:
+                self.badges.clear()
+            text = self.badge_font.render(str(count), True, BADGE_TEXT_COLOR)
+            badge = pygame.Surface((text.get_width() + 6, text.get_height() + 2)).convert()
+            badge.fill(PASSENGER_COLOR)
+            badge.blit(text, (3, 1))
+            self.badges[count] = badge
+        return badge
+
+    def draw_passengers(self, screen, world: World):
+        """Draw waiting passengers as capped dot clusters, with a count badge for crowds.
+
+        Only stations in the static layer's viewport are considered. Each
+        station's dots and badge are one cached sprite, rebuilt only when the
+        first ``MAX_PASSENGER_DOTS`` in its queue or the badge count change;
+        nothing past them is read, so work is one sprite per station however
+        many passengers are waiting, and every sprite goes out in one
+        ``blits`` call.
+        """
+        import pygame
+
+        if self.dot_sprite is None:
+            size = PASSENGER_DOT_RADIUS * 2 + 1
+            self.dot_sprite = pygame.Surface((size, size)).convert()
+            self.dot_sprite.fill(BACKGROUND_COLOR)
+            self.dot_sprite.set_colorkey(BACKGROUND_COLOR)
+            pygame.draw.circle(self.dot_sprite, PASSENGER_COLOR, (PASSENGER_DOT_RADIUS, PASSENGER_DOT_RADIUS), PASSENGER_DOT_RADIUS)
+
+        queues = world.movement.waiting
+        stations = [index for index in self.visible_stations if index < len(queues) and len(queues[index])]
+        if not stations:
+            return
+        station_x, station_y = self.camera.transform(self.station_xs[stations], self.station_ys[stations])
+        if not self.camera.detailed:
+            # overview: one dot per station with anyone waiting
+            xs = (station_x - PASSENGER_DOT_RADIUS).tolist()
+            ys = (station_y - PASSENGER_DOT_RADIUS).tolist()
+            size = PASSENGER_DOT_RADIUS * 2 + 1
+            for x, y in zip(xs, ys):
+                self.mark(pygame.Rect(x, y, size, size))
+            screen.blits(list(zip(repeat(self.dot_sprite), zip(xs, ys))), doreturn=False)
+            return
+        # one serial lookup for every station's head of queue, split per station below
+        heads = [queues[index][:MAX_PASSENGER_DOTS] for index in stations]
+        serials = world.passengers.serial[np.concatenate(heads)]
+        keys = serials.tobytes()
+        width = serials.itemsize
+        clusters = self.clusters
+        sprites = []
+        start = 0
+        for index, head, x, y in zip(stations, heads, station_x.tolist(), station_y.tolist()):
+            end = start + len(head)
+            count = len(queues[index])
+            key = (keys[start * width : end * width], count if count > MAX_PASSENGER_DOTS else 0)
+            cached = clusters.get(index)
+            if cached is None or cached[0] != key:
+                cached = clusters[index] = (key, *self._cluster(serials[start:end], key[1]))
+            start = end
+            _, sprite, (left, top) = cached
+            sprites.append((sprite, (x + left, y + top)))
+        self.dirty.extend(rect for rect in screen.blits(sprites) if rect)
+
+    def _cluster(self, serials: np.ndarray, count: int):
+        """One station's dots, and its count badge when ``count`` is set, as one sprite and its offset from the station."""
+        import pygame
+
+        reach = PASSENGER_JITTER + PASSENGER_DOT_RADIUS
+        badge = self._badge(count) if count else None
+        badge_width, badge_height = badge.get_size() if badge is not None else (0, 0)
+        cluster = pygame.Surface((reach * 2 + max(badge_width, 1), reach * 2 + 1 + badge_height)).convert()
+        cluster.fill(CLUSTER_COLORKEY)
+        cluster.set_colorkey(CLUSTER_COLORKEY, pygame.RLEACCEL)
+        dx, dy = passenger_offsets(serials)
+        origin = PASSENGER_JITTER
+        top = origin + badge_height
+        cluster.blits([(self.dot_sprite, (x + origin, y + top)) for x, y in zip(dx.tolist(), dy.tolist())], doreturn=False)
+        if badge is not None:
+            cluster.blit(badge, (reach * 2, 0))
+        return cluster, (-reach, -reach - badge_height)
+
+    def present(self):
+        """Push this frame to the display, as dirty rects when that is cheaper."""
+        import pygame
+
+        if self.full or self.full_redraw or len(self.dirty) + len(self.previous) > MAX_DIRTY_RECTS:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + self.dirty)
+        self.previous = self.dirty
+        self.full = len(self.dirty) > MAX_DIRTY_RECTS
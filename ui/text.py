@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = 4096
+PANEL_PADDING = 12
+PANEL_BACKGROUND = (28, 30, 44)
+PANEL_BORDER = (90, 120, 200)
+PANEL_TEXT_COLOR = (235, 235, 245)
+
+
+class TextCache:
+    """Rendered text surfaces keyed by ``(text, font, color)``, least recently used evicted first.
+
+    Station labels, panels and badges show the same few strings frame
+    after frame; each is rendered once and blitted from here afterwards.
+    """
+
+    def __init__(self, capacity: int = TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.surfaces: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text: str, font, color):
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color).convert_alpha()
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+TEXTS = TextCache()
+
+
+class TextPanel:
+    """A bordered block of text lines kept as one surface, laid out again only when the lines change."""
+
+    def __init__(self, texts: TextCache = TEXTS):
+        self.texts = texts
+        self.lines: tuple[str, ...] | None = None
+        self.font = None
+        self.surface = None
+        self.rebuilds = 0
+
+    def render(self, lines, font):
+        import pygame
+
+        lines = tuple(lines)
+        if self.surface is not None and lines == self.lines and font is self.font:
+            return self.surface
+        rendered = [self.texts.render(line, font, PANEL_TEXT_COLOR) for line in lines]
+        line_height = font.get_linesize()
+        width = max(text.get_width() for text in rendered) + PANEL_PADDING * 2
+        height = line_height * len(rendered) + PANEL_PADDING * 2
+        surface = pygame.Surface((width, height)).convert()
+        surface.fill(PANEL_BACKGROUND)
+        pygame.draw.rect(surface, PANEL_BORDER, surface.get_rect(), 2)
+        for row, text in enumerate(rendered):
+            surface.blit(text, (PANEL_PADDING, PANEL_PADDING + row * line_height))
+        self.lines, self.font, self.surface = lines, font, surface
+        self.rebuilds += 1
+        return surface